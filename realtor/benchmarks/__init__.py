@@ -0,0 +1,2 @@
+# This package contains the benchmarks of the realtor scrapy project,
+# run them from the scrapy project directory e.g. "python -m benchmarks.bench_parse"
@@ -0,0 +1,191 @@
+"""
+Offline benchmark of full crawls against the local stand-in of the realtor.com APIs.
+
+It starts the fake APIs server "benchmarks.fake_realtor" in a separate process, points
+RealtorScraperSpider.Primary_API and Secondary_API at it and runs a full crawl with the project settings,
+the downloader middleware and Realtor_Pipeline in a temporary working directory, then reports:
+    - requests/sec and items/sec over the whole crawl.
+    - p50 and p99 spider callback latency.
+    - the peak RSS of the crawling process.
+    - the peak scheduler queue depth and the time to the first item.
+    - time-to-close: the time from the last response to the end of the crawl "the pipeline exports".
+    - the adaptive concurrency limits of the search and listings APIs "with -s ADAPTIVE_CONCURRENCY=True".
+
+Usage:
+    python -m benchmarks.bench_crawl --states texas ohio --results 2000 --latency 0.02
+    python -m benchmarks.bench_crawl --listing-type sold_listings -s SEARCH_ONLY=True -s OUTPUT_FORMAT=parquet
+    python -m benchmarks.bench_crawl --listing-type all
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+from time import perf_counter
+
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+
+from benchmarks.fake_realtor import serve
+from realtor.spiders.realtor_scraper import RealtorScraperSpider
+
+
+class CallbackTimer:
+    """
+    Spider middleware measuring the time each spider callback takes to produce all of its output,
+    including the time the engine takes to hand its requests to the scheduler and its items to the pipeline.
+
+    Attributes:
+        latencies (list): the seconds taken by each callback.
+    """
+    latencies = []
+
+    def process_spider_input(self, response, spider):
+        response.meta["callback_started"] = perf_counter()
+
+    def process_spider_output(self, response, result, spider):
+        for output in result:
+            yield output
+        if "callback_started" in response.meta:
+            self.latencies.append(perf_counter() - response.meta.pop("callback_started"))
+
+
+def percentile(values, percent):
+    """
+    Returns the given percentile of the values.
+    """
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def benchmark_settings(work_dir, overrides):
+    """
+    Builds the project settings pointed at the temporary working directory.
+    """
+    settings = Settings()
+    settings.setmodule("realtor.settings", priority="project")
+    settings.set("LOG_LEVEL", "ERROR")
+    settings.set("SPIDER_LOADER_WARN_ONLY", True)
+    settings.set("SAVE_POINTS_DIR", os.path.join(work_dir, "save_points"))
+    settings.set("OUTPUT_DIR", os.path.join(work_dir, "outputs"))
+    settings.set("JOBDIR", os.path.join(work_dir, "job"))
+    settings.set("LISTINGS_INDEX", "")
+    settings.set("LISTINGS_HISTORY", os.path.join(work_dir, "listings_history.sqlite3"))
+    settings.set("RESPONSE_CACHE", "")
+    settings.set("HEADERS_POOL_FILE", os.path.join(work_dir, "headers_pool.json"))
+    settings.set("HEADERS_POOL_SIZE", 1)
+    settings.set("METRICS_ENABLED", True)
+    settings.set("METRICS_PORT", 0)
+    settings.set("METRICS_FILE", os.path.join(work_dir, "metrics.prom"))
+    settings.set("SPIDER_MIDDLEWARES", {f"{__name__}.CallbackTimer": 950})
+    for override in overrides:
+        name, _, value = override.partition("=")
+        settings.set(name, value)
+    os.makedirs(settings["SAVE_POINTS_DIR"], exist_ok=True)
+    os.makedirs(settings["OUTPUT_DIR"], exist_ok=True)
+    with open(settings["HEADERS_POOL_FILE"], "w") as f:
+        json.dump({"next_id": 1, "header_sets": [{
+            "id": 0, "headers": {"user-agent": "benchmark"}, "uses": 0, "successes": 0,
+            "failures": 0, "consecutive_failures": 0, "last_failure": 0,
+        }]}, f)
+    return settings
+
+
+def run_crawl(args):
+    """
+    Runs one crawl against the fake APIs and returns its measurements.
+    """
+    work_dir = tempfile.mkdtemp(prefix="realtor_bench_")
+    settings = benchmark_settings(work_dir, args.setting)
+    os.chdir(work_dir)
+    with open(settings["INPUT_FILE"], "w") as f:
+        f.write("\n".join(args.states) + "\n")
+
+    RealtorScraperSpider.Primary_API = f"http://127.0.0.1:{args.port}/api/v1/rdc_search_srp"
+    RealtorScraperSpider.Secondary_API = f"http://127.0.0.1:{args.port}/api/v1/hulk"
+    RealtorScraperSpider.allowed_domains = ["127.0.0.1"]
+
+    timings = {"last_response": None, "first_item": None, "peak_queue": 0}
+    process = CrawlerProcess(settings, install_root_handler=False)
+    crawler = process.create_crawler(RealtorScraperSpider)
+
+    def response_received():
+        timings["last_response"] = perf_counter()
+        timings["peak_queue"] = max(timings["peak_queue"], len(crawler.engine.slot.scheduler))
+
+    def item_scraped():
+        timings["first_item"] = timings["first_item"] or perf_counter()
+
+    crawler.signals.connect(response_received, signal=signals.response_received)
+    crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+    process.crawl(crawler, scrape_all="False", listing_type=args.listing_type)
+    started = perf_counter()
+    process.start()
+    finished = perf_counter()
+
+    stats = crawler.stats.get_stats()
+    elapsed = finished - started
+    latencies = sorted(CallbackTimer.latencies)
+    return {
+        "elapsed": elapsed,
+        "requests": stats.get("downloader/response_count", 0),
+        "items": stats.get("item_scraped_count", 0),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "time_to_close": finished - (timings["last_response"] or finished),
+        "first_item": (timings["first_item"] or finished) - started,
+        "peak_queue": timings["peak_queue"],
+        "work_dir": work_dir,
+        "concurrency": {key: value for key, value in stats.items() if key.startswith("adaptive_concurrency/")},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--states", nargs="+", default=["texas", "ohio"])
+    parser.add_argument("--listing-type", default="all_for_sale", help='a listing type, several comma separated types or "all"')
+    parser.add_argument("--results", type=int, default=1000, help="the listings reported for each state")
+    parser.add_argument("--latency", type=float, default=0.0, help="the fake APIs response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="a random extra latency up to this many seconds")
+    parser.add_argument("--recorded", help='a directory with a recorded "search.json" and/or "listing.json"')
+    parser.add_argument("--block-rate", type=float, default=0.0, help="the share of the requests answered with a 429")
+    parser.add_argument("--max-limit", type=int, default=0, help="truncate the search results pages to this many results")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the share of the batched listings answered with an error")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-s", "--setting", action="append", default=[], help="a setting override NAME=VALUE")
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(
+        target=serve, args=(args.port, args.results, args.latency, args.jitter, args.recorded, args.block_rate, args.max_limit, args.error_rate),
+        daemon=True,
+    )
+    server.start()
+    try:
+        result = run_crawl(args)
+    finally:
+        server.terminate()
+
+    print(f"\n{'=' * 50}")
+    print(f"crawl time:        {result['elapsed']:.2f} s")
+    print(f"responses:         {result['requests']} ({result['requests'] / result['elapsed']:,.1f} requests/sec)")
+    print(f"items:             {result['items']} ({result['items'] / result['elapsed']:,.1f} items/sec)")
+    print(f"callback latency:  p50 {result['p50'] * 1000:.2f} ms, p99 {result['p99'] * 1000:.2f} ms")
+    print(f"peak RSS:          {result['peak_rss_mb']:.1f} MB")
+    print(f"time-to-close:     {result['time_to_close']:.2f} s")
+    print(f"first item after:  {result['first_item']:.2f} s")
+    print(f"peak queue depth:  {result['peak_queue']} requests")
+    for key, value in sorted(result["concurrency"].items()):
+        print(f"{key}: {value}")
+    print(f"working directory: {result['work_dir']}")
+
+
+if __name__ == "__main__":
+    main()
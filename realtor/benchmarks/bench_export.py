@@ -0,0 +1,118 @@
+"""
+Benchmark of the xlsx export step of Realtor_Pipeline.
+
+It generates a fixed set of listings "the Listing_Item fields, spread over the states" and exports a
+workbook per state with the previous sequential `DataFrame.to_excel` and with XlsxStatesExporter "the
+write-only streaming writer in a pool of processes", each in a fresh process, then reports the export
+time and the peak RSS of the exporting process and of its pool processes.
+
+Usage:
+    python -m benchmarks.bench_export --rows 500000 --states 50
+    python -m benchmarks.bench_export --rows 100000 --processes 4 --modes streaming
+"""
+
+import argparse
+import multiprocessing
+import resource
+import tempfile
+from dataclasses import fields
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from realtor.constants import STATES
+from realtor.exporters import XlsxStatesExporter
+from realtor.items import Listing_Item
+
+
+def generate_listings(rows, states):
+    """
+    Generates the processed listings the pipeline exports, with missing values like the real ones.
+    """
+    generator = np.random.default_rng(7)
+    numbers = np.arange(rows)
+    df = pd.DataFrame({field.name: None for field in fields(Listing_Item)}, index=numbers)
+    df["state"] = np.array(STATES)[numbers % states]
+    df["price"] = np.where(numbers % 17 == 0, np.nan, 50000 + numbers * 7919 % 1950000)
+    df["URL"] = [f"https://www.realtor.com/realestateandhomes-detail/{number}" for number in numbers]
+    df["property_id"] = (1000000 + numbers).astype(str)
+    df["listing_id"] = (2000000 + numbers).astype(str)
+    df["type"] = np.array(["single_family", "condos", "townhomes", "land"])[numbers % 4]
+    df["year_built"] = generator.integers(1900, 2024, rows)
+    df["street"] = [f"{number} Main St" for number in numbers]
+    df["city"] = "Austin"
+    df["state_code"] = "TX"
+    df["zip_code"] = "78701"
+    df["bedrooms"] = generator.integers(1, 6, rows)
+    df["bathrooms"] = generator.integers(1, 4, rows).astype(float)
+    df["sqft"] = generator.integers(600, 5000, rows)
+    df["parameter"] = np.where(numbers % 5 == 0, np.nan, generator.integers(1000, 20000, rows))
+    df["agent"] = "Agent"
+    df["office"] = "Office"
+    df["agent_email"] = "agent@example.com"
+    df["office_email"] = "office@example.com"
+    df["status"] = "for_sale"
+    df["listing_types"] = "all_for_sale"
+    return df
+
+
+def export(mode, df, output_dir, processes):
+    """
+    Exports the workbook of each state with the sequential `to_excel` or with XlsxStatesExporter.
+    """
+    exporter = XlsxStatesExporter(processes)
+    for state in df["state"].unique():
+        state_df = df[df["state"] == state]
+        file_path = f"{output_dir}/{mode} {state}.xlsx"
+        if mode == "to_excel":
+            state_df.to_excel(file_path, index=False)
+        else:
+            exporter.export(file_path, state_df)
+    if errors := exporter.close():
+        raise RuntimeError(f"{len(errors)} workbooks failed: {errors}")
+
+
+def run(mode, args, results):
+    """
+    Runs one export in a fresh process and reports its measurements.
+    """
+    df = generate_listings(args.rows, args.states)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with tempfile.TemporaryDirectory(prefix="realtor_export_") as output_dir:
+        started = perf_counter()
+        export(mode, df, output_dir, args.processes)
+        elapsed = perf_counter() - started
+    results.put({
+        "mode": mode,
+        "elapsed": elapsed,
+        "baseline_rss_mb": baseline_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "pool_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000, help="the number of listings exported")
+    parser.add_argument("--states", type=int, default=50, help="the number of states the listings are spread over")
+    parser.add_argument("--processes", type=int, default=0, help="the XlsxStatesExporter processes, 0 for one per CPU core")
+    parser.add_argument("--modes", nargs="+", default=["to_excel", "streaming"], choices=["to_excel", "streaming"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'mode':<12}{'seconds':>10}{'rows/sec':>12}{'data MB':>10}{'peak MB':>10}{'pool peak MB':>14}")
+    for mode in args.modes:
+        results = context.Queue()
+        process = context.Process(target=run, args=(mode, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+        print(
+            f"{mode:<12}{result['elapsed']:>10.2f}{args.rows / result['elapsed']:>12,.0f}{result['baseline_rss_mb']:>10.1f}"
+            f"{result['peak_rss_mb']:>10.1f}{result['pool_peak_rss_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
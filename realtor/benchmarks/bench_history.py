@@ -0,0 +1,107 @@
+"""
+Benchmark of the listings history store.
+
+It generates a number of daily runs of the same listings "a few of them drop their price, go from
+for_sale to pending to sold "under a new listing_id" or show up for the first time on each run", ingests each run into a new
+ListingsHistory in the pipeline's batches and reports:
+    - the ingest time and rows/sec of each run and the size of the history file.
+    - the time of the price drops, status changes and new arrivals queries of the last run, over all
+      the states and over one state.
+    - the average time of a listing's history lookup.
+
+Usage:
+    python -m benchmarks.bench_history --listings 1000000 --runs 3
+    python -m benchmarks.bench_history --listings 200000 --runs 7 --batch-size 20000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+from realtor.constants import STATES
+from realtor.history import ListingsHistory
+
+STATUSES = ["for_sale", "pending", "sold"]
+
+
+def generate_run(listings, states, run):
+    """
+    Generates the observations of a run, the listings of the previous run plus 2% new ones.
+    """
+    arrivals = listings // 50
+    for number in range(run * arrivals, listings + run * arrivals):
+        # each run drops the price of ~5% of the listings and moves the status of ~5% of them a step further
+        drops = sum(1 for past_run in range(1, run + 1) if hash((number, past_run)) % 20 == 0)
+        changes = sum(1 for past_run in range(1, run + 1) if hash((number, past_run, 7)) % 20 == 0)
+        state = STATES[number % states]
+        status = STATUSES[min(changes, 2)]
+        yield (
+            str(1000000 + number),
+            str((3000000 if status == "sold" else 2000000) + number),
+            state.replace("-", " ").title(),
+            f"{number % 99999:05d}",
+            "all_for_sale",
+            int((50000 + number * 7919 % 1950000) * 0.95 ** drops),
+            status,
+            None,
+        )
+
+
+def timed(query, *args, **kwargs):
+    """
+    Runs a query and returns its time in milliseconds and the number of listings it found.
+    """
+    started = perf_counter()
+    rows = query(*args, **kwargs)
+    return (perf_counter() - started) * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=1000000, help="the number of listings of each run")
+    parser.add_argument("--runs", type=int, default=3, help="the number of daily runs ingested")
+    parser.add_argument("--states", type=int, default=50, help="the number of states the listings are spread over")
+    parser.add_argument("--batch-size", type=int, default=5000, help="the observations added per transaction, LISTINGS_HISTORY_BATCH_SIZE")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="realtor_history_") as history_dir:
+        history = ListingsHistory(os.path.join(history_dir, "listings_history.sqlite3"))
+        first_run = date.today() - timedelta(days=args.runs - 1)
+        print(f"{'run':<12}{'seconds':>10}{'rows/sec':>12}{'added':>10}")
+        for run in range(args.runs):
+            run_date = (first_run + timedelta(days=run)).isoformat()
+            observations = list(generate_run(args.listings, args.states, run))
+            started = perf_counter()
+            for start in range(0, len(observations), args.batch_size):
+                history.add(run_date, observations[start:start + args.batch_size])
+            elapsed = perf_counter() - started
+            print(f"{run_date:<12}{elapsed:>10.2f}{len(observations) / elapsed:>12,.0f}{history.added:>10,}")
+        history.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        size = sum(os.path.getsize(os.path.join(history_dir, name)) for name in os.listdir(history_dir))
+        print(f"history file: {size / 2 ** 20:.1f} MB")
+
+        state = STATES[0].title()
+        print(f"\n{'query of the last run':<36}{'ms':>10}{'listings':>10}")
+        for name, query, kwargs in [
+            ("price drops", history.price_drops, {}),
+            ("status changes", history.status_changes, {}),
+            ("pending -> sold", history.status_changes, {"from_status": "pending", "to_status": "sold"}),
+            ("new arrivals", history.new_arrivals, {}),
+            (f"price drops in {state}", history.price_drops, {"state": state}),
+            (f"status changes in {state}", history.status_changes, {"state": state}),
+            (f"new arrivals in {state}", history.new_arrivals, {"state": state}),
+        ]:
+            milliseconds, found = timed(query, **kwargs)
+            print(f"{name:<36}{milliseconds:>10.1f}{found:>10,}")
+        property_ids = [str(1000000 + random.randrange(args.listings)) for _ in range(1000)]
+        started = perf_counter()
+        found = sum(len(history.listing_history(property_id)) for property_id in property_ids)
+        print(f"{'listing history "per listing"':<36}{perf_counter() - started:>10.3f}{found / len(property_ids):>10.1f}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
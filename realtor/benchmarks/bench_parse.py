@@ -0,0 +1,125 @@
+"""
+Microbenchmark of the listings API parse callback.
+
+It compares the previous extraction "an ItemLoader running one uncompiled JMESPath expression per field
+against the response" with the compiled ExtractionPlan applied to a single JSON decode, over recorded
+listings API "hulk" responses or generated ones when no recordings are given.
+
+Usage:
+    python -m benchmarks.bench_parse
+    python -m benchmarks.bench_parse --responses path/to/recorded/hulk/responses --repeat 5
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+from time import perf_counter
+
+import scrapy
+from itemloaders.processors import TakeFirst
+from scrapy.http import TextResponse
+from scrapy.loader import ItemLoader
+
+from realtor.spiders.realtor_scraper import RealtorScraperSpider
+
+
+BaselineItem = type("BaselineItem", (scrapy.Item,), {
+    field: scrapy.Field() for field, _ in RealtorScraperSpider.LISTING_FIELDS + [("days_on_realtor", None)]
+})
+"""BaselineItem (scrapy.Item): the listing model used before the compiled extraction plan."""
+
+
+class BaselineItemLoader(ItemLoader):
+    default_output_processor = TakeFirst()
+
+
+def baseline_parse(response):
+    """
+    The parse callback before the compiled extraction plan.
+    """
+    loader = BaselineItemLoader(BaselineItem(), selector=response)
+    for field, path in RealtorScraperSpider.LISTING_FIELDS:
+        loader.add_jmes(field, f"data.home.{path}")
+    return loader.load_item()
+
+
+def compiled_parse(response):
+    """
+    The parse callback with the compiled extraction plan.
+    """
+    return RealtorScraperSpider.LISTING_PLAN.extract(json.loads(response.body))
+
+
+def generate_responses(count):
+    """
+    Generates listings API responses with the fields the spider extracts plus some unused payload.
+    """
+    responses = []
+    for i in range(count):
+        home = {
+            "property_id": str(1000000000 + i),
+            "listing_id": str(2000000000 + i),
+            "list_price": random.randint(50000, 2000000),
+            "href": f"https://www.realtor.com/realestateandhomes-detail/{i}",
+            "status": "for_sale",
+            "last_sold_date": None if i % 3 else "2024-01-05",
+            "source": {"raw": {"status": "Active", "style": None, "tax_amount": None}},
+            "description": {"type": "single_family", "year_built": 1990, "beds": 3, "baths": 2, "sqft": 1800,
+                            "lot_sqft": 6000, "text": "x" * 800},
+            "location": {"address": {"state": "Texas", "line": f"{i} Main St", "city": "Austin", "state_code": "TX",
+                                     "postal_code": "78701"}},
+            "advertisers": [{"name": "Agent", "email": "agent@example.com",
+                             "office": {"name": "Office", "email": "office@example.com"}}],
+            "photos": [{"href": f"https://example.com/{i}/{n}.jpg"} for n in range(30)],
+            "property_history": [{"date": "2020-01-01", "event_name": "Sold", "price": 100000}] * 10,
+        }
+        responses.append(json.dumps({"data": {"home": home}}).encode())
+    return responses
+
+
+def load_responses(directory):
+    """
+    Loads the recorded listings API responses "one JSON file per response".
+    """
+    responses = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, "rb") as f:
+            responses.append(f.read())
+    return responses
+
+
+def run(name, parse, responses, repeat):
+    """
+    Times a parse function and prints its throughput.
+    """
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        for response in responses:
+            parse(response)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<10} {len(responses) / best:>12,.0f} items/sec  ({best * 1000:.1f} ms for {len(responses)} responses)")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", help="a directory of recorded listings API responses")
+    parser.add_argument("--count", type=int, default=5000, help="the number of generated responses")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    bodies = load_responses(args.responses) if args.responses else generate_responses(args.count)
+    responses = [
+        TextResponse(url=RealtorScraperSpider.Secondary_API, body=body, encoding="utf-8") for body in bodies
+    ]
+    baseline = run("baseline", baseline_parse, responses, args.repeat)
+    compiled = run("compiled", compiled_parse, responses, args.repeat)
+    print(f"speedup    {baseline / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
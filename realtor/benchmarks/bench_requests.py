@@ -0,0 +1,79 @@
+"""
+Microbenchmark of building the search and listings API request bodies.
+
+It compares the chained `str.replace` text substitution over the payload templates the spider used
+before RequestFactory with the precompiled factory "with and without persisted query hashes", and reports
+the CPU time per request body and the upload bytes of each body.
+
+Usage:
+    python -m benchmarks.bench_requests --requests 20000
+"""
+
+import argparse
+import json
+from time import perf_counter
+
+from realtor.constants import PRIMARY_REQUEST_DATA, SECONDARY_PAYLOAD, PRICE_FILTER_FIELDS
+from realtor.request_factory import RequestFactory
+
+
+def legacy_search_body(listing_type, state_name, state_code, search_date, offset, limit, price_filter):
+    """
+    Builds a search body with the text substitution the spider used before RequestFactory.
+    """
+    payload = PRIMARY_REQUEST_DATA[listing_type]["payload"]\
+        .replace("**", state_name)\
+        .replace("--", state_code)\
+        .replace("==", search_date)\
+        .replace("++", str(offset))\
+        .replace("^^", str(limit))
+    price = f'"min":{price_filter["min"]}' + (f',"max":{price_filter["max"]}' if "max" in price_filter else "")
+    return payload.replace('"query":{', f'"query":{{"{PRICE_FILTER_FIELDS[listing_type]}":{{{price}}},', 1).encode()
+
+
+def legacy_listing_body(property_id, listing_id):
+    """
+    Builds a listing body with the text substitution the spider used before RequestFactory.
+    """
+    return SECONDARY_PAYLOAD.replace("**", str(property_id)).replace("++", str(listing_id)).encode()
+
+
+def measure(build, requests):
+    """
+    Returns the microseconds per body and the size of the last body built.
+    """
+    started = perf_counter()
+    for number in range(requests):
+        body = build(number)
+    return (perf_counter() - started) / requests * 1e6, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000, help="the number of bodies built by each builder")
+    parser.add_argument("--listing-type", default="all_for_sale", choices=list(PRIMARY_REQUEST_DATA))
+    args = parser.parse_args()
+
+    payloads = {listing_type: request_data["payload"] for listing_type, request_data in PRIMARY_REQUEST_DATA.items()}
+    factory = RequestFactory(payloads, SECONDARY_PAYLOAD, PRICE_FILTER_FIELDS)
+    persisted_factory = RequestFactory(payloads, SECONDARY_PAYLOAD, PRICE_FILTER_FIELDS, persisted_queries=True)
+    listing_type, price_filter = args.listing_type, {"min": 100000, "max": 199999}
+    assert json.loads(legacy_search_body(listing_type, "texas", "TX", "2024-01-01", 42, 42, price_filter))["variables"] \
+        == json.loads(factory.search_body(listing_type, "texas", "TX", "2024-01-01", 42, 42, price_filter))["variables"]
+
+    builders = {
+        "search, text substitution": lambda n: legacy_search_body(listing_type, "texas", "TX", "2024-01-01", n * 42, 42, price_filter),
+        "search, request factory": lambda n: factory.search_body(listing_type, "texas", "TX", "2024-01-01", n * 42, 42, price_filter),
+        "search, persisted query": lambda n: persisted_factory.search_body(listing_type, "texas", "TX", "2024-01-01", n * 42, 42, price_filter),
+        "listing, text substitution": lambda n: legacy_listing_body(1000000 + n, 2000000 + n),
+        "listing, request factory": lambda n: factory.listing_body(1000000 + n, 2000000 + n),
+        "listing, persisted query": lambda n: persisted_factory.listing_body(1000000 + n, 2000000 + n),
+    }
+    print(f"{'builder':<30}{'us/body':>10}{'bytes/body':>12}")
+    for name, build in builders.items():
+        microseconds, size = measure(build, args.requests)
+        print(f"{name:<30}{microseconds:>10.2f}{size:>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of the crawler startup cost.
+
+Each scenario runs in a fresh interpreter and reports its wall time, the RSS of the interpreter and the heavy
+modules "browser automation and dataframes" it loaded, so a module importing them at load time again shows up:
+    - importing the spider, the downloader middlewares, the item pipeline or the project components
+      "the spider plus the middlewares, extensions and pipelines of the settings".
+    - running `scrapy list`, which imports every module of the spiders package.
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --strict
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["selenium", "seleniumwire", "selenium_stealth", "fake_useragent", "pandas", "numpy", "pyarrow", "openpyxl"]
+"""HEAVY_MODULES (list): the modules only needed by the headers harvest and the exports."""
+
+SCENARIOS = {
+    "import spider": "import realtor.spiders.realtor_scraper",
+    "import middlewares": "import realtor.middlewares",
+    "import pipelines": "import realtor.pipelines",
+    "project components": (
+        "from scrapy.utils.misc import load_object\n"
+        "from scrapy.utils.project import get_project_settings\n"
+        "import realtor.spiders.realtor_scraper\n"
+        "settings = get_project_settings()\n"
+        "for name in ('DOWNLOADER_MIDDLEWARES', 'EXTENSIONS', 'ITEM_PIPELINES'):\n"
+        "    for path in settings.getdict(name):\n"
+        "        load_object(path)\n"
+    ),
+    "scrapy list": (
+        "import runpy, sys\n"
+        "sys.argv = ['scrapy', 'list']\n"
+        "try:\n"
+        "    runpy.run_module('scrapy', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+}
+"""SCENARIOS (dict): the code timed in each scenario."""
+
+PROBE = """
+import json, resource, sys
+from time import perf_counter
+started = perf_counter()
+exec(compile({code!r}, "<scenario>", "exec"))
+elapsed = perf_counter() - started
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print("\\n" + json.dumps({{"seconds": elapsed, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "heavy": heavy}}))
+"""
+
+
+def run_scenario(code):
+    """
+    Runs a scenario in a fresh interpreter from the project folder and returns its measurements.
+    """
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+        cwd=project_dir, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="the runs of each scenario, the median is reported")
+    parser.add_argument("--strict", action="store_true", help="exit with an error if a scenario loads a heavy module")
+    args = parser.parse_args()
+
+    regressions = []
+    print(f"{'scenario':<22}{'ms':>10}{'RSS MB':>10}  heavy modules loaded")
+    for name, code in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(args.repeat)]
+        heavy = runs[-1]["heavy"]
+        print(f"{name:<22}{statistics.median(run['seconds'] for run in runs) * 1000:>10.0f}"
+              f"{statistics.median(run['rss_mb'] for run in runs):>10.1f}  {', '.join(heavy) or '-'}")
+        if heavy:
+            regressions.append(name)
+    if args.strict and regressions:
+        sys.exit(f"heavy modules loaded at startup by: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+A local stand-in for the realtor.com search "rdc_search_srp" and listings "hulk" APIs.
+
+It answers the spider's POST requests with generated JSON, or with recorded responses used as templates,
+so the spider, the middlewares and the pipeline can be benchmarked without hitting the live site.
+The search API honors the "limit" and "offset" variables and the "list_price"/"sold_price" filters
+"or their exclusion" of the payload and reports `results` listings per searched state, one listing in
+25 has no price like the undisclosed sold prices. Both APIs accept Apollo persisted
+query hashes, an unknown hash is answered with PersistedQueryNotFound until it's sent with its query.
+
+Usage:
+    python -m benchmarks.fake_realtor --port 8765 --results 2000 --latency 0.05
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from realtor.constants import STATES, STATES_CODES
+
+
+def home_price(number):
+    """
+    The list price of a generated listing, None for one listing in 25.
+    """
+    if number % 25 == 7:
+        return None
+    return 50000 + (number * 7919) % 1950000
+
+
+def in_price_range(price, price_filter):
+    """
+    Checks whether a price is in the range of a price filter, a listing without a price never is.
+    """
+    return price is not None and price_filter.get("min", 0) <= price <= price_filter.get("max", float("inf"))
+
+
+def state_seed(searched):
+    """
+    The first listing id of a searched state, a state searched by its code "sold listings" and by its slug
+    "listings for sale" gets different listings, an unknown state is searched as Texas.
+    """
+    if searched in STATES_CODES:
+        return (STATES_CODES.index(searched) + 101) * 10_000_000
+    return (STATES.index(searched if searched in STATES else "texas") + 1) * 10_000_000
+
+
+def home_state(property_id):
+    """
+    The name and code of the state a generated listing was found in, Texas if it's unknown.
+    """
+    number = property_id // 10_000_000
+    index = number - 101 if number > 100 else number - 1
+    state = STATES[index] if 0 <= index < len(STATES) else "texas"
+    return state.replace("-", " ").title(), STATES_CODES[STATES.index(state)]
+
+
+def generate_home(property_id, listing_id, state="Texas", state_code="TX"):
+    """
+    Generates a listing with the fields the spider extracts plus some unused payload.
+    """
+    number = int(property_id) if str(property_id).isdigit() else hash(property_id) % 100000
+    return {
+        "property_id": str(property_id),
+        "listing_id": str(listing_id),
+        "permalink": f"{number}-Main-St_Austin_{state_code}_78701_M{property_id}",
+        "list_price": home_price(number),
+        "href": f"https://www.realtor.com/realestateandhomes-detail/{property_id}",
+        "status": "for_sale",
+        "list_date": f"{date.today() - timedelta(days=number % 15)}T00:00:00Z",
+        "last_sold_date": None if number % 3 else "2024-01-05",
+        "source": {"raw": {"status": "Active", "style": None, "tax_amount": None}},
+        "description": {"type": "single_family", "year_built": 1990, "beds": 3, "baths": 2, "sqft": 1800,
+                        "lot_sqft": 6000, "sold_date": None, "text": "x" * 800},
+        "location": {"address": {"state": state, "line": f"{number} Main St", "city": "Austin",
+                                 "state_code": state_code, "postal_code": "78701"}},
+        "advertisers": [{"name": "Agent", "email": "agent@example.com",
+                         "office": {"name": "Office", "email": "office@example.com"}}],
+        "photos": [{"href": f"https://example.com/{property_id}/{n}.jpg"} for n in range(30)],
+        "property_history": [{"date": "2020-01-01", "event_name": "Sold", "price": 100000}] * 10,
+    }
+
+
+class FakeRealtorHandler(BaseHTTPRequestHandler):
+    """
+    Answers the search and listings API requests, the server settings are class attributes.
+
+    Attributes:
+        results (int): the number of listings reported for each searched state.
+        latency (float): the seconds to wait before answering each request.
+        jitter (float): a random extra wait up to this many seconds.
+        block_rate (float): the share of the requests answered with a 429 block response.
+        max_limit (int): the search results pages are truncated to this many results, 0 for no limit.
+        error_rate (float): the share of the listings of a batched listings request answered with an error.
+        recorded_search (dict): a recorded search response whose listings are used as templates.
+        recorded_listing (dict): a recorded listings API response used as a template.
+        persisted_queries (set): the persisted query hashes registered so far.
+    """
+    protocol_version = "HTTP/1.1"
+    results = 1000
+    latency = 0.0
+    jitter = 0.0
+    block_rate = 0.0
+    max_limit = 0
+    error_rate = 0.0
+    recorded_search = None
+    recorded_listing = None
+    persisted_queries = set()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["content-length"])))
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        if self.block_rate and random.random() < self.block_rate:
+            self.send_response(429)
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return
+        query_hash = payload.get("extensions", {}).get("persistedQuery", {}).get("sha256Hash")
+        if query_hash and "query" in payload:
+            self.persisted_queries.add(query_hash)
+        if query_hash and "query" not in payload and query_hash not in self.persisted_queries:
+            body = {"errors": [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]}
+        elif "rdc_search_srp" in self.path:
+            body = self.search_response(payload["variables"])
+        else:
+            body = self.listing_response(payload["variables"])
+        body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def search_response(self, variables):
+        """
+        Builds a search results page of the searched state.
+        """
+        query = variables["query"]
+        state = query.get("state_code") or query.get("search_location", {}).get("location", "texas")
+        offset, limit = variables.get("offset", 0), variables.get("limit", 42)
+        if self.max_limit:
+            limit = min(limit, self.max_limit)
+        seed = state_seed(state)
+        state_name, state_code = home_state(seed)
+        numbers = range(self.results)
+        if (price_filter := query.get("list_price") or query.get("sold_price")):
+            numbers = [number for number in numbers if in_price_range(home_price(seed + number), price_filter)]
+        excluded = query.get("exclude") or {}
+        if (price_filter := excluded.get("list_price") or excluded.get("sold_price")):
+            numbers = [number for number in numbers if not in_price_range(home_price(seed + number), price_filter)]
+        properties = []
+        for number in numbers[offset:offset + limit]:
+            if self.recorded_search:
+                listing = copy.deepcopy(random.choice(self.recorded_search["data"]["home_search"]["properties"]))
+                listing["property_id"], listing["listing_id"] = str(seed + number), str(seed + number + 1)
+            else:
+                listing = generate_home(seed + number, seed + number + 1, state_name, state_code)
+            properties.append(listing)
+        return {"data": {"home_search": {"count": len(properties), "total": len(numbers), "properties": properties}}}
+
+    def listing_response(self, variables):
+        """
+        Builds the listings API response of a listing, or of each aliased listing of a batch.
+        """
+        if "propertyId0" in variables:
+            homes, errors = {}, []
+            for n in range(len(variables) // 2):
+                if random.random() < self.error_rate:
+                    homes[f"home{n}"] = None
+                    errors.append({"message": "listing not available", "path": [f"home{n}"]})
+                    continue
+                single = {"propertyId": variables[f"propertyId{n}"], "listingId": variables[f"listingId{n}"]}
+                homes[f"home{n}"] = self.listing_response(single)["data"]["home"]
+            return {"data": homes, "errors": errors} if errors else {"data": homes}
+        if self.recorded_listing:
+            response = copy.deepcopy(self.recorded_listing)
+            response["data"]["home"]["property_id"] = variables["propertyId"]
+            response["data"]["home"]["listing_id"] = variables["listingId"]
+            return response
+        return {"data": {"home": generate_home(variables["propertyId"], variables["listingId"], *home_state(int(variables["propertyId"])))}}
+
+
+def serve(port=8765, results=1000, latency=0.0, jitter=0.0, recorded=None, block_rate=0.0, max_limit=0, error_rate=0.0):
+    """
+    Runs the fake APIs server until it is killed.
+
+    Args:
+        port (int): the port to listen on "127.0.0.1".
+        results (int): the number of listings reported for each searched state.
+        latency (float): the seconds to wait before answering each request.
+        jitter (float): a random extra wait up to this many seconds.
+        recorded (str): a directory with a recorded "search.json" and/or "listing.json" response.
+        block_rate (float): the share of the requests answered with a 429 block response.
+        max_limit (int): the search results pages are truncated to this many results, 0 for no limit.
+        error_rate (float): the share of the listings of a batched listings request answered with an error.
+    """
+    FakeRealtorHandler.results = results
+    FakeRealtorHandler.latency = latency
+    FakeRealtorHandler.jitter = jitter
+    FakeRealtorHandler.block_rate = block_rate
+    FakeRealtorHandler.max_limit = max_limit
+    FakeRealtorHandler.error_rate = error_rate
+    for attribute, file_name in (("recorded_search", "search.json"), ("recorded_listing", "listing.json")):
+        if recorded and os.path.exists(os.path.join(recorded, file_name)):
+            with open(os.path.join(recorded, file_name), "r") as f:
+                setattr(FakeRealtorHandler, attribute, json.load(f))
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeRealtorHandler)
+    server.daemon_threads = True
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--results", type=int, default=1000, help="the listings reported for each state")
+    parser.add_argument("--latency", type=float, default=0.0, help="the seconds to wait before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="a random extra wait up to this many seconds")
+    parser.add_argument("--recorded", help='a directory with a recorded "search.json" and/or "listing.json"')
+    parser.add_argument("--block-rate", type=float, default=0.0, help="the share of the requests answered with a 429")
+    parser.add_argument("--max-limit", type=int, default=0, help="truncate the search results pages to this many results")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the share of the batched listings answered with an error")
+    args = parser.parse_args()
+    serve(args.port, args.results, args.latency, args.jitter, args.recorded, args.block_rate, args.max_limit, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
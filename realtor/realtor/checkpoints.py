@@ -0,0 +1,38 @@
+"""
+This module defines the scheduler used with the compact resume checkpoints.
+
+Scrapy's default scheduler pickles every pending request to the JOBDIR, each one of them carries its
+multi-KB GraphQL payload and headers so the job directory of a big state grows to GBs and resuming is slow.
+The spider checkpoints the pending requests of each state as compact cursors in its `state` attribute
+"see StatesQueue" and rebuilds them on resume, so the scheduler only has to keep the requests in memory.
+
+Classes:
+    CheckpointScheduler: A scheduler keeping the requests and their fingerprints in memory only.
+"""
+
+from scrapy.core.scheduler import Scheduler
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.utils.misc import load_object
+
+
+class CheckpointScheduler(Scheduler):
+    """
+    The default scheduler without its disk queue and without persisting the seen requests fingerprints,
+    the JOBDIR is left to the spider's `state` "pickled once when the spider is closed".
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Factory method, initializes the scheduler with in memory queues and duplicates filter.
+        """
+        settings = crawler.settings
+        return cls(
+            dupefilter=RFPDupeFilter(debug=settings.getbool("DUPEFILTER_DEBUG"), fingerprinter=crawler.request_fingerprinter),
+            jobdir=None,
+            mqclass=load_object(settings["SCHEDULER_MEMORY_QUEUE"]),
+            logunser=settings.getbool("SCHEDULER_DEBUG"),
+            stats=crawler.stats,
+            pqclass=load_object(settings["SCHEDULER_PRIORITY_QUEUE"]),
+            crawler=crawler,
+        )
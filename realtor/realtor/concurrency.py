@@ -0,0 +1,128 @@
+"""
+This module defines the adaptive concurrency controller of the realtor.com endpoints.
+
+The search API "rdc_search_srp" and the listings API "hulk" are blocked independently, so each one of them
+gets its own downloader slot and its own concurrency limit driven by AIMD "additive increase, multiplicative
+decrease": the limit grows by about one request per window of healthy responses and is cut by a factor on
+each block signal "403, 429, 502 or a download error", a rising latency holds the limit where it is.
+
+Classes:
+    EndpointConcurrency: The AIMD concurrency limit and the health counters of a single endpoint.
+"""
+
+from collections import deque
+from time import time
+from typing import Iterable, Optional
+
+
+class EndpointConcurrency:
+    """
+    The AIMD concurrency limit of an endpoint.
+
+    Only the first block signal of a round trip cuts the limit, the responses of the requests sent before
+    the last cut were already in flight under the old limit so they are only counted.
+
+    Attributes:
+        name (str): the name of the endpoint "search" or "hulk".
+        limit (float): the current concurrency limit, the downloader slot uses its integer part.
+        min_limit (int): the lowest concurrency limit.
+        max_limit (int): the highest concurrency limit.
+        backoff (float): the factor the limit is multiplied by on a block signal.
+        latency_factor (float): the limit stops growing while the average latency is above this many
+                                times the lowest average latency seen.
+        block_codes (set): the HTTP status codes treated as block signals.
+        window (collections.deque): the outcomes of the latest responses "True for success".
+        latency (float): the moving average of the download latency in seconds.
+        base_latency (float): the lowest moving average of the download latency seen.
+        last_backoff (float): the time of the last limit cut.
+    """
+    latency = None
+    base_latency = None
+    last_backoff = 0.0
+
+    def __init__(self, name: str, start: int = 10, min_limit: int = 1, max_limit: int = 32,
+                 backoff: float = 0.5, latency_factor: float = 3.0,
+                 block_codes: Iterable[int] = (403, 429, 502), window: int = 100):
+        """
+        Initializes the controller of an endpoint.
+
+        Args:
+            name (str): the name of the endpoint.
+            start (int): the starting concurrency limit.
+            min_limit (int): the lowest concurrency limit.
+            max_limit (int): the highest concurrency limit.
+            backoff (float): the factor the limit is multiplied by on a block signal.
+            latency_factor (float): the latency increase over the base latency that holds the limit.
+            block_codes (iterable): the HTTP status codes treated as block signals.
+            window (int): the number of the latest responses the success rate is computed over.
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(start, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.block_codes = {int(code) for code in block_codes}
+        self.window = deque(maxlen=window)
+
+    @property
+    def concurrency(self) -> int:
+        """
+        The number of concurrent requests allowed to the endpoint.
+        """
+        return int(self.limit)
+
+    @property
+    def success_rate(self) -> float:
+        """
+        The share of successful responses in the window.
+        """
+        return sum(self.window) / len(self.window) if self.window else 1.0
+
+    def is_congested(self) -> bool:
+        """
+        Checks if the average latency rose well above the lowest average latency seen.
+        """
+        return self.base_latency is not None and self.latency > self.base_latency * self.latency_factor
+
+    def record_latency(self, latency: Optional[float]) -> None:
+        """
+        Updates the moving average of the download latency.
+        """
+        if latency is None:
+            return
+        self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+        if len(self.window) >= 10:
+            self.base_latency = self.latency if self.base_latency is None else min(self.base_latency, self.latency)
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        """
+        Records a healthy response and grows the limit by 1/limit "one request per window of responses".
+        """
+        self.window.append(True)
+        self.record_latency(latency)
+        if not self.is_congested():
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def record_block(self, sent_at: float = 0.0) -> bool:
+        """
+        Records a block signal and cuts the limit unless it was already cut after the request was sent.
+
+        Args:
+            sent_at (float): the time the blocked request was sent.
+
+        Returns:
+            bool: True if the limit was cut.
+        """
+        self.window.append(False)
+        if sent_at and sent_at < self.last_backoff:
+            return False
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.last_backoff = time()
+        return True
+
+    def record_failure(self) -> None:
+        """
+        Records a failed response that is not a block signal, it only lowers the success rate.
+        """
+        self.window.append(False)
@@ -13,6 +13,9 @@ Attributes:
     SOLD_PAYLOAD (str): the payload for the sold properties search.
     PRIMARY_REQUEST_DATA (dict): contains the referer and payload of each search type.
     LISTING_TYPES (list): contains the search types the bot can scrape.
+    SEARCH_ONLY_PRIMARY_REQUEST_DATA (dict): the search payloads extended for the search only mode.
+    DETAIL_ONLY_FIELDS (list): the listing fields that are only available through the listings API.
+    PRICE_FILTER_FIELDS (dict): the search query price filter used to split each search type into price bands.
 """
 
 
@@ -22,13 +25,13 @@ STATES = ['alabama', 'alaska', 'arizona', 'arkansas', 'california', 'colorado',
 STATES_CODES = ['AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD', 'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY']
 """STATES_CODES  (list): list of all the US states two letters code. """
 
-FOR_SALE_PALOAD = "{\"query\":\"\\n  query ConsumerSearchQuery(\\n    $query: HomeSearchCriteria!\\n    $limit: Int\\n    $offset: Int\\n    $search_promotion: SearchPromotionInput\\n    $sort: [SearchAPISort]\\n    $sort_type: SearchSortType\\n    $client_data: JSON\\n    $bucket: SearchAPIBucket\\n  ) {\\n    home_search: home_search(\\n      query: $query\\n      sort: $sort\\n      limit: $limit\\n      offset: $offset\\n      sort_type: $sort_type\\n      client_data: $client_data\\n      bucket: $bucket\\n      search_promotion: $search_promotion\\n    ) {\\n      count\\n      total\\n      search_promotion {\\n        name\\n        slots\\n        promoted_properties {\\n          id\\n          from_other_page\\n        }\\n      }\\n      properties: results {\\n        property_id\\n        list_price\\n        search_promotions {\\n          name\\n          asset_id\\n        }\\n        primary_photo(https: true) {\\n          href\\n        }\\n        rent_to_own {\\n          right_to_purchase\\n          rent\\n        }\\n        listing_id\\n        matterport\\n        virtual_tours {\\n          href\\n          type\\n        }\\n        status\\n        products {\\n          products\\n          brand_name\\n        }\\n        source {\\n          id\\n          type\\n          spec_id\\n          plan_id\\n          agents {\\n            office_name\\n          }\\n        }\\n        lead_attributes {\\n          show_contact_an_agent\\n          opcity_lead_attributes {\\n            cashback_enabled\\n            flip_the_market_enabled\\n          }\\n          lead_type\\n          ready_connect_mortgage {\\n            show_contact_a_lender\\n            show_veterans_united\\n          }\\n        }\\n        community {\\n          description {\\n            name\\n          }\\n          property_id\\n          permalink\\n          advertisers {\\n            office {\\n              hours\\n              phones {\\n                type\\n                number\\n                primary\\n                trackable\\n              }\\n            }\\n          }\\n          promotions {\\n            description\\n            href\\n            headline\\n          }\\n        }\\n        permalink\\n        price_reduced_amount\\n        description {\\n          name\\n          beds\\n          baths_consolidated\\n          sqft\\n          lot_sqft\\n          baths_max\\n          baths_min\\n          beds_min\\n          beds_max\\n          sqft_min\\n          sqft_max\\n          type\\n          sub_type\\n          sold_price\\n          sold_date\\n        }\\n        location {\\n          address {\\n            line\\n            postal_code\\n            state\\n            state_code\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n          }\\n          county {\\n            name\\n            fips_code\\n          }\\n        }\\n        open_houses {\\n          start_date\\n          end_date\\n        }\\n        branding {\\n          type\\n          name\\n          photo\\n        }\\n        flags {\\n          is_coming_soon\\n          is_new_listing(days: 1)\\n          is_price_reduced(days: 1)\\n          is_foreclosure\\n          is_new_construction\\n          is_pending\\n          is_contingent\\n        }\\n        list_date\\n        photos(limit: 2, https: true) {\\n          href\\n        }\\n      }\\n    }\\n  }\\n\",\"variables\":{\"geoSupportedSlug\":\"\",\"query\":{\"primary\":true,\"status\":[\"for_sale\"],\"search_location\":{\"location\":\"**\"},\"new_construction\":false,\"list_date\":{\"min\":\"==\"}},\"client_data\":{\"device_data\":{\"device_type\":\"desktop\"}},\"limit\":42,\"offset\":++,\"sort_type\":\"relevant\"},\"seoPayload\":{\"asPath\":\"/realestateandhomes-search/**\",\"pageType\":{\"silo\":\"search_result_page\",\"status\":\"for_sale\"},\"county_needed_for_uniq\":false,\"isFaqSupport\":false}}"
+FOR_SALE_PALOAD = "{\"query\":\"\\n  query ConsumerSearchQuery(\\n    $query: HomeSearchCriteria!\\n    $limit: Int\\n    $offset: Int\\n    $search_promotion: SearchPromotionInput\\n    $sort: [SearchAPISort]\\n    $sort_type: SearchSortType\\n    $client_data: JSON\\n    $bucket: SearchAPIBucket\\n  ) {\\n    home_search: home_search(\\n      query: $query\\n      sort: $sort\\n      limit: $limit\\n      offset: $offset\\n      sort_type: $sort_type\\n      client_data: $client_data\\n      bucket: $bucket\\n      search_promotion: $search_promotion\\n    ) {\\n      count\\n      total\\n      search_promotion {\\n        name\\n        slots\\n        promoted_properties {\\n          id\\n          from_other_page\\n        }\\n      }\\n      properties: results {\\n        property_id\\n        list_price\\n        search_promotions {\\n          name\\n          asset_id\\n        }\\n        primary_photo(https: true) {\\n          href\\n        }\\n        rent_to_own {\\n          right_to_purchase\\n          rent\\n        }\\n        listing_id\\n        matterport\\n        virtual_tours {\\n          href\\n          type\\n        }\\n        status\\n        products {\\n          products\\n          brand_name\\n        }\\n        source {\\n          id\\n          type\\n          spec_id\\n          plan_id\\n          agents {\\n            office_name\\n          }\\n        }\\n        lead_attributes {\\n          show_contact_an_agent\\n          opcity_lead_attributes {\\n            cashback_enabled\\n            flip_the_market_enabled\\n          }\\n          lead_type\\n          ready_connect_mortgage {\\n            show_contact_a_lender\\n            show_veterans_united\\n          }\\n        }\\n        community {\\n          description {\\n            name\\n          }\\n          property_id\\n          permalink\\n          advertisers {\\n            office {\\n              hours\\n              phones {\\n                type\\n                number\\n                primary\\n                trackable\\n              }\\n            }\\n          }\\n          promotions {\\n            description\\n            href\\n            headline\\n          }\\n        }\\n        permalink\\n        price_reduced_amount\\n        description {\\n          name\\n          beds\\n          baths_consolidated\\n          sqft\\n          lot_sqft\\n          baths_max\\n          baths_min\\n          beds_min\\n          beds_max\\n          sqft_min\\n          sqft_max\\n          type\\n          sub_type\\n          sold_price\\n          sold_date\\n        }\\n        location {\\n          address {\\n            line\\n            postal_code\\n            state\\n            state_code\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n          }\\n          county {\\n            name\\n            fips_code\\n          }\\n        }\\n        open_houses {\\n          start_date\\n          end_date\\n        }\\n        branding {\\n          type\\n          name\\n          photo\\n        }\\n        flags {\\n          is_coming_soon\\n          is_new_listing(days: 1)\\n          is_price_reduced(days: 1)\\n          is_foreclosure\\n          is_new_construction\\n          is_pending\\n          is_contingent\\n        }\\n        list_date\\n        photos(limit: 2, https: true) {\\n          href\\n        }\\n      }\\n    }\\n  }\\n\",\"variables\":{\"geoSupportedSlug\":\"\",\"query\":{\"primary\":true,\"status\":[\"for_sale\"],\"search_location\":{\"location\":\"**\"},\"new_construction\":false,\"list_date\":{\"min\":\"==\"}},\"client_data\":{\"device_data\":{\"device_type\":\"desktop\"}},\"limit\":^^,\"offset\":++,\"sort_type\":\"relevant\"},\"seoPayload\":{\"asPath\":\"/realestateandhomes-search/**\",\"pageType\":{\"silo\":\"search_result_page\",\"status\":\"for_sale\"},\"county_needed_for_uniq\":false,\"isFaqSupport\":false}}"
 """FOR_SALE_PALOAD (str): the payload for the properties available for sale search."""
 
 SECONDARY_PAYLOAD = "{\"callFrom\":\"PDP\",\"isClient\":true,\"query\":\"query home_search(\\n    $propertyId: ID!\\n    $listingId: ID\\n    $historicalYearsMin: DateTime\\n    $historicalYearsMax: DateTime\\n    $forecastedMonthsMax: DateTime\\n    $streetViewWidth: String\\n  ) {\\n    home(property_id: $propertyId, listing_id: $listingId) {\\n      advertisers {\\n        team_name\\n        team {\\n          name\\n        }\\n        state_license\\n        address {\\n          city\\n          country\\n          line\\n          postal_code\\n          state\\n          state_code\\n        }\\n        builder {\\n          fulfillment_id\\n          name\\n          logo\\n          href\\n        }\\n        broker {\\n          accent_color\\n          designations\\n          fulfillment_id\\n          name\\n          logo\\n        }\\n        email\\n        fulfillment_id\\n        href\\n        mls_set\\n        name\\n        nrds_id\\n        office {\\n          address {\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n            country\\n            line\\n            postal_code\\n            state\\n            state_code\\n          }\\n          application_url\\n          email\\n          lead_email {\\n            to\\n            cc\\n          }\\n          fulfillment_id\\n          hours\\n          href\\n          mls_set\\n          out_of_community\\n          name\\n          phones {\\n            ext\\n            number\\n            primary\\n            trackable\\n            type\\n          }\\n          photo {\\n            href\\n          }\\n          slogan\\n        }\\n        phones {\\n          ext\\n          number\\n          primary\\n          trackable\\n          type\\n        }\\n        photo {\\n          href\\n        }\\n        slogan\\n        type\\n      }\\n      builder {\\n        builder_id\\n        href\\n        name\\n        source_builder_id\\n        logo {\\n          href\\n        }\\n      }\\n      products {\\n        products\\n        brand_name\\n      }\\n      consumer_advertisers {\\n        advertiser_id\\n        agent_id\\n        broker_id\\n        office_id\\n        name\\n        type\\n        slogan\\n        phone\\n        href\\n        show_realtor_logo\\n        hours\\n        contact_name\\n        address {\\n          city\\n          state_code\\n        }\\n        photo {\\n          description\\n          href\\n          type\\n        }\\n      }\\n      buyers {\\n        address {\\n          city\\n          country\\n          line\\n          postal_code\\n          state\\n          state_code\\n        }\\n        broker {\\n          accent_color\\n          designations\\n          fulfillment_id\\n          name\\n          logo\\n        }\\n        email\\n        fulfillment_id\\n        href\\n        mls_set\\n        name\\n        nrds_id\\n        office {\\n          address {\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n            country\\n            line\\n            postal_code\\n            state\\n            state_code\\n          }\\n          application_url\\n          email\\n          lead_email {\\n            to\\n            cc\\n          }\\n          fulfillment_id\\n          hours\\n          href\\n          mls_set\\n          out_of_community\\n          name\\n          phones {\\n            ext\\n            number\\n            primary\\n            trackable\\n            type\\n          }\\n          photo {\\n            href\\n          }\\n          slogan\\n        }\\n        phones {\\n          ext\\n          number\\n          primary\\n          trackable\\n          type\\n        }\\n        photo {\\n          href\\n        }\\n        slogan\\n        type\\n      }\\n      community {\\n        advertisers {\\n          office {\\n            hours\\n            phones {\\n              number\\n              type\\n            }\\n          }\\n          builder {\\n            fulfillment_id\\n          }\\n        }\\n        builder {\\n          builder_id\\n          href\\n          name\\n          source_builder_id\\n          logo {\\n            href\\n          }\\n        }\\n        description {\\n          name\\n          text\\n          plan_types\\n        }\\n        details {\\n          category\\n          text\\n        }\\n        list_price_min\\n        list_price_max\\n        permalink\\n        property_id\\n        unit_count\\n        units(status: ready_to_build) {\\n          property_id\\n          primary\\n          list_price\\n          href\\n          status\\n          list_date\\n          matterport\\n          plan_id\\n          permalink\\n          primary_photo(https: true) {\\n            href\\n          }\\n          description {\\n            baths\\n            baths_full_calc\\n            baths_partial_calc\\n            beds\\n            sqft\\n            type\\n            stories\\n            garage\\n            name\\n          }\\n          location {\\n            address {\\n              line\\n              city\\n              state_code\\n              postal_code\\n              country\\n              state\\n            }\\n          }\\n        }\\n        video_count\\n        videos {\\n          href\\n        }\\n        property_id\\n      }\\n      estimates {\\n        current_values(filter: { status: [\\\"sold\\\", \\\"off_market\\\", \\\"other\\\"] }) {\\n          isbest_homevalue\\n          estimate\\n          estimate_high\\n          estimate_low\\n          date\\n          source {\\n            type\\n            name\\n          }\\n        }\\n        historical_values(date_range: { min: $historicalYearsMin, max: $historicalYearsMax }) {\\n          source {\\n            name\\n            type\\n          }\\n          estimates {\\n            estimate\\n            date\\n          }\\n        }\\n        forecast_values(max_date: $forecastedMonthsMax) {\\n          source {\\n            name\\n            type\\n          }\\n          estimates {\\n            estimate\\n            date\\n          }\\n        }\\n      }\\n      days_on_market\\n      move_in_date\\n      description {\\n        baths\\n        baths_3qtr\\n        baths_full\\n        baths_full_calc\\n        baths_half\\n        baths_max\\n        baths_min\\n        baths_partial_calc\\n        baths_total\\n        baths_consolidated\\n        beds\\n        beds_max\\n        beds_min\\n        construction\\n        cooling\\n        exterior\\n        fireplace\\n        garage\\n        garage_max\\n        garage_min\\n        garage_type\\n        heating\\n        logo {\\n          href\\n        }\\n        lot_sqft\\n        name\\n        pool\\n        roofing\\n        rooms\\n        sqft\\n        sqft_max\\n        sqft_min\\n        stories\\n        styles\\n        sub_type\\n        text\\n        type\\n        units\\n        year_built\\n        year_renovated\\n        zoning\\n      }\\n      details {\\n        category\\n        parent_category\\n        text\\n      }\\n      other_listings {\\n        rdc {\\n          listing_id\\n          status\\n          listing_key\\n          sold_date\\n          primary\\n          unique\\n        }\\n      }\\n      lead_attributes(caller: mobile_web) {\\n        show_contact_an_agent\\n        lead_type\\n        show_lead_form\\n        disclaimer_text\\n        is_tcpa_message_enabled\\n        show_text_leads\\n        opcity_lead_attributes {\\n          flip_the_market_enabled\\n          cashback_enabled\\n          smarthome_enabled\\n          phones {\\n            number\\n            category\\n          }\\n        }\\n        ready_connect_mortgage {\\n          show_contact_a_lender\\n          show_veterans_united\\n        }\\n      }\\n      flags {\\n        is_coming_soon\\n        is_contingent\\n        is_deal_available\\n        is_for_rent\\n        is_foreclosure\\n        is_garage_present\\n        is_new_construction\\n        is_pending\\n        is_price_excludes_land\\n        is_senior_community\\n        is_short_sale\\n        is_subdivision\\n        is_price_reduced\\n        is_new_listing\\n      }\\n      floorplans {\\n        floorplan_interactive {\\n          href\\n          source\\n          type\\n        }\\n      }\\n      href\\n      last_sold_date\\n      last_sold_price\\n      list_date\\n      list_price\\n      last_price_change_amount\\n      listing_id\\n      local {\\n        flood {\\n          flood_factor_severity\\n          flood_trend\\n        }\\n        wildfire {\\n          fire_factor_severity\\n          fire_trend\\n        }\\n        noise {\\n          score\\n          noise_categories {\\n            text\\n            type\\n          }\\n        }\\n      }\\n      location {\\n        street_view_url(input: { size: $streetViewWidth })\\n        street_view_metadata_url\\n        address {\\n          city\\n          coordinate {\\n            lat\\n            lon\\n          }\\n          country\\n          line\\n          postal_code\\n          state\\n          state_code\\n          street_direction\\n          street_name\\n          street_number\\n          street_post_direction\\n          street_suffix\\n          unit\\n          validation_code\\n        }\\n        county {\\n          fips_code\\n          name\\n          state_code\\n        }\\n        neighborhoods {\\n          city\\n          id\\n          level\\n          name\\n          geo_type\\n          state_code\\n          slug_id\\n          geo_statistics(group_by: property_type) {\\n            housing_market {\\n              median_listing_price\\n            }\\n          }\\n        }\\n        search_areas {\\n          city\\n          state_code\\n        }\\n        city {\\n          county_needed_for_uniq\\n          slug_id\\n        }\\n        postal_code {\\n          geo_statistics {\\n            housing_market {\\n              hot_market_badge\\n            }\\n          }\\n        }\\n      }\\n      matterport {\\n        property_id\\n        videos {\\n          href\\n        }\\n      }\\n      virtual_tours {\\n        href\\n        type\\n      }\\n      home_tours {\\n        virtual_tours {\\n          category\\n          href\\n          type\\n        }\\n      }\\n      open_houses {\\n        start_date\\n        end_date\\n      }\\n      nearby_schools {\\n        schools {\\n          coordinate {\\n            lat\\n            lon\\n          }\\n          distance_in_miles\\n          district {\\n            id\\n            name\\n          }\\n          education_levels\\n          funding_type\\n          grades\\n          greatschools_id\\n          id\\n          name\\n          nces_code\\n          parent_rating\\n          rating\\n          review_count\\n          slug_id\\n          student_count\\n        }\\n      }\\n      open_houses {\\n        start_date\\n        end_date\\n        description\\n        time_zone\\n        dst\\n      }\\n      permalink\\n      photo_count\\n      photos {\\n        title\\n        description\\n        href\\n        type\\n        tags(version: v3) {\\n          label\\n          probability\\n        }\\n      }\\n      price_per_sqft\\n      primary_photo {\\n        href\\n      }\\n      hoa {\\n        fee\\n      }\\n      property_history {\\n        date\\n        event_name\\n        price\\n        price_sqft\\n        source_listing_id\\n        source_name\\n        listing(filter: { status: [\\\"sold\\\", \\\"off_market\\\", \\\"other\\\"] }) {\\n          list_price\\n          last_status_change_date\\n          last_update_date\\n          status\\n          list_date\\n          listing_id\\n          suppression_flags\\n          photos {\\n            href\\n          }\\n          description {\\n            text\\n          }\\n          advertisers {\\n            fulfillment_id\\n            nrds_id\\n            name\\n            email\\n            href\\n            slogan\\n            office {\\n              fulfillment_id\\n              name\\n              email\\n              href\\n              slogan\\n              out_of_community\\n              application_url\\n              mls_set\\n            }\\n            broker {\\n              fulfillment_id\\n              name\\n              accent_color\\n              logo\\n            }\\n            type\\n            mls_set\\n          }\\n          buyers {\\n            fulfillment_id\\n            nrds_id\\n            name\\n            email\\n            href\\n            slogan\\n            type\\n            mls_set\\n            address {\\n              line\\n              city\\n              postal_code\\n              state_code\\n              state\\n              country\\n              coordinate {\\n                lat\\n                lon\\n              }\\n            }\\n            office {\\n              fulfillment_id\\n              name\\n              email\\n              href\\n              slogan\\n              hours\\n              out_of_community\\n              application_url\\n              mls_set\\n              address {\\n                line\\n                city\\n                postal_code\\n                state_code\\n                state\\n                country\\n              }\\n              phones {\\n                number\\n                type\\n                primary\\n                trackable\\n                ext\\n              }\\n              county {\\n                name\\n              }\\n            }\\n            phones {\\n              number\\n              type\\n              primary\\n              trackable\\n              ext\\n            }\\n            broker {\\n              fulfillment_id\\n              name\\n              accent_color\\n              logo\\n            }\\n          }\\n          source {\\n            id\\n            agents {\\n              agent_id\\n              agent_name\\n              office_id\\n              office_name\\n              office_phone\\n              type\\n            }\\n          }\\n        }\\n      }\\n      property_id\\n      provider_url {\\n        href\\n        level\\n        type\\n      }\\n      source {\\n        agents {\\n          agent_id\\n          agent_name\\n          id\\n          office_id\\n          office_name\\n          office_phone\\n          type\\n        }\\n        disclaimer {\\n          href\\n          logo {\\n            href\\n            height\\n            width\\n          }\\n          text\\n        }\\n        id\\n        plan_id\\n        listing_id\\n        name\\n        raw {\\n          status\\n          style\\n          tax_amount\\n        }\\n        type\\n        community_id\\n      }\\n      status\\n      suppression_flags\\n      tags\\n      tax_history {\\n        assessment {\\n          building\\n          land\\n          total\\n        }\\n        market {\\n          building\\n          land\\n          total\\n        }\\n        tax\\n        year\\n      }\\n    }\\n  }\\n\",\"variables\":{\"propertyId\":\"**\",\"listingId\":\"++\"},\"isBot\":false}" 
 """SECONDARY_PAYLOAD (str): the payload to be sent to recieve an individual property data."""
 
-SOLD_PAYLOAD = "{\"query\":\"\\n  query ConsumerSearchQuery(\\n    $query: HomeSearchCriteria!\\n    $limit: Int\\n    $offset: Int\\n    $search_promotion: SearchPromotionInput\\n    $sort: [SearchAPISort]\\n    $sort_type: SearchSortType\\n    $client_data: JSON\\n    $bucket: SearchAPIBucket\\n  ) {\\n    home_search: home_search(\\n      query: $query\\n      sort: $sort\\n      limit: $limit\\n      offset: $offset\\n      sort_type: $sort_type\\n      client_data: $client_data\\n      bucket: $bucket\\n      search_promotion: $search_promotion\\n    ) {\\n      count\\n      total\\n      search_promotion {\\n        name\\n        slots\\n        promoted_properties {\\n          id\\n          from_other_page\\n        }\\n      }\\n      properties: results {\\n        property_id\\n        list_price\\n        search_promotions {\\n          name\\n          asset_id\\n        }\\n        primary_photo(https: true) {\\n          href\\n        }\\n        rent_to_own {\\n          right_to_purchase\\n          rent\\n        }\\n        listing_id\\n        matterport\\n        virtual_tours {\\n          href\\n          type\\n        }\\n        status\\n        products {\\n          products\\n          brand_name\\n        }\\n        source {\\n          id\\n          type\\n          spec_id\\n          plan_id\\n          agents {\\n            office_name\\n          }\\n        }\\n        lead_attributes {\\n          show_contact_an_agent\\n          opcity_lead_attributes {\\n            cashback_enabled\\n            flip_the_market_enabled\\n          }\\n          lead_type\\n          ready_connect_mortgage {\\n            show_contact_a_lender\\n            show_veterans_united\\n          }\\n        }\\n        community {\\n          description {\\n            name\\n          }\\n          property_id\\n          permalink\\n          advertisers {\\n            office {\\n              hours\\n              phones {\\n                type\\n                number\\n                primary\\n                trackable\\n              }\\n            }\\n          }\\n          promotions {\\n            description\\n            href\\n            headline\\n          }\\n        }\\n        permalink\\n        price_reduced_amount\\n        description {\\n          name\\n          beds\\n          baths_consolidated\\n          sqft\\n          lot_sqft\\n          baths_max\\n          baths_min\\n          beds_min\\n          beds_max\\n          sqft_min\\n          sqft_max\\n          type\\n          sub_type\\n          sold_price\\n          sold_date\\n        }\\n        location {\\n          address {\\n            line\\n            postal_code\\n            state\\n            state_code\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n          }\\n          county {\\n            name\\n            fips_code\\n          }\\n        }\\n        open_houses {\\n          start_date\\n          end_date\\n        }\\n        branding {\\n          type\\n          name\\n          photo\\n        }\\n        \\n        list_date\\n        photos(limit: 0, https: true) {\\n          href\\n        }\\n      }\\n    }\\n  }\\n\",\"variables\":{\"geoSupportedSlug\":\"\",\"query\":{\"status\":[\"sold\"],\"state_code\":\"--\",\"sold_date\":{\"min\":\"==\"}},\"client_data\":{\"device_data\":{\"device_type\":\"desktop\"}},\"limit\":42,\"offset\":++,\"sort\":[{\"field\":\"sold_date\",\"direction\":\"desc\"},{\"field\":\"photo_count\",\"direction\":\"desc\"}]},\"seoPayload\":{\"asPath\":\"/realestateandhomes-search/**\",\"pageType\":{\"silo\":\"search_result_page\",\"status\":\"for_sale\"},\"county_needed_for_uniq\":false,\"isFaqSupport\":false}}"
+SOLD_PAYLOAD = "{\"query\":\"\\n  query ConsumerSearchQuery(\\n    $query: HomeSearchCriteria!\\n    $limit: Int\\n    $offset: Int\\n    $search_promotion: SearchPromotionInput\\n    $sort: [SearchAPISort]\\n    $sort_type: SearchSortType\\n    $client_data: JSON\\n    $bucket: SearchAPIBucket\\n  ) {\\n    home_search: home_search(\\n      query: $query\\n      sort: $sort\\n      limit: $limit\\n      offset: $offset\\n      sort_type: $sort_type\\n      client_data: $client_data\\n      bucket: $bucket\\n      search_promotion: $search_promotion\\n    ) {\\n      count\\n      total\\n      search_promotion {\\n        name\\n        slots\\n        promoted_properties {\\n          id\\n          from_other_page\\n        }\\n      }\\n      properties: results {\\n        property_id\\n        list_price\\n        search_promotions {\\n          name\\n          asset_id\\n        }\\n        primary_photo(https: true) {\\n          href\\n        }\\n        rent_to_own {\\n          right_to_purchase\\n          rent\\n        }\\n        listing_id\\n        matterport\\n        virtual_tours {\\n          href\\n          type\\n        }\\n        status\\n        products {\\n          products\\n          brand_name\\n        }\\n        source {\\n          id\\n          type\\n          spec_id\\n          plan_id\\n          agents {\\n            office_name\\n          }\\n        }\\n        lead_attributes {\\n          show_contact_an_agent\\n          opcity_lead_attributes {\\n            cashback_enabled\\n            flip_the_market_enabled\\n          }\\n          lead_type\\n          ready_connect_mortgage {\\n            show_contact_a_lender\\n            show_veterans_united\\n          }\\n        }\\n        community {\\n          description {\\n            name\\n          }\\n          property_id\\n          permalink\\n          advertisers {\\n            office {\\n              hours\\n              phones {\\n                type\\n                number\\n                primary\\n                trackable\\n              }\\n            }\\n          }\\n          promotions {\\n            description\\n            href\\n            headline\\n          }\\n        }\\n        permalink\\n        price_reduced_amount\\n        description {\\n          name\\n          beds\\n          baths_consolidated\\n          sqft\\n          lot_sqft\\n          baths_max\\n          baths_min\\n          beds_min\\n          beds_max\\n          sqft_min\\n          sqft_max\\n          type\\n          sub_type\\n          sold_price\\n          sold_date\\n        }\\n        location {\\n          address {\\n            line\\n            postal_code\\n            state\\n            state_code\\n            city\\n            coordinate {\\n              lat\\n              lon\\n            }\\n          }\\n          county {\\n            name\\n            fips_code\\n          }\\n        }\\n        open_houses {\\n          start_date\\n          end_date\\n        }\\n        branding {\\n          type\\n          name\\n          photo\\n        }\\n        \\n        list_date\\n        photos(limit: 0, https: true) {\\n          href\\n        }\\n      }\\n    }\\n  }\\n\",\"variables\":{\"geoSupportedSlug\":\"\",\"query\":{\"status\":[\"sold\"],\"state_code\":\"--\",\"sold_date\":{\"min\":\"==\"}},\"client_data\":{\"device_data\":{\"device_type\":\"desktop\"}},\"limit\":^^,\"offset\":++,\"sort\":[{\"field\":\"sold_date\",\"direction\":\"desc\"},{\"field\":\"photo_count\",\"direction\":\"desc\"}]},\"seoPayload\":{\"asPath\":\"/realestateandhomes-search/**\",\"pageType\":{\"silo\":\"search_result_page\",\"status\":\"for_sale\"},\"county_needed_for_uniq\":false,\"isFaqSupport\":false}}"
 """SOLD_PAYLOAD (str): the payload for the sold properties search."""
     
 PRIMARY_REQUEST_DATA = {
@@ -48,4 +51,25 @@ PRIMARY_REQUEST_DATA = {
 """PRIMARY_REQUEST_DATA (dict): contains the referer and payload of each search type."""
 
 LISTING_TYPES = ["new_listings", "all_for_sale", "sold_listings"]
-"""LISTING_TYPES (list): contains the search types the bot can scrape."""
\ No newline at end of file
+"""LISTING_TYPES (list): contains the search types the bot can scrape."""
+
+SEARCH_ONLY_PRIMARY_REQUEST_DATA = {
+        listing_type: {
+            "payload":request_data["payload"]\
+                .replace("properties: results {\\n", "properties: results {\\n        href\\n        last_sold_date\\n", 1)\
+                .replace("sub_type\\n          sold_price\\n", "sub_type\\n          baths\\n          year_built\\n          sold_price\\n", 1),
+            "referer":request_data["referer"]
+        }
+        for listing_type, request_data in PRIMARY_REQUEST_DATA.items()
+    }
+"""SEARCH_ONLY_PRIMARY_REQUEST_DATA (dict): the same as PRIMARY_REQUEST_DATA with the search selection
+extended by the fields needed to build the listings items straight from the search results."""
+
+DETAIL_ONLY_FIELDS = ["agent", "office", "agent_email", "office_email"]
+"""DETAIL_ONLY_FIELDS (list): the listing fields that are only available through the listings API."""
+PRICE_FILTER_FIELDS = {
+        "new_listings": "list_price",
+        "all_for_sale": "list_price",
+        "sold_listings": "sold_price",
+    }
+"""PRICE_FILTER_FIELDS (dict): the search query price filter used to split each search type into price bands."""
@@ -0,0 +1,90 @@
+"""
+This module defines the batched requests of the listings API "hulk".
+
+A batch groups several listings of a search results page into one GraphQL request, each listing gets
+its own aliased `home(...)` selection "home0, home1, ..." with its own `$propertyId<n>` and `$listingId<n>`
+variables, the response is split back into one `{"data": {"home": ...}}` document per listing so it's
+parsed exactly like the response of a single listing request.
+
+Classes:
+    DetailBatchPayload: Builds the batched queries from SECONDARY_PAYLOAD and splits the batched responses.
+"""
+
+import json
+from typing import Dict, List, Optional
+
+
+class DetailBatchPayload:
+    """
+    Builds the batched listings API queries and splits their responses.
+
+    The query of each batch size is built once from the single listing query of SECONDARY_PAYLOAD
+    and reused for all the batches of the same size.
+
+    Attributes:
+        template (dict): the decoded single listing payload.
+        selection (str): the selection set of the `home(...)` field.
+        queries (dict): the batched query of each batch size.
+    """
+    HOME_FIELD = "home(property_id: $propertyId, listing_id: $listingId)"
+    ID_VARIABLES = "$propertyId: ID!\n    $listingId: ID\n"
+
+    def __init__(self, payload: str):
+        """
+        Extracts the `home(...)` selection from the single listing payload.
+
+        Args:
+            payload (str): the single listing payload "SECONDARY_PAYLOAD".
+        """
+        self.template = json.loads(payload)
+        query = self.template["query"]
+        field_start = query.index(self.HOME_FIELD)
+        selection_start = query.index("{", field_start)
+        selection_end = self.matching_brace(query, selection_start)
+        self.query_head = query[:field_start].replace(self.ID_VARIABLES, "##ID_VARIABLES##", 1)
+        self.selection = query[selection_start:selection_end + 1]
+        self.query_tail = query[selection_end + 1:]
+        self.queries: Dict[int, str] = {}
+
+    @staticmethod
+    def matching_brace(text: str, start: int) -> int:
+        """
+        Finds the index of the brace closing the one at `start`.
+        """
+        depth = 0
+        for index in range(start, len(text)):
+            if text[index] == "{":
+                depth += 1
+            elif text[index] == "}":
+                depth -= 1
+                if depth == 0:
+                    return index
+        raise ValueError("unbalanced braces in the listings API query")
+
+    def query(self, batch_size: int) -> str:
+        """
+        Returns the query of a batch of `batch_size` listings.
+        """
+        if batch_size not in self.queries:
+            id_variables = "".join(f"$propertyId{n}: ID!\n    $listingId{n}: ID\n    " for n in range(batch_size))
+            fields = "\n    ".join(
+                f"home{n}: home(property_id: $propertyId{n}, listing_id: $listingId{n}) {self.selection}"
+                for n in range(batch_size)
+            )
+            self.queries[batch_size] = self.query_head.replace("##ID_VARIABLES##", id_variables, 1) + fields + self.query_tail
+        return self.queries[batch_size]
+
+    @staticmethod
+    def split(data: dict, batch_size: int) -> List[Optional[dict]]:
+        """
+        Splits a decoded batch response into the single listing responses.
+
+        Args:
+            data (dict): the decoded batch response.
+            batch_size (int): the number of listings in the batch.
+
+        Returns:
+            list: a `{"data": {"home": ...}}` document for each listing, None for the listings that failed.
+        """
+        homes = data.get("data") or {}
+        return [{"data": {"home": homes[f"home{n}"]}} if homes.get(f"home{n}") else None for n in range(batch_size)]
@@ -0,0 +1,363 @@
+"""
+This module defines the streaming exporters used by the item pipeline.
+
+Classes:
+    ParquetStatesExporter: Writes the scraped items as typed Parquet row groups partitioned by state.
+    XlsxStatesExporter: Writes the Excel workbook of each state in parallel with a streaming writer.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent import futures
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from itemadapter import ItemAdapter
+
+
+class ParquetStatesExporter:
+    """
+    Writes the scraped items incrementally into a state partitioned Parquet dataset.
+
+    The items of each state are buffered until a row group is full then written to the state's
+    part file, so the memory used is bounded by the row group size and closing the exporter only
+    flushes the last partial row groups. Each run writes new part files so a paused and resumed
+    crawl never overwrites the rows written before the pause.
+
+    The part file of a state is closed as soon as the state is completely scraped "`close_state`",
+    it's readable from then on and the state's buffer is dropped.
+
+    The dataset layout is "<dataset_dir>/state=<state>/part-<run start>.parquet" which is read
+    directly by `pandas.read_parquet` or `pyarrow.dataset`, the state column is only stored in
+    the partition directory name.
+
+    The workers sharing a frontier write their own part files "tagged with the worker id" into the
+    same dataset, the last worker to finish compacts each state into a single deduplicated file.
+
+    Attributes:
+        SCHEMA (pyarrow.Schema): the types of the listing fields.
+        FILE_SCHEMA (pyarrow.Schema): the types of the fields stored in the part files.
+        dataset_dir (str): the directory of the dataset.
+        row_group_size (int): the number of rows buffered per state before writing a row group.
+        rows_written (dict): the number of rows written for each state.
+    """
+    SCHEMA = pa.schema([
+        ("state", pa.string()),
+        ("price", pa.int64()),
+        ("URL", pa.string()),
+        ("property_id", pa.string()),
+        ("listing_id", pa.string()),
+        ("type", pa.string()),
+        ("year_built", pa.int32()),
+        ("street", pa.string()),
+        ("city", pa.string()),
+        ("state_code", pa.string()),
+        ("zip_code", pa.string()),
+        ("bedrooms", pa.int32()),
+        ("bathrooms", pa.float32()),
+        ("sqft", pa.int64()),
+        ("parameter", pa.int64()),
+        ("agent", pa.string()),
+        ("office", pa.string()),
+        ("agent_email", pa.string()),
+        ("office_email", pa.string()),
+        ("sold_date", pa.string()),
+        ("status", pa.string()),
+        ("days_on_realtor", pa.int32()),
+        ("listing_types", pa.string()),
+    ])
+    FILE_SCHEMA = SCHEMA.remove(SCHEMA.get_field_index("state"))
+
+    def __init__(self, dataset_dir: str, row_group_size: int = 10000, worker: str = ""):
+        """
+        Initializes the exporter.
+
+        Args:
+            dataset_dir (str): the directory of the dataset.
+            row_group_size (int): the number of rows buffered per state before writing a row group.
+            worker (str): the id of the worker writing the part files, empty for a single spider.
+        """
+        self.dataset_dir = dataset_dir
+        self.row_group_size = row_group_size
+        self.part_name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}{f'-{worker}' if worker else ''}.parquet"
+        self.buffers: Dict[str, List[dict]] = {}
+        self.writers: Dict[str, pq.ParquetWriter] = {}
+        self.rows_written: Dict[str, int] = {}
+
+    @staticmethod
+    def coerce(value, field_type: pa.DataType):
+        """
+        Converts a scraped value to the python type of its Parquet column.
+
+        Returns:
+            the converted value, None for missing or invalid values.
+        """
+        if value is None or (isinstance(value, float) and math.isnan(value)) or value == "":
+            return None
+        try:
+            if pa.types.is_integer(field_type):
+                return int(float(value))
+            if pa.types.is_floating(field_type):
+                return float(value)
+        except (TypeError, ValueError):
+            return None
+        return str(value)
+
+    def export_item(self, item: dict) -> None:
+        """
+        Buffers an item in its state's row group and writes the row group once it's full.
+
+        Args:
+            item (Listing_Item): the processed item.
+        """
+        item = ItemAdapter(item)
+        row = {field.name: self.coerce(item.get(field.name), field.type) for field in self.FILE_SCHEMA}
+        state = item.get("state") or "unknown"
+        buffer = self.buffers.setdefault(state, [])
+        buffer.append(row)
+        if len(buffer) >= self.row_group_size:
+            self.flush(state)
+
+    def flush(self, state: str) -> None:
+        """
+        Writes the buffered rows of a state as a row group.
+        """
+        buffer = self.buffers.pop(state, None)
+        if not buffer:
+            return
+        if state not in self.writers:
+            state_dir = os.path.join(self.dataset_dir, f"state={state}")
+            os.makedirs(state_dir, exist_ok=True)
+            part_path, reopened = os.path.join(state_dir, self.part_name), 0
+            while os.path.exists(part_path):
+                # the state's part file was already closed, its late rows go to a new one
+                reopened += 1
+                part_path = os.path.join(state_dir, self.part_name.replace(".parquet", f"-{reopened}.parquet"))
+            self.writers[state] = pq.ParquetWriter(part_path, self.FILE_SCHEMA, compression="zstd")
+        self.writers[state].write_table(pa.Table.from_pylist(buffer, schema=self.FILE_SCHEMA))
+        self.rows_written[state] = self.rows_written.get(state, 0) + len(buffer)
+
+    def close_state(self, state: str) -> int:
+        """
+        Writes the remaining rows of a state and closes its part file.
+
+        Returns:
+            int: the number of rows written for the state.
+        """
+        self.flush(state)
+        if (writer := self.writers.pop(state, None)) is not None:
+            writer.close()
+        return self.rows_written.get(state, 0)
+
+    def close(self) -> None:
+        """
+        Writes the remaining rows and closes the part files.
+        """
+        for state in list(self.buffers):
+            self.flush(state)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    @classmethod
+    def compact(cls, dataset_dir: str) -> Dict[str, int]:
+        """
+        Merges the part files of each state of a dataset into a single file without the duplicate listings
+        "a unit crawled again after its worker died", the part files that can't be read are left in place.
+
+        Returns:
+            dict: the number of rows of each state.
+        """
+        rows = {}
+        for partition in sorted(os.listdir(dataset_dir)):
+            state_dir = os.path.join(dataset_dir, partition)
+            if not partition.startswith("state=") or not os.path.isdir(state_dir):
+                continue
+            tables, merged_parts = [], []
+            for part in sorted(os.listdir(state_dir)):
+                try:
+                    tables.append(pq.read_table(os.path.join(state_dir, part), schema=cls.FILE_SCHEMA))
+                    merged_parts.append(part)
+                except (pa.ArrowInvalid, OSError):
+                    continue
+            if not tables:
+                continue
+            df = pa.concat_tables(tables).to_pandas().drop_duplicates(subset=["property_id", "listing_id"])
+            merged_file = os.path.join(state_dir, "part-merged.parquet.tmp")
+            pq.write_table(pa.Table.from_pandas(df, schema=cls.FILE_SCHEMA, preserve_index=False), merged_file, compression="zstd")
+            for part in merged_parts:
+                os.remove(os.path.join(state_dir, part))
+            os.replace(merged_file, os.path.join(state_dir, "part-merged.parquet"))
+            rows[partition.removeprefix("state=")] = len(df)
+        return rows
+
+
+class XlsxStatesExporter:
+    """
+    Writes the Excel workbook of each state in a pool of processes.
+
+    `DataFrame.to_excel` builds the whole workbook in memory and writes the states one after another on a
+    single core, the workbooks are instead streamed row by row by openpyxl's write-only writer "the rows are
+    serialized to a temporary file as they come so the memory used doesn't grow with the workbook" and the
+    states are spread over `processes` processes.
+
+    The rows of a workbook are never handed to the pool, they are written to a JSON lines slice file "the format
+    of the save-point files" when the workbook is submitted and the process writing the workbook streams them from
+    the slice, which is deleted once the workbook is written. Only the paths are pickled to the pool and kept in
+    `waiting`, so the memory used by the backlog doesn't grow with the listings.
+
+    Submitting a workbook never blocks, at most a couple of workbooks per process are handed to the pool and the
+    others wait in `waiting` until one of them is written "the pool's done callbacks submit the next ones". The
+    pool is kept until `close` so workbooks can be submitted at any time of the crawl.
+
+    Attributes:
+        processes (int): the number of processes writing the workbooks, 1 writes them in a thread of this process.
+        pool (Executor): the pool of processes, None until the first workbook is submitted.
+        slices_dir (str): the directory of the slice files, a temporary directory by default removed by `close`.
+        workbooks (dict): the workbook of each xlsx file submitted, the latest one if a file was submitted twice.
+        waiting (list): the workbooks waiting for room in the pool along with their columns and slice file.
+        submitted (int): the number of workbooks handed to the pool and not written yet.
+        slices (int): the number of slice files written.
+    """
+
+    def __init__(self, processes: int = 0, slices_dir: Optional[str] = None):
+        """
+        Initializes the exporter.
+
+        Args:
+            processes (int): the number of processes writing the workbooks, 0 for one per CPU core.
+            slices_dir (str): the directory of the slice files, None for a temporary directory.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.pool = None
+        self.slices_dir = slices_dir
+        self.temporary_slices_dir = slices_dir is None
+        self.slices = 0
+        self.workbooks: Dict[str, Future] = {}
+        self.waiting: List[tuple] = []
+        self.submitted = 0
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def write_workbook(file_path: str, columns: List[str], slice_path: str) -> int:
+        """
+        Streams the rows of a slice file into a new workbook and deletes the slice file.
+
+        Args:
+            file_path (str): the directory and name of the xlsx file.
+            columns (list): the header row.
+            slice_path (str): the JSON lines file of the rows, missing values are null.
+
+        Returns:
+            int: the number of rows written.
+        """
+        from openpyxl import Workbook
+
+        try:
+            workbook = Workbook(write_only=True)
+            worksheet = workbook.create_sheet()
+            worksheet.append(columns)
+            rows = 0
+            with open(slice_path, "rb") as slice_file:
+                for line in slice_file:
+                    record = json.loads(line)
+                    worksheet.append([record.get(column) for column in columns])
+                    rows += 1
+            workbook.save(file_path)
+        finally:
+            os.remove(slice_path)
+        return rows
+
+    def export(self, file_path: str, df) -> Future:
+        """
+        Writes the rows of a DataFrame to a slice file "missing values are written as empty cells" and
+        submits its workbook without waiting for it.
+
+        Returns:
+            Future: the pending workbook, its result is the number of rows written.
+        """
+        with self.lock:
+            if self.slices_dir is None:
+                self.slices_dir = tempfile.mkdtemp(prefix="realtor xlsx slices ")
+            os.makedirs(self.slices_dir, exist_ok=True)
+            self.slices += 1
+            slice_path = os.path.join(self.slices_dir, f"{self.slices}.jsonl")
+        df.to_json(slice_path, orient="records", lines=True, date_format="iso")
+        workbook = Future()
+        with self.lock:
+            self.workbooks[file_path] = workbook
+            self.waiting.append((workbook, file_path, list(df.columns), slice_path))
+            self.__submit_waiting()
+        return workbook
+
+    def __submit_waiting(self) -> None:
+        """
+        Hands the waiting workbooks to the pool while fewer than a couple of workbooks per process are in it.
+        """
+        with self.lock:
+            while self.waiting and self.submitted < 2 * self.processes:
+                workbook, file_path, columns, slice_path = self.waiting.pop(0)
+                if self.pool is None:
+                    # spawned rather than forked, the crawling process runs the reactor threads
+                    self.pool = (
+                        ThreadPoolExecutor(1) if self.processes <= 1
+                        else ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+                    )
+                try:
+                    written = self.pool.submit(self.write_workbook, file_path, columns, slice_path)
+                except Exception as error:
+                    # e.g. a broken pool, the workbook fails instead of never being written
+                    os.remove(slice_path)
+                    workbook.set_exception(error)
+                    continue
+                self.submitted += 1
+                written.add_done_callback(partial(self.__written, workbook))
+
+    def __written(self, workbook: Future, written: Future) -> None:
+        """
+        Passes the outcome of a written workbook on to its future and submits the next waiting workbook.
+        """
+        with self.lock:
+            self.submitted -= 1
+            self.__submit_waiting()
+        if written.exception() is not None:
+            workbook.set_exception(written.exception())
+        else:
+            workbook.set_result(written.result())
+
+    def wait(self, file_paths: List[str]) -> None:
+        """
+        Waits for the pending workbooks of the given xlsx files, if any.
+        """
+        with self.lock:
+            workbooks = [self.workbooks[file_path] for file_path in file_paths if file_path in self.workbooks]
+        futures.wait(workbooks)
+
+    def close(self) -> Dict[str, BaseException]:
+        """
+        Waits for all the pending workbooks, shuts the pool down and removes the temporary slices directory.
+
+        Returns:
+            dict: the error of each xlsx file whose workbook failed.
+        """
+        with self.lock:
+            workbooks = dict(self.workbooks)
+        futures.wait(workbooks.values())
+        with self.lock:
+            self.workbooks = {}
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+            if self.temporary_slices_dir and self.slices_dir is not None:
+                shutil.rmtree(self.slices_dir, ignore_errors=True)
+                self.slices_dir = None
+        return {file_path: workbook.exception() for file_path, workbook in workbooks.items() if workbook.exception() is not None}
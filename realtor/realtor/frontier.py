@@ -0,0 +1,361 @@
+"""
+This module defines the shared work frontier that lets several spider processes "workers" crawl together.
+
+The work is split into units of a state × a listing type × a page range stored in a single SQLite file
+"FRONTIER", the workers on one host "or on several hosts sharing the file over a filesystem with working
+locks" claim the units in a locked transaction, publish their own partial outputs and report the units done
+"only once their outputs are published", the partial outputs are merged by the last worker to finish. The first page of a search is a unit of its own, the worker that
+requests it publishes the rest of the search as page range units "or as the price bands of a big search"
+for all the workers to claim.
+
+A claimed unit is leased for `FRONTIER_LEASE_SECONDS`, the lease is renewed while the worker processes its
+requests, the units of a dead worker are claimed again by the other workers once their leases expire.
+
+Classes:
+    WorkFrontier: Stores the work units and the workers of the crawls.
+    FrontierStatesQueue: A states queue handing out the units claimed from the frontier.
+"""
+
+import json
+import os
+import sqlite3
+from time import time
+from typing import Dict, List, Optional
+
+from realtor.states_queue import StatesQueue
+
+
+class WorkFrontier:
+    """
+    The work units and workers of the crawls backed by SQLite.
+
+    The journal is kept in the default rollback mode rather than WAL so the file can be shared between hosts.
+
+    Attributes:
+        path (str): the directory and name of the frontier file.
+        lease_seconds (float): the seconds a claimed unit stays claimed without being renewed.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300):
+        """
+        Opens "or creates" the frontier file.
+
+        Args:
+            path (str): the directory and name of the frontier file.
+            lease_seconds (float): the seconds a claimed unit stays claimed without being renewed.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS units (
+                unit_id INTEGER PRIMARY KEY,
+                crawl TEXT NOT NULL,
+                state TEXT NOT NULL,
+                listing_type TEXT NOT NULL,
+                price_band TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                end INTEGER,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (crawl, state, listing_type, price_band, start)
+            );
+            CREATE INDEX IF NOT EXISTS units_status ON units (crawl, status, lease_expires);
+            CREATE TABLE IF NOT EXISTS workers (
+                crawl TEXT NOT NULL,
+                worker TEXT NOT NULL,
+                last_seen REAL NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (crawl, worker)
+            );
+            CREATE TABLE IF NOT EXISTS crawls (
+                crawl TEXT PRIMARY KEY,
+                merged INTEGER NOT NULL DEFAULT 0
+            );"""
+        )
+
+    def publish(self, crawl: str, state_name: str, listing_type: str, price_band: Optional[tuple], ranges: List[tuple]) -> int:
+        """
+        Adds the units of a search, a unit already published by another worker is ignored.
+
+        Args:
+            crawl (str): the id of the crawl.
+            state_name (str): the name of the state.
+            listing_type (str): the listing type searched.
+            price_band (tuple): the price band of the search, None for all prices.
+            ranges (list): the (start, end) offsets of each unit, an end of None is the first page of the search.
+
+        Returns:
+            int: the number of units added.
+        """
+        cursor = self.connection.executemany(
+            "INSERT OR IGNORE INTO units (crawl, state, listing_type, price_band, start, end) VALUES (?, ?, ?, ?, ?, ?)",
+            [(crawl, state_name, listing_type, json.dumps(price_band), start, end) for start, end in ranges],
+        )
+        return cursor.rowcount
+
+    def seed(self, crawl: str, states: List[str], listing_types: List[str]) -> int:
+        """
+        Adds the first page unit of each state and listing type.
+        """
+        return sum(self.publish(crawl, state_name, listing_type, None, [(0, None)]) for state_name in states for listing_type in listing_types)
+
+    def claim(self, crawl: str, worker: str, skip_states: List[str]) -> Optional[dict]:
+        """
+        Claims the oldest pending unit "or a unit whose lease expired" of a state the worker isn't crawling.
+
+        Returns:
+            dict: the claimed unit, None if there is no unit to claim.
+        """
+        now = time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                f"""SELECT unit_id, state, listing_type, price_band, start, end FROM units
+                    WHERE crawl = ? AND (status = 'pending' OR (status = 'claimed' AND lease_expires < ?))
+                    AND state NOT IN ({",".join("?" * len(skip_states))}) ORDER BY unit_id LIMIT 1""",
+                (crawl, now, *skip_states),
+            ).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE units SET status = 'claimed', worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE unit_id = ?",
+                    (worker, now + self.lease_seconds, row[0]),
+                )
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        price_band = json.loads(row[3])
+        return {
+            "unit_id": row[0], "state": row[1], "listing_type": row[2],
+            "price_band": tuple(price_band) if price_band is not None else None, "start": row[4], "end": row[5],
+        }
+
+    def heartbeat(self, crawl: str, worker: str, unit_ids: List[int]) -> None:
+        """
+        Renews the leases of the worker's units and records that the worker is alive.
+        """
+        now = time()
+        self.connection.executemany(
+            "UPDATE units SET worker = ?, lease_expires = ? WHERE unit_id = ? AND status != 'done'",
+            [(worker, now + self.lease_seconds, unit_id) for unit_id in unit_ids],
+        )
+        self.connection.execute(
+            "INSERT INTO workers (crawl, worker, last_seen) VALUES (?, ?, ?) "
+            "ON CONFLICT (crawl, worker) DO UPDATE SET last_seen = excluded.last_seen, finished = 0",
+            (crawl, worker, now),
+        )
+
+    def complete(self, unit_id: int) -> None:
+        """
+        Marks a unit as done.
+        """
+        self.connection.execute("UPDATE units SET status = 'done', lease_expires = 0 WHERE unit_id = ?", (unit_id,))
+
+    def pending_states(self, crawl: str) -> List[str]:
+        """
+        Lists the states that have units left to claim.
+        """
+        rows = self.connection.execute(
+            "SELECT DISTINCT state FROM units WHERE crawl = ? AND (status = 'pending' OR (status = 'claimed' AND lease_expires < ?)) ORDER BY state",
+            (crawl, time()),
+        )
+        return [state_name for state_name, in rows]
+
+    def has_work(self, crawl: str) -> bool:
+        """
+        Checks whether any unit of the crawl isn't done yet "including the units claimed by the other workers".
+        """
+        return self.connection.execute("SELECT 1 FROM units WHERE crawl = ? AND status != 'done' LIMIT 1", (crawl,)).fetchone() is not None
+
+    def progress(self, crawl: str) -> Dict[str, int]:
+        """
+        Counts the units of the crawl by status.
+        """
+        return dict(self.connection.execute("SELECT status, COUNT(*) FROM units WHERE crawl = ? GROUP BY status", (crawl,)))
+
+    def finish_worker(self, crawl: str, worker: str) -> bool:
+        """
+        Records that the worker finished and checks whether it's the one to merge the partial outputs.
+
+        Returns:
+            bool: True for a single worker, once all the units are done and every other worker
+                finished "or stopped renewing its leases".
+        """
+        now = time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute(
+                "INSERT INTO workers (crawl, worker, last_seen, finished) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (crawl, worker) DO UPDATE SET last_seen = excluded.last_seen, finished = 1",
+                (crawl, worker, now),
+            )
+            busy_workers = self.connection.execute(
+                "SELECT COUNT(*) FROM workers WHERE crawl = ? AND finished = 0 AND last_seen >= ?", (crawl, now - self.lease_seconds)
+            ).fetchone()[0]
+            merged = self.connection.execute("SELECT merged FROM crawls WHERE crawl = ?", (crawl,)).fetchone()
+            merge = not busy_workers and not (merged and merged[0]) and not self.has_work(crawl)
+            if merge:
+                self.connection.execute("INSERT OR REPLACE INTO crawls (crawl, merged) VALUES (?, 1)", (crawl,))
+            self.connection.execute("COMMIT")
+        except BaseException:
+            self.connection.execute("ROLLBACK")
+            raise
+        return merge
+
+    def close(self) -> None:
+        """
+        Closes the frontier file.
+        """
+        self.connection.close()
+
+
+class FrontierStatesQueue(StatesQueue):
+    """
+    A states queue handing out the units claimed from the shared frontier instead of the states of the input file.
+
+    Each state in flight holds one claimed unit, its progress record keeps the unit id along with the first pages
+    "or the page range" of the unit. The searches of a first page unit are published back to the frontier as page
+    range units of `unit_pages` pages "or as the first page units of its price bands" for all the workers to claim.
+    The input file is only read to seed the frontier, it's never rewritten.
+
+    Attributes:
+        frontier (WorkFrontier): the shared work frontier.
+        crawl (str): the id of the crawl the worker takes part in.
+        worker (str): the id of the worker.
+        search_types (list): the listing types searched by the worker.
+        unit_pages (int): the number of search pages in each page range unit.
+        renewed_at (float): the time the leases were last renewed.
+    """
+
+    def __init__(self, frontier: WorkFrontier, crawl: str, worker: str, input_file: str, concurrent_states: int,
+                 in_flight: Dict[str, dict], search_types: List[str], unit_pages: int = 25):
+        """
+        Initializes the queue, seeds the frontier from the input file and renews the units in flight "on resume".
+
+        Args:
+            frontier (WorkFrontier): the shared work frontier.
+            crawl (str): the id of the crawl the worker takes part in.
+            worker (str): the id of the worker.
+            input_file (str): the name and directory of the txt input file.
+            concurrent_states (int): the max number of units crawled at the same time.
+            in_flight (dict): the progress records of the states in flight "restored on resume".
+            search_types (list): the listing types searched by the worker.
+            unit_pages (int): the number of search pages in each page range unit.
+        """
+        super().__init__(input_file, concurrent_states, in_flight)
+        self.frontier = frontier
+        self.crawl = crawl
+        self.worker = worker
+        self.search_types = search_types
+        self.unit_pages = max(1, unit_pages)
+        if os.path.exists(input_file):
+            self.write_states(super().pending_states())
+        self.heartbeat()
+
+    def heartbeat(self) -> None:
+        """
+        Renews the leases of the units in flight.
+        """
+        self.frontier.heartbeat(self.crawl, self.worker, [progress["unit_id"] for progress in self.in_flight.values()])
+        self.renewed_at = time()
+
+    def write_states(self, states: List[str]) -> None:
+        """
+        Seeds the frontier with the first page units of the states.
+        """
+        self.frontier.seed(self.crawl, states, self.search_types)
+
+    def pending_states(self) -> List[str]:
+        """
+        Lists the states that have units left to claim.
+        """
+        return self.frontier.pending_states(self.crawl)
+
+    def next_states(self) -> List[str]:
+        """
+        Claims units of the states the worker isn't crawling while keeping the number of units in flight under `concurrent_states`.
+
+        Returns:
+            list: the names of the states of the claimed units, each of them is registered as in flight.
+        """
+        self.heartbeat()
+        states = []
+        while len(self.in_flight) < self.concurrent_states:
+            unit = self.frontier.claim(self.crawl, self.worker, list(self.in_flight))
+            if unit is None:
+                break
+            first_page = unit["end"] is None
+            self.in_flight[unit["state"]] = {
+                "requests_sent": 0,
+                "requests_received": 0,
+                "pages_available": 0,
+                "results_available": None,
+                "search_totals": {},
+                "pending": {},
+                "page_feeds": [] if first_page else [[unit["listing_type"], unit["price_band"], unit["start"], unit["end"]]],
+                "first_pages": [(unit["listing_type"], unit["price_band"])] if first_page else [],
+                "unit_id": unit["unit_id"],
+            }
+            states.append(unit["state"])
+        return states
+
+    def first_pages(self, state_name: str, search_types: List[str]) -> List[tuple]:
+        """
+        Returns the (listing type, price band) of the search whose first page the state's unit is, if it's a first page unit.
+        """
+        return self.in_flight[state_name]["first_pages"]
+
+    def split_search(self, state_name: str, listing_type: str, price_bands: List[tuple]) -> None:
+        """
+        Publishes the price bands of a big search as first page units, none of them is requested by this unit.
+        """
+        for price_band in price_bands:
+            self.frontier.publish(self.crawl, state_name, listing_type, price_band, [(0, None)])
+
+    def add_pages(self, state_name: str, listing_type: str, price_band: Optional[tuple], start: int, end: int) -> None:
+        """
+        Publishes the search pages after the first one as page range units of `unit_pages` pages,
+        `start` is the offset after the first page so it's the size of the pages too.
+        """
+        unit_size = self.unit_pages * max(1, start)
+        ranges = [(offset, min(offset + unit_size, end)) for offset in range(start, end, unit_size)]
+        if ranges:
+            self.frontier.publish(self.crawl, state_name, listing_type, price_band, ranges)
+
+    def request_received(self, state_name: str, cursor_id: Optional[int] = None) -> None:
+        """
+        Records that a request of the state was processed and renews the leases every third of the lease.
+        """
+        super().request_received(state_name, cursor_id)
+        if time() - self.renewed_at > self.frontier.lease_seconds / 3:
+            self.heartbeat()
+
+    def mark_done(self, state_name: str) -> None:
+        """
+        Marks the unit of the state as done in the frontier, the spider publishes the unit's outputs first.
+        """
+        if state_name in self.in_flight:
+            self.frontier.complete(self.in_flight[state_name]["unit_id"])
+            self.completed[state_name] = self.in_flight.pop(state_name)
+
+    def has_work(self) -> bool:
+        """
+        Checks whether there are units in flight or any unit of the crawl isn't done yet.
+        """
+        return bool(self.in_flight) or self.frontier.has_work(self.crawl)
+
+    def finish(self) -> bool:
+        """
+        Records that the worker finished.
+
+        Returns:
+            bool: True if it's the worker to merge the partial outputs of the crawl.
+        """
+        return self.frontier.finish_worker(self.crawl, self.worker)
@@ -0,0 +1,174 @@
+"""
+This module defines the pool of scraping headers shared by the requests of the spider.
+
+Each header set harvested by `GetHeaders` is kept in the pool along with its success and failure counters,
+the requests are spread over the active sets and a set is retired once it fails several times in a row,
+so one burned set of "traceparent", "newrelic" and "user-agent" headers does not stop the entire crawl.
+The pool is saved to a JSON file so the harvested sets survive between runs.
+
+Classes:
+    HeadersPool: Stores, assigns and retires the scraping header sets.
+"""
+
+import json
+import os
+from itertools import count
+from time import time
+from typing import Dict, List, Literal, Optional
+
+
+class HeadersPool:
+    """
+    A pool of scraping header sets with per-set success and failure counters.
+
+    Attributes:
+        path (str): the directory and name of the JSON file of the pool.
+        target_size (int): the number of active header sets the pool should be kept at.
+        retire_after (int): the number of consecutive failures after which a header set is retired.
+        strategy (Literal["round_robin", "least_recently_failed"]): how the header sets are assigned to the requests.
+        header_sets (list): the active header sets, each one is a dict of its id, headers and counters.
+    """
+
+    def __init__(self, path: str, target_size: int = 3, retire_after: int = 3,
+                 strategy: Literal["round_robin", "least_recently_failed"] = "least_recently_failed",
+                 legacy_path: Optional[str] = None):
+        """
+        Initializes the pool and loads the saved header sets.
+
+        Args:
+            path (str): the directory and name of the JSON file of the pool.
+            target_size (int): the number of active header sets the pool should be kept at.
+            retire_after (int): the number of consecutive failures after which a header set is retired.
+            strategy (str): "round_robin" or "least_recently_failed".
+            legacy_path (str): a JSON file of a single header set used to seed the pool if it is not saved yet.
+        """
+        self.path = path
+        self.target_size = max(1, target_size)
+        self.retire_after = max(1, retire_after)
+        self.strategy = strategy
+        self.header_sets: List[dict] = []
+        self.round_robin = count()
+        self.next_id = 0
+        self.load(legacy_path)
+
+    def load(self, legacy_path: Optional[str] = None) -> None:
+        """
+        Loads the header sets from the pool file, or seeds the pool from the legacy single header set file.
+        """
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                saved_pool = json.load(f)
+            self.next_id = saved_pool["next_id"]
+            self.header_sets = saved_pool["header_sets"]
+        elif legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path, "r") as f:
+                self.add(json.load(f))
+
+    def save(self) -> None:
+        """
+        Saves the active header sets and their counters to the pool file.
+        """
+        with open(self.path, "w") as f:
+            json.dump({"next_id": self.next_id, "header_sets": self.header_sets}, f, indent=4)
+
+    def add(self, headers: Dict[str, str]) -> int:
+        """
+        Adds a freshly harvested header set to the pool.
+
+        Args:
+            headers (dict): the harvested headers.
+
+        Returns:
+            int: the id of the new header set.
+        """
+        header_set = {
+            "id": self.next_id,
+            "headers": headers,
+            "uses": 0,
+            "successes": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "last_failure": 0,
+        }
+        self.next_id += 1
+        self.header_sets.append(header_set)
+        self.save()
+        return header_set["id"]
+
+    def acquire(self) -> dict:
+        """
+        Picks the header set of the next request.
+
+        Returns:
+            dict: the picked header set.
+
+        Raises:
+            IndexError: If the pool has no active header sets.
+        """
+        if not self.header_sets:
+            raise IndexError("the headers pool is empty!")
+        if self.strategy == "round_robin":
+            header_set = self.header_sets[next(self.round_robin) % len(self.header_sets)]
+        else:
+            header_set = min(self.header_sets, key=self.__least_recently_failed)
+        header_set["uses"] += 1
+        return header_set
+
+    @staticmethod
+    def __least_recently_failed(header_set: dict) -> tuple:
+        """
+        Ranks the header sets so the least used of the healthy sets is picked first,
+        then the set whose last failure is the oldest.
+        """
+        failing = header_set["consecutive_failures"] > 0
+        return (failing, header_set["last_failure"] if failing else 0, header_set["uses"])
+
+    def __find(self, headers_id: Optional[int]) -> Optional[dict]:
+        """
+        Finds an active header set by its id.
+        """
+        for header_set in self.header_sets:
+            if header_set["id"] == headers_id:
+                return header_set
+        return None
+
+    def is_active(self, headers_id: Optional[int]) -> bool:
+        """
+        Checks whether a header set is still in the pool.
+        """
+        return self.__find(headers_id) is not None
+
+    def record_success(self, headers_id: Optional[int]) -> None:
+        """
+        Records a successful request made with a header set.
+        """
+        if (header_set := self.__find(headers_id)):
+            header_set["successes"] += 1
+            header_set["consecutive_failures"] = 0
+
+    def record_failure(self, headers_id: Optional[int]) -> bool:
+        """
+        Records a failed request made with a header set and retires the set if it keeps failing.
+
+        Returns:
+            bool: True if the header set was retired.
+        """
+        if not (header_set := self.__find(headers_id)):
+            return False
+        header_set["failures"] += 1
+        header_set["consecutive_failures"] += 1
+        header_set["last_failure"] = time()
+        if header_set["consecutive_failures"] >= self.retire_after:
+            self.header_sets.remove(header_set)
+            self.save()
+            return True
+        return False
+
+    def needs_replenishing(self) -> bool:
+        """
+        Checks whether the pool is below its target size.
+        """
+        return len(self.header_sets) < self.target_size
+
+    def __len__(self) -> int:
+        return len(self.header_sets)
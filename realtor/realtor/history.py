@@ -0,0 +1,249 @@
+"""
+This module defines the append-only history of the price and status of the scraped listings.
+
+Every listing scraped by a run is recorded as an observation "its price, status, sold date, state and zip
+code on the run date" in a single SQLite file keyed by the run date and the listing property_id and listing_id.
+The observations are never updated, so the changes of the listings between the runs can be queried:
+- the price drops of the listings observed on a run.
+- the status changes "for_sale -> pending -> sold" of the properties observed on a run, a property relisted or
+  sold under a new listing_id is compared to the listings it had on its previous run.
+- the new arrivals, the listings observed on a run for the first time.
+- the whole history of a listing.
+
+The observations of a run are inserted in batches, each one in a single transaction, only the raw observations
+are stored and the previous run of each listing "or property" is derived when a run is queried, so the runs can be
+ingested in any order "a late or re-ingested run never leaves stale previous values behind". A query only reads the
+observations of the queried run and seeks the previous observation of each one in the `observations_property` index
+"the observations of a property by run", its time grows with the size of the run, not with the number of runs recorded.
+
+Classes:
+    ListingsHistory: Records the observations of the scraped listings and queries their changes.
+"""
+
+import os
+import sqlite3
+from typing import Iterable, List, Optional
+
+
+class ListingsHistory:
+    """
+    An append-only store of the observations of the scraped listings backed by SQLite.
+
+    Attributes:
+        OBSERVATION_FIELDS (tuple): the fields of an observation passed to `add`, in order.
+        path (str): the directory and name of the history file.
+        added (int): the number of observations added through this instance.
+    """
+    OBSERVATION_FIELDS = ("property_id", "listing_id", "state", "zip_code", "listing_types", "price", "status", "sold_date")
+    added = 0
+
+    def __init__(self, path: str):
+        """
+        Opens "or creates" the history file.
+
+        Args:
+            path (str): the directory and name of the history file.
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # the workers sharing a frontier may add their observations at the same time
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """CREATE TABLE IF NOT EXISTS observations (
+                run_date TEXT NOT NULL,
+                property_id TEXT NOT NULL,
+                listing_id TEXT NOT NULL,
+                state TEXT,
+                zip_code TEXT,
+                listing_types TEXT,
+                price INTEGER,
+                status TEXT,
+                sold_date TEXT,
+                PRIMARY KEY (run_date, property_id, listing_id)
+            ) WITHOUT ROWID;
+            DROP INDEX IF EXISTS observations_listing;
+            CREATE INDEX IF NOT EXISTS observations_property ON observations (property_id, run_date, listing_id, price, status);
+            CREATE INDEX IF NOT EXISTS observations_area ON observations (run_date, state, zip_code);
+            CREATE TABLE IF NOT EXISTS runs (
+                run_date TEXT PRIMARY KEY,
+                observations INTEGER NOT NULL
+            ) WITHOUT ROWID;"""
+        )
+
+    def add(self, run_date: str, observations: Iterable[tuple]) -> int:
+        """
+        Appends the observations of a run in a single transaction, a listing already observed on the
+        run date "e.g. scraped again after a resume or by two listing types" keeps its first observation.
+
+        Args:
+            run_date (str): the ISO date of the run.
+            observations (iterable): the observations, tuples of the `OBSERVATION_FIELDS`.
+
+        Returns:
+            int: the number of observations added.
+        """
+        with self.connection:
+            added = self.connection.executemany(
+                f"""INSERT OR IGNORE INTO observations (run_date, {", ".join(self.OBSERVATION_FIELDS)})
+                VALUES (?, {", ".join("?" * len(self.OBSERVATION_FIELDS))})""",
+                ((run_date, *observation) for observation in observations),
+            ).rowcount
+            self.connection.execute(
+                "INSERT INTO runs VALUES (?, ?) ON CONFLICT (run_date) DO UPDATE SET observations = observations + excluded.observations",
+                (run_date, added),
+            )
+        self.added += added
+        return added
+
+    def runs(self) -> List[str]:
+        """
+        Returns the dates of the recorded runs, oldest first.
+        """
+        return [row[0] for row in self.connection.execute("SELECT run_date FROM runs ORDER BY run_date")]
+
+    def latest_run(self) -> Optional[str]:
+        """
+        Returns the date of the latest recorded run, None if the history is empty.
+        """
+        return self.connection.execute("SELECT MAX(run_date) FROM runs").fetchone()[0]
+
+    @staticmethod
+    def __filters(state: Optional[str], zip_code: Optional[str]) -> tuple:
+        """
+        Builds the SQL filters of the state and zip code of the current observations.
+        """
+        filters, parameters = "", ()
+        if state:
+            filters, parameters = filters + " AND current.state = ?", parameters + (state,)
+        if zip_code:
+            filters, parameters = filters + " AND current.zip_code = ?", parameters + (zip_code,)
+        return filters, parameters
+
+    def __changes(self, run_date: Optional[str], since: Optional[str], state: Optional[str], zip_code: Optional[str],
+                  keys: tuple, condition: str, parameters: tuple, order: str) -> List[dict]:
+        """
+        Selects the listings observed on a run whose observation meets a condition against their previous observation.
+
+        The observations of the run are read first, the previous run of each one "the last run of its listing or of its
+        property before the run, see `keys`" is then found with a backward seek in the `observations_property` index. A property
+        is compared to its observation of the same listing on that run, or to all of its listings of that run if the
+        listing is new "e.g. it was sold under a new listing_id".
+
+        Args:
+            run_date (str): the date of the run, the latest run by default.
+            since (str): the observations are compared to the last run on or before this date "of each listing or
+                property", to the last run before the run by default.
+            state (str): only the listings of this state "as scraped e.g. New York".
+            zip_code (str): only the listings of this zip code.
+            keys (tuple): the columns the runs are followed by, ("property_id", "listing_id") or ("property_id",).
+            condition (str): the SQL condition on the `current` and `previous` observations.
+            parameters (tuple): the parameters of the condition.
+            order (str): the SQL order of the listings.
+
+        Returns:
+            list: the listings with their current and previous price, status and run date.
+        """
+        run_date = run_date or self.latest_run()
+        filters, filter_parameters = self.__filters(state, zip_code)
+        earlier = " AND ".join(f"earlier.{key} = current.{key}" for key in keys) + " AND earlier.run_date < current.run_date"
+        earlier_parameters = ()
+        if since:
+            earlier, earlier_parameters = earlier + " AND earlier.run_date <= ?", (since,)
+        if "listing_id" in keys:
+            same_listing = "previous.listing_id = current.listing_id"
+        else:
+            same_listing = """(previous.listing_id = current.listing_id OR NOT EXISTS (
+                SELECT 1 FROM observations INDEXED BY observations_property
+                WHERE property_id = current.property_id AND run_date = previous.run_date AND listing_id = current.listing_id
+            ))"""
+        rows = self.connection.execute(
+            f"""SELECT current.property_id, current.listing_id, current.state, current.zip_code, current.listing_types,
+                    previous.listing_id AS previous_listing_id, previous.run_date AS previous_run_date, current.run_date,
+                    previous.price AS previous_price, current.price,
+                    previous.status AS previous_status, current.status, current.sold_date
+                FROM (
+                    SELECT current.*, (
+                        SELECT earlier.run_date FROM observations AS earlier INDEXED BY observations_property
+                        WHERE {earlier} ORDER BY earlier.run_date DESC LIMIT 1
+                    ) AS previous_run_date
+                    FROM observations AS current WHERE current.run_date = ?{filters}
+                ) AS current
+                JOIN observations AS previous INDEXED BY observations_property
+                    ON previous.property_id = current.property_id AND previous.run_date = current.previous_run_date AND {same_listing}
+                WHERE {condition}
+                ORDER BY {order}""",
+            earlier_parameters + (run_date,) + filter_parameters + parameters,
+        )
+        return [dict(row) for row in rows]
+
+    def price_drops(self, run_date: Optional[str] = None, since: Optional[str] = None, state: Optional[str] = None,
+                    zip_code: Optional[str] = None, min_drop: int = 0) -> List[dict]:
+        """
+        Finds the listings whose price dropped by more than `min_drop` since their previous run, the biggest drops first.
+
+        Returns:
+            list: the listings with their current and previous price, status and run date.
+        """
+        return self.__changes(
+            run_date, since, state, zip_code, ("property_id", "listing_id"),
+            "previous.price - current.price > ?", (min_drop,),
+            "previous.price - current.price DESC",
+        )
+
+    def status_changes(self, run_date: Optional[str] = None, since: Optional[str] = None, state: Optional[str] = None,
+                       zip_code: Optional[str] = None, from_status: Optional[str] = None, to_status: Optional[str] = None) -> List[dict]:
+        """
+        Finds the properties whose status changed since their previous run "only from `from_status` and to `to_status`
+        if given e.g. to sold", a property sold or relisted under a new listing_id is found too.
+
+        Returns:
+            list: the listings with their current and previous listing_id, price, status and run date.
+        """
+        condition, parameters = "current.status IS NOT previous.status", ()
+        if from_status:
+            condition, parameters = condition + " AND previous.status = ?", parameters + (from_status,)
+        if to_status:
+            condition, parameters = condition + " AND current.status = ?", parameters + (to_status,)
+        return self.__changes(run_date, since, state, zip_code, ("property_id",), condition, parameters, "current.property_id, previous.listing_id")
+
+    def new_arrivals(self, run_date: Optional[str] = None, state: Optional[str] = None, zip_code: Optional[str] = None) -> List[dict]:
+        """
+        Finds the listings observed on a run "the latest run by default" for the first time.
+
+        Returns:
+            list: the observations of the new listings.
+        """
+        filters, parameters = self.__filters(state, zip_code)
+        rows = self.connection.execute(
+            f"""SELECT current.* FROM observations AS current
+                WHERE current.run_date = ?{filters} AND NOT EXISTS (
+                    SELECT 1 FROM observations AS previous INDEXED BY observations_property
+                    WHERE previous.property_id = current.property_id AND previous.listing_id = current.listing_id
+                    AND previous.run_date < current.run_date
+                )
+                ORDER BY current.property_id""",
+            (run_date or self.latest_run(),) + parameters,
+        )
+        return [dict(row) for row in rows]
+
+    def listing_history(self, property_id: str, listing_id: Optional[str] = None) -> List[dict]:
+        """
+        Returns the observations of a property "of one of its listings if `listing_id` is given", oldest first.
+        """
+        if listing_id:
+            rows = self.connection.execute(
+                "SELECT * FROM observations WHERE property_id = ? AND listing_id = ? ORDER BY run_date", (property_id, listing_id)
+            )
+        else:
+            rows = self.connection.execute("SELECT * FROM observations WHERE property_id = ? ORDER BY run_date, listing_id", (property_id,))
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        """
+        Closes the history file.
+        """
+        self.connection.close()
@@ -3,44 +3,127 @@ Realtor Scraper Items
 
 This module defines the models for the items scraped from Realtor.com.
 It includes the definition of the Listing_Item class which represents the data structure for each listing,
-and the RealtorItemLoader class for processing item data during the scraping process.
+and the ExtractionPlan class which fills the listing items from the decoded API responses.
 """
 
-import scrapy
-from itemloaders.processors import TakeFirst, MapCompose, Join, Identity
-from scrapy.loader import ItemLoader
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple, Union
 
-class RealtorItemLoader(ItemLoader):
-    """
-    Custom ItemLoader for processing scraped data.
-    The default output processor is set to TakeFirst, which retrieves the first non-null/non-empty value from the list of values.
-    """
-    default_output_processor = TakeFirst()
 
-class Listing_Item(scrapy.Item):
+@dataclass(slots=True)
+class Listing_Item:
     """
     Data model for the real estate listings scraped from Realtor.com.
     Each field represents a piece of information about a listing.
+
+    It's a slotted dataclass rather than a scrapy.Item so building one costs a single
+    constructor call, the pipelines and exporters handle it through ItemAdapter.
+    """
+    state: Any = None
+    price: Any = None
+    URL: Any = None
+    property_id: Any = None
+    listing_id: Any = None
+    type: Any = None
+    year_built: Any = None
+    street: Any = None
+    city: Any = None
+    state_code: Any = None
+    zip_code: Any = None
+    bedrooms: Any = None
+    bathrooms: Any = None
+    sqft: Any = None
+    parameter: Any = None
+    agent: Any = None
+    office: Any = None
+    agent_email: Any = None
+    office_email: Any = None
+    sold_date: Any = None
+    status: Any = None
+    days_on_realtor: Any = None
+    listing_types: Any = None
+
+
+class ExtractionPlan:
     """
-    state = scrapy.Field()
-    price = scrapy.Field()
-    URL = scrapy.Field()
-    property_id = scrapy.Field()
-    listing_id = scrapy.Field()
-    type = scrapy.Field()
-    year_built = scrapy.Field()
-    street = scrapy.Field()
-    city = scrapy.Field()
-    state_code = scrapy.Field()
-    zip_code = scrapy.Field()
-    bedrooms = scrapy.Field()
-    bathrooms = scrapy.Field()
-    sqft = scrapy.Field()
-    parameter = scrapy.Field()
-    agent = scrapy.Field()
-    office = scrapy.Field()
-    agent_email = scrapy.Field()
-    office_email = scrapy.Field()
-    sold_date = scrapy.Field()
-    status = scrapy.Field()
-    days_on_realtor = scrapy.Field()
+    A precompiled map of the Listing_Item fields to their paths in a decoded JSON response.
+
+    Each path like "data.home.advertisers[0].name" is compiled once into a tuple of keys and
+    indexes walked with plain dict and list access, a field given more than one path takes the
+    first non-null/non-empty value, the same as the TakeFirst output processor.
+
+    Attributes:
+        plan (list): the field names and the compiled paths of each one of them.
+    """
+
+    def __init__(self, field_paths: List[Tuple[str, str]], prefix: str = ""):
+        """
+        Compiles the field paths.
+
+        Args:
+            field_paths (list): (field name, path) pairs, a field can be repeated for fallback paths.
+            prefix (str): a path prepended to all the paths "e.g. data.home".
+        """
+        compiled = {}
+        for field, path in field_paths:
+            compiled.setdefault(field, []).append(self.compile(f"{prefix}.{path}" if prefix else path))
+        self.plan = [(field, tuple(paths)) for field, paths in compiled.items()]
+
+    @staticmethod
+    def compile(path: str) -> Tuple[Union[str, int], ...]:
+        """
+        Compiles a dotted path with list indexes into a tuple of keys and indexes.
+
+        Args:
+            path (str): the path e.g. "data.home.advertisers[0].name".
+
+        Returns:
+            tuple: the keys and indexes e.g. ("data", "home", "advertisers", 0, "name").
+        """
+        steps = []
+        for part in path.split("."):
+            key, _, indexes = part.partition("[")
+            if key:
+                steps.append(key)
+            for index in filter(None, indexes.replace("]", "").split("[")):
+                steps.append(int(index))
+        return tuple(steps)
+
+    @staticmethod
+    def resolve(data: Any, steps: Tuple[Union[str, int], ...]) -> Optional[Any]:
+        """
+        Walks the compiled path through the decoded JSON.
+
+        Returns:
+            the value at the path, None if any step is missing.
+        """
+        for step in steps:
+            try:
+                data = data[step]
+            except (KeyError, IndexError, TypeError):
+                return None
+            if data is None:
+                return None
+        return data
+
+    def extract(self, data: Any, listing_item: Optional[Listing_Item] = None) -> Listing_Item:
+        """
+        Fills a listing item from the decoded JSON.
+
+        Args:
+            data: the decoded JSON response or search result.
+            listing_item (Listing_Item): an item to fill, a new one is created if not given.
+
+        Returns:
+            Listing_Item: the filled item.
+        """
+        if listing_item is None:
+            listing_item = Listing_Item()
+        resolve = self.resolve
+        for field, paths in self.plan:
+            for steps in paths:
+                value = resolve(data, steps)
+                if value is not None and value != "":
+                    setattr(listing_item, field, value)
+                    break
+        return listing_item
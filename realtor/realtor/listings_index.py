@@ -0,0 +1,145 @@
+"""
+This module defines the persistent index of the listings scraped in the previous runs.
+
+The index is a single SQLite file keyed by the listing property_id and listing_id, for each listing
+it keeps the last seen price, status, list date, sold date, a hash of them and the scraped item,
+so a listing whose search result did not change since the last run can be emitted from the index
+instead of requesting the listings API again.
+
+Classes:
+    ListingsIndex: Stores and looks up the previously scraped listings.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import date
+from typing import Optional
+
+
+class ListingsIndex:
+    """
+    An on-disk index of the scraped listings backed by SQLite.
+
+    Attributes:
+        path (str): the directory and name of the index file.
+        commit_every (int): the number of writes buffered before committing them.
+        hits (int): the number of listings found unchanged in the index.
+        misses (int): the number of listings not found or changed.
+    """
+    hits = 0
+    misses = 0
+
+    def __init__(self, path: str, commit_every: int = 500):
+        """
+        Opens "or creates" the index file.
+
+        Args:
+            path (str): the directory and name of the index file.
+            commit_every (int): the number of writes buffered before committing them.
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.pending_writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS listings (
+                listing_key TEXT PRIMARY KEY,
+                price INTEGER,
+                status TEXT,
+                list_date TEXT,
+                sold_date TEXT,
+                content_hash TEXT NOT NULL,
+                item TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            ) WITHOUT ROWID"""
+        )
+
+    @staticmethod
+    def listing_key(listing: dict) -> str:
+        """
+        Builds the index key of a search result.
+        """
+        return f"{listing.get('property_id')}:{listing.get('listing_id')}"
+
+    @staticmethod
+    def listing_signature(listing: dict) -> tuple:
+        """
+        Extracts the values that change when a listing is updated from a search result.
+
+        Returns:
+            tuple: the price, status, list date and sold date of the listing.
+        """
+        description = listing.get("description") or {}
+        return (
+            listing.get("list_price"),
+            listing.get("status"),
+            listing.get("list_date"),
+            listing.get("last_sold_date") or description.get("sold_date"),
+        )
+
+    @staticmethod
+    def content_hash(signature: tuple) -> str:
+        """
+        Hashes the signature of a listing.
+        """
+        return hashlib.blake2b(json.dumps(signature, default=str).encode(), digest_size=8).hexdigest()
+
+    def lookup(self, listing_key: str, content_hash: str) -> Optional[dict]:
+        """
+        Looks up an unchanged listing in the index.
+
+        Args:
+            listing_key (str): the index key of the listing.
+            content_hash (str): the hash of the listing signature in the current search results.
+
+        Returns:
+            dict: the stored item if the listing did not change, None otherwise.
+        """
+        row = self.connection.execute(
+            "SELECT content_hash, item FROM listings WHERE listing_key = ?", (listing_key,)
+        ).fetchone()
+        if row and row[0] == content_hash:
+            self.hits += 1
+            return json.loads(row[1])
+        self.misses += 1
+        return None
+
+    def store(self, listing_key: str, signature: tuple, content_hash: str, item: dict) -> None:
+        """
+        Adds or updates a listing in the index.
+
+        Args:
+            listing_key (str): the index key of the listing.
+            signature (tuple): the price, status, list date and sold date of the listing.
+            content_hash (str): the hash of the listing signature.
+            item (dict): the scraped item of the listing.
+        """
+        price, status, list_date, sold_date = signature
+        self.connection.execute(
+            "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (listing_key, price, status, list_date, sold_date, content_hash,
+             json.dumps(item, default=str), date.today().isoformat()),
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Commits the buffered writes.
+        """
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self) -> None:
+        """
+        Commits the buffered writes and closes the index file.
+        """
+        self.commit()
+        self.connection.close()
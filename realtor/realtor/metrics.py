@@ -0,0 +1,267 @@
+"""
+This module defines the live metrics of a crawl in the Prometheus text format.
+
+The metrics are served by a small HTTP endpoint on the reactor "http://127.0.0.1:<METRICS_PORT>/metrics"
+while the spider is running and dumped to `METRICS_FILE` when it is closed, so an unattended crawl can be
+told apart from a stuck one: the request rates and latencies of each endpoint, the scheduler queue depth,
+the items throughput of the pipeline, the time paused for header refresh and the progress of each state.
+
+Classes:
+    CrawlMetrics: A Scrapy extension collecting the crawl metrics and serving them.
+"""
+
+import os
+from time import time
+from typing import Dict, List
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import reactor
+from twisted.internet.error import CannotListenError
+from twisted.internet.task import LoopingCall
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+
+class MetricsResource(Resource):
+    """
+    Serves the rendered metrics on any path.
+    """
+    isLeaf = True
+
+    def __init__(self, metrics):
+        super().__init__()
+        self.metrics = metrics
+
+    def render_GET(self, request):
+        request.setHeader(b"content-type", b"text/plain; version=0.0.4; charset=utf-8")
+        return self.metrics.render().encode()
+
+
+class CrawlMetrics:
+    """
+    Collects the crawl metrics from the Scrapy signals, the crawl stats and the spider's states queue,
+    the completed states keep their final progress until the spider is closed.
+
+    The request rates and items/sec are computed every `METRICS_INTERVAL` seconds from the counters,
+    the counters themselves are exported too so Prometheus can compute its own rates.
+
+    Attributes:
+        LATENCY_BUCKETS (tuple): the upper bounds of the latency histogram buckets in seconds.
+        requests (dict): the number of responses of each (endpoint, status).
+        latency_buckets (dict): the cumulative latency histogram of each endpoint.
+        items (int): the number of items that went through the pipeline.
+        state_items (dict): the number of items exported for each state.
+        rates (dict): the requests/sec of each endpoint and the items/sec over the last interval.
+    """
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    port = None
+    spider = None
+
+    def __init__(self, crawler):
+        """
+        Initializes the metrics.
+
+        Args:
+            crawler (scrapy.crawler.Crawler): The Scrapy crawler instance.
+        """
+        self.crawler = crawler
+        self.settings = crawler.settings
+        self.requests: Dict[tuple, int] = {}
+        self.latency_buckets: Dict[str, List[int]] = {}
+        self.latency_sum: Dict[str, float] = {}
+        self.latency_count: Dict[str, int] = {}
+        self.items = 0
+        self.state_items: Dict[str, int] = {}
+        self.rates: Dict[str, float] = {}
+        self.last_sample = (time(), {}, 0)
+        self.started = time()
+        self.sampler = LoopingCall(self.sample_rates)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Factory method to create the extension and connect it to the Scrapy signals.
+
+        Raises:
+            NotConfigured: if `METRICS_ENABLED` is False.
+        """
+        if not crawler.settings.getbool("METRICS_ENABLED", False):
+            raise NotConfigured
+        metrics = cls(crawler)
+        crawler.signals.connect(metrics.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(metrics.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(metrics.response_received, signal=signals.response_received)
+        crawler.signals.connect(metrics.item_scraped, signal=signals.item_scraped)
+        return metrics
+
+    def spider_opened(self, spider):
+        """
+        Starts the rates sampling and the HTTP endpoint "unless `METRICS_PORT` is 0".
+        """
+        self.spider = spider
+        self.sampler.start(self.settings.getfloat("METRICS_INTERVAL", 10), now=False)
+        port = self.settings.getint("METRICS_PORT", 9410)
+        if not port:
+            return
+        try:
+            self.port = reactor.listenTCP(port, Site(MetricsResource(self)), interface=self.settings.get("METRICS_HOST", "127.0.0.1"))
+        except CannotListenError as error:
+            spider.logger.warning(f"the metrics endpoint is not served: {error}")
+
+    def spider_closed(self, spider):
+        """
+        Dumps the final metrics to `METRICS_FILE` and stops the HTTP endpoint.
+        """
+        if self.sampler.running:
+            self.sampler.stop()
+        self.sample_rates()
+        if metrics_file := self.settings.get("METRICS_FILE"):
+            os.makedirs(os.path.dirname(metrics_file) or ".", exist_ok=True)
+            with open(metrics_file, "w") as f:
+                f.write(self.render())
+        if self.port is not None:
+            return self.port.stopListening()
+
+    def request_endpoint(self, request):
+        """
+        Returns the name of the endpoint a request is sent to "search", "hulk" or "other".
+        """
+        if request.url == self.spider.Primary_API:
+            return "search"
+        if request.url == self.spider.Secondary_API:
+            return "hulk"
+        return "other"
+
+    def response_received(self, response, request, spider):
+        """
+        Counts the response and adds its download latency to its endpoint's histogram.
+        """
+        endpoint = self.request_endpoint(request)
+        key = (endpoint, response.status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        latency = request.meta.get("download_latency")
+        if latency is None:
+            return
+        buckets = self.latency_buckets.setdefault(endpoint, [0] * len(self.LATENCY_BUCKETS))
+        for index, bound in enumerate(self.LATENCY_BUCKETS):
+            if latency <= bound:
+                buckets[index] += 1
+        self.latency_sum[endpoint] = self.latency_sum.get(endpoint, 0.0) + latency
+        self.latency_count[endpoint] = self.latency_count.get(endpoint, 0) + 1
+
+    def item_scraped(self, item, response, spider):
+        """
+        Counts an item that went through the pipeline under the state it was scraped for.
+        """
+        self.items += 1
+        state_name = response.meta.get("state_name", "unknown")
+        self.state_items[state_name] = self.state_items.get(state_name, 0) + 1
+
+    def sample_rates(self):
+        """
+        Computes the requests/sec of each endpoint and the items/sec since the last sample.
+        """
+        now = time()
+        last_time, last_requests, last_items = self.last_sample
+        elapsed = max(now - last_time, 1e-9)
+        requests = {}
+        for (endpoint, _), count in self.requests.items():
+            requests[endpoint] = requests.get(endpoint, 0) + count
+        self.rates = {endpoint: (count - last_requests.get(endpoint, 0)) / elapsed for endpoint, count in requests.items()}
+        self.rates["items"] = (self.items - last_items) / elapsed
+        self.last_sample = (now, requests, self.items)
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text format.
+        """
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        stats = self.crawler.stats
+        engine = self.crawler.engine
+        states_queue = getattr(self.spider, "states_queue", None)
+        in_flight = states_queue.in_flight if states_queue is not None else {}
+        completed = states_queue.completed if states_queue is not None else {}
+        states_progress = {**completed, **in_flight}
+
+        metric("realtor_up_seconds", "gauge", "Seconds since the spider was opened.", [({}, round(time() - self.started, 3))])
+        metric("realtor_requests_total", "counter", "Responses received from each endpoint by status.",
+               [({"endpoint": endpoint, "status": status}, count) for (endpoint, status), count in sorted(self.requests.items())])
+        metric("realtor_requests_per_second", "gauge", "Responses per second of each endpoint over the last interval.",
+               [({"endpoint": endpoint}, round(rate, 3)) for endpoint, rate in sorted(self.rates.items()) if endpoint != "items"])
+
+        lines.append("# HELP realtor_request_latency_seconds Download latency of each endpoint.")
+        lines.append("# TYPE realtor_request_latency_seconds histogram")
+        for endpoint, buckets in sorted(self.latency_buckets.items()):
+            for bound, count in zip(self.LATENCY_BUCKETS, buckets):
+                lines.append(f'realtor_request_latency_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            lines.append(f'realtor_request_latency_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {self.latency_count[endpoint]}')
+            lines.append(f'realtor_request_latency_seconds_sum{{endpoint="{endpoint}"}} {round(self.latency_sum[endpoint], 6)}')
+            lines.append(f'realtor_request_latency_seconds_count{{endpoint="{endpoint}"}} {self.latency_count[endpoint]}')
+
+        metric("realtor_concurrency_limit", "gauge", "Current adaptive concurrency limit of each endpoint.",
+               [({"endpoint": endpoint}, stats.get_value(f"adaptive_concurrency/{endpoint}/limit"))
+                for endpoint in ("search", "hulk") if stats.get_value(f"adaptive_concurrency/{endpoint}/limit") is not None])
+
+        slot = engine.slot if engine is not None else None
+        metric("realtor_scheduler_queue_depth", "gauge", "Requests waiting in the scheduler.",
+               [({}, len(slot.scheduler) if slot is not None else 0)])
+        metric("realtor_downloader_active", "gauge", "Requests being downloaded.",
+               [({}, len(engine.downloader.active) if engine is not None else 0)])
+
+        metric("realtor_items_total", "counter", "Items that went through Realtor_Pipeline.", [({}, self.items)])
+        metric("realtor_items_per_second", "gauge", "Items per second through Realtor_Pipeline over the last interval.",
+               [({}, round(self.rates.get("items", 0.0), 3))])
+
+        paused_seconds = stats.get_value("headers_refresh/paused_seconds", 0)
+        if paused_at := stats.get_value("headers_refresh/paused_at"):
+            paused_seconds += time() - paused_at
+        metric("realtor_headers_refresh_paused_seconds_total", "counter", "Seconds the engine was paused waiting for fresh headers.",
+               [({}, round(paused_seconds, 3))])
+        metric("realtor_headers_refresh_pauses_total", "counter", "Times the engine was paused waiting for fresh headers.",
+               [({}, stats.get_value("headers_refresh/pauses", 0))])
+        metric("realtor_headers_harvest_seconds", "gauge", "Time-to-fresh-headers of the last headers harvest.",
+               [({}, stats.get_value("headers_harvest/last_seconds", 0))])
+        metric("realtor_headers_harvest_seconds_total", "counter", "Seconds spent harvesting fresh headers.",
+               [({}, round(stats.get_value("headers_harvest/seconds", 0), 3))])
+        metric("realtor_headers_harvests_total", "counter", "Header sets harvested by the browser session.",
+               [({}, stats.get_value("headers_harvest/count", 0))])
+        metric("realtor_headers_pool_active", "gauge", "Active header sets in the headers pool.",
+               [({}, stats.get_value("headers_pool/active", 0))])
+        metric("realtor_headers_pool_retired_total", "counter", "Header sets retired after consecutive failures.",
+               [({}, stats.get_value("headers_pool/retired", 0))])
+
+        if self.spider is not None:
+            metric("realtor_spider_requests_total", "counter", "Requests counted by the spider for each API and direction.", [
+                ({"api": "search", "direction": "sent"}, self.spider.page_requests_sent),
+                ({"api": "search", "direction": "received"}, self.spider.page_requests_received),
+                ({"api": "hulk", "direction": "sent"}, self.spider.listings_requests_sent),
+                ({"api": "hulk", "direction": "received"}, self.spider.listings_requests_received),
+            ])
+
+        states = sorted(states_progress)
+        for field, help_text in (
+            ("results_available", "Listings reported by the search API for each state."),
+            ("pages_available", "Search results pages of each state."),
+            ("requests_sent", "Requests sent for each state."),
+            ("requests_received", "Requests done for each state."),
+        ):
+            metric(f"realtor_state_{field}", "gauge", help_text,
+                   [({"state": state}, states_progress[state][field] or 0) for state in states])
+        metric("realtor_state_items", "gauge", "Items exported for each state.",
+               [({"state": state}, count) for state, count in sorted(self.state_items.items())])
+        metric("realtor_state_progress_ratio", "gauge", "Items exported over the listings reported for each state.", [
+            ({"state": state}, round(min(1.0, self.state_items.get(state, 0) / states_progress[state]["results_available"]), 4))
+            for state in states if states_progress[state]["results_available"]
+        ])
+        metric("realtor_state_done", "gauge", "Whether all the requests of each state are done.",
+               [({"state": state}, int(state in completed)) for state in states])
+        return "\n".join(lines) + "\n"
@@ -6,16 +6,21 @@ Classes:
     RealtorSpiderMiddleware: Middleware for managing spider-level processing of requests and responses.
     RealtorDownloaderMiddleware: Middleware for managing downloader-level processing, including dynamic header updates
                                  and retry mechanisms for failed requests.
+    RealtorCacheMiddleware: Middleware serving the search and listings API responses from a compressed on-disk cache.
+    PersistedQueryMiddleware: Middleware registering the persisted queries the API doesn't know yet.
 """
 
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
 import scrapy
-from time import time, sleep
-from realtor.spiders.headers_extractor import Get_Headers
-import json
-import os
-from typing import Literal
-from fake_useragent import UserAgent as UA
+from time import time
+from twisted.internet import reactor, threads
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.internet.task import deferLater
+from realtor.headers_pool import HeadersPool
+from realtor.concurrency import EndpointConcurrency
+from realtor.response_cache import ResponseCache
+from functools import cached_property
 
 
 class RealtorSpiderMiddleware:
@@ -109,16 +114,38 @@ class RealtorDownloaderMiddleware:
     """
     Downloader middleware for managing request headers, handling retries, and updating scraping headers dynamically.
 
+    The requests are spread over a pool of harvested header sets, a set that keeps failing is retired and the pool is
+    replenished "only once a set is retired" in a thread off the reactor by a warm browser session kept for the whole crawl. The failed requests are re-issued right away with another set, they are
+    only parked "with the engine paused" when the whole pool is burned, until a fresh set arrives. The harvesting thread only drives
+    the browser, the fresh set is added to the pool and the crawl stats are updated back on the reactor thread.
+    A harvest gives up after `HEADERS_HARVEST_ATTEMPTS` attempts, if the whole pool is burned by then the spider is closed,
+    and closing the spider stops the harvest in progress instead of waiting for it.
+
+    With `ADAPTIVE_CONCURRENCY` the search and listings API requests go through their own downloader slots
+    "realtor-search" and "realtor-hulk", each with an AIMD concurrency limit driven by its block signals,
+    so a blocked endpoint backs off without slowing down the other one. The two slots share the concurrency
+    of the single realtor.com slot they replace "CONCURRENT_REQUESTS_PER_DOMAIN", their limits start at half
+    of it and are scaled down together whenever they add up to more.
+
     Attributes:
-        update_number (int): Tracks the number of header updates.
+        headers_pool (HeadersPool): The pool of scraping header sets.
+        endpoints (dict): The adaptive concurrency controller of each endpoint, empty if disabled.
+        domain_concurrency (int): The concurrency the endpoints share, CONCURRENT_REQUESTS_PER_DOMAIN.
+        headers_refresh (Optional[twisted.internet.defer.Deferred]): The headers harvest in progress if any.
+        parked_release (Optional[twisted.internet.defer.Deferred]): The headers update wait of the parked requests if any.
+        harvester (Optional[GetHeaders]): The browser session harvesting the header sets, started by the first harvest.
+        closing (bool): Whether the spider is closed, no harvest is started then.
+        parked_requests (list): The Deferreds of the failed requests waiting for a fresh header set.
         total_requests_made (int): Tracks the total number of requests processed.
         pbar (Optional[Any]): Placeholder for a progress bar or tracking utility.
         fake_ua (fake_useragent.UserAgent): Fake user-agent generator for dynamic user-agent strings.
     """
-    update_number = 0
+    headers_refresh = None
+    parked_release = None
+    harvester = None
+    closing = False
     total_requests_made = 0
     pbar = None
-    fake_ua = UA(os="macos", browsers="safari")
 
     def __init__(self, crawler):
         """
@@ -133,14 +160,36 @@ class RealtorDownloaderMiddleware:
         self.headers_update_wait = self.settings.get('HEADERS_UPDATE_WAIT', 120)
         self.request_retry_times = self.settings.get('RETRY_TIMES', 3)
         self.batch_size = self.settings.get("CONCURRENT_REQUESTS", 100)
+        self.parked_requests = []
 
         # Load or generate scraping headers
-        if "scraping_headers.json" in os.listdir("realtor/spiders"):
-            with open("realtor/spiders/scraping_headers.json", "r") as f:
-                self.scraping_headers = json.load(f)
-        else:
+        self.headers_pool = HeadersPool(
+            self.settings.get('HEADERS_POOL_FILE', "realtor/spiders/scraping_headers_pool.json"),
+            target_size=self.settings.getint('HEADERS_POOL_SIZE', 3),
+            retire_after=self.settings.getint('HEADERS_RETIRE_AFTER', 3),
+            strategy=self.settings.get('HEADERS_POOL_STRATEGY', "least_recently_failed"),
+            legacy_path="realtor/spiders/scraping_headers.json",
+        )
+        if not len(self.headers_pool):
             self.update_scraping_headers()
 
+        self.endpoints = {}
+        self.domain_concurrency = self.settings.getint('CONCURRENT_REQUESTS_PER_DOMAIN', 8)
+        if self.settings.getbool('ADAPTIVE_CONCURRENCY', False):
+            self.endpoints = {
+                endpoint: EndpointConcurrency(
+                    endpoint,
+                    # the two endpoints start with the concurrency of the single realtor.com slot between them
+                    start=int(self.settings.get('ADAPTIVE_CONCURRENCY_START') or max(1, self.domain_concurrency // 2)),
+                    min_limit=self.settings.getint('ADAPTIVE_CONCURRENCY_MIN', 1),
+                    max_limit=min(self.settings.getint('ADAPTIVE_CONCURRENCY_MAX', 8), self.domain_concurrency),
+                    backoff=self.settings.getfloat('ADAPTIVE_CONCURRENCY_BACKOFF', 0.5),
+                    latency_factor=self.settings.getfloat('ADAPTIVE_CONCURRENCY_LATENCY_FACTOR', 3.0),
+                    block_codes=self.settings.getlist('ADAPTIVE_CONCURRENCY_BLOCK_CODES', [403, 429, 502]),
+                )
+                for endpoint in ("search", "hulk")
+            }
+
     @classmethod
     def from_crawler(cls, crawler):
         """
@@ -153,19 +202,172 @@ class RealtorDownloaderMiddleware:
             RealtorDownloaderMiddleware: An instance of the middleware.
         """
         middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
         return middleware
 
+    def spider_opened(self, spider):
+        """
+        Records the size of the headers pool, a pool below its target size is only replenished once one
+        of its sets is retired so a crawl whose sets keep working never starts the browser.
+        """
+        self.crawler.stats.set_value("headers_pool/active", len(self.headers_pool))
+
+    def spider_closed(self, spider):
+        """
+        Saves the headers pool counters and stops the harvesting browser when the spider is closed,
+        a harvest in progress is cancelled "its thread gives up and quits the browser" instead of waited for.
+        """
+        self.closing = True
+        if self.parked_release is not None:
+            self.parked_release.cancel()
+        if self.harvester is not None:
+            self.harvester.stop()
+        if self.headers_refresh is not None and not self.headers_refresh.called:
+            self.headers_refresh.cancel()
+        self.headers_pool.save()
+
+    @cached_property
+    def fake_ua(self):
+        """
+        Fake user-agent generator, fake_useragent is only loaded on the first use.
+        """
+        from fake_useragent import UserAgent
+
+        return UserAgent(os="macos", browsers="safari")
+
+    def headers_harvester(self):
+        """
+        Returns the harvesting browser session, created on the first harvest "selenium is only imported then".
+        """
+        if self.harvester is None:
+            from realtor.spiders.headers_extractor import GetHeaders
+
+            self.harvester = GetHeaders(self.settings.get('HEADERS_BROWSER_PROFILE') or None)
+        return self.harvester
+
+    def harvest_timed(self):
+        """
+        Harvests a fresh header set and times it, runs off the reactor so it only drives the browser.
+
+        Returns:
+            tuple: The header set and the time-to-fresh-headers in seconds.
+        """
+        harvester = self.headers_harvester()
+        scraping_headers = harvester.fresh_headers(
+            wait_period=self.settings.getint('HEADERS_HARVEST_WAIT', 120),
+            attempts=self.settings.getint('HEADERS_HARVEST_ATTEMPTS', 5),
+        )
+        return scraping_headers, harvester.last_harvest_seconds
+
+    def record_harvest(self, harvest_seconds):
+        """
+        Records the time-to-fresh-headers of a harvest in the crawl stats.
+        """
+        self.crawler.stats.set_value("headers_harvest/last_seconds", round(harvest_seconds, 3))
+        self.crawler.stats.inc_value("headers_harvest/seconds", harvest_seconds, start=0.0)
+        self.crawler.stats.inc_value("headers_harvest/count")
+        print(f"\nfresh headers harvested in {harvest_seconds:.1f} s.")
+
     def update_scraping_headers(self):
         """
-        Updates the scraping headers by generating fresh headers and saving them to a JSON file.
+        Generates a fresh header set and adds it to the headers pool.
+        """
+        scraping_headers, harvest_seconds = self.harvest_timed()
+        self.record_harvest(harvest_seconds)
+        self.headers_pool.add(scraping_headers)
+
+    def harvest_headers(self):
+        """
+        Harvests a fresh header set in a thread off the reactor if the pool is below its target size
+        or requests are waiting for it, only one harvest runs at a time.
+        """
+        if self.headers_refresh is not None or self.closing:
+            return
+        if not (self.headers_pool.needs_replenishing() or self.parked_requests):
+            return
+        self.headers_refresh = threads.deferToThread(self.harvest_timed)
+        self.headers_refresh.addCallback(self.__headers_harvested)
+        self.headers_refresh.addErrback(self.__headers_harvest_failed)
+
+    def refresh_scraping_headers(self):
+        """
+        Parks a failed request until a fresh header set is harvested, used when the whole pool is burned.
+
+        The browser session runs in a thread so the reactor keeps serving the other callbacks, the engine is only
+        paused to stop sending new requests while there are no usable headers.
+
+        Returns:
+            twisted.internet.defer.Deferred: Fires when the fresh headers are ready.
+        """
+        parked_request = Deferred()
+        self.parked_requests.append(parked_request)
+        if not self.crawler.engine.paused:
+            self.crawler.engine.pause()
+            self.crawler.stats.set_value("headers_refresh/paused_at", time())
+            self.crawler.stats.inc_value("headers_refresh/pauses")
+        self.harvest_headers()
+        return parked_request
+
+    def __headers_harvested(self, harvest):
+        """
+        Adds the fresh header set to the pool then releases the parked requests after the headers update wait,
+        or keeps replenishing the pool if no request is waiting.
+        """
+        scraping_headers, harvest_seconds = harvest
+        self.record_harvest(harvest_seconds)
+        self.headers_pool.add(scraping_headers)
+        self.crawler.stats.set_value("headers_pool/active", len(self.headers_pool))
+        self.crawler.stats.inc_value("headers_pool/harvested")
+        if self.parked_requests:
+            # the harvest is over, the wait isn't chained to it so closing the spider doesn't wait for it
+            self.parked_release = deferLater(reactor, self.headers_update_wait + 61, self.__release_parked_requests)
+            self.parked_release.addErrback(lambda failure: failure.trap(CancelledError))
+            return
+        self.headers_refresh = None
+        self.harvest_headers()
+
+    def __headers_harvest_failed(self, failure):
         """
-        self.scraping_headers = Get_Headers().fresh_headers(wait_period=120)
-        with open("spiders/scraping_headers.json", "w") as f:
-            json.dump(self.scraping_headers, f, indent=4)
+        Logs a headers harvest whose attempts all failed, the pool is replenished again once another set is retired.
+
+        With the whole pool burned no request can be sent anymore, the spider is closed and the parked requests
+        fail with the harvest's error "their states stay checkpointed in the JOBDIR".
+        """
+        self.headers_refresh = None
+        if self.closing or failure.check(CancelledError):
+            return
+        spider = self.crawler.spider
+        spider.logger.error(f"headers harvest failed: {failure!r}")
+        self.crawler.stats.inc_value("headers_harvest/failed")
+        if len(self.headers_pool):
+            return
+        self.crawler.engine.close_spider(spider, "headers_harvest_failed")
+        parked_requests, self.parked_requests = self.parked_requests, []
+        if self.crawler.engine.paused:
+            self.crawler.engine.unpause()
+        for parked_request in parked_requests:
+            parked_request.errback(failure)
+
+    def __release_parked_requests(self):
+        """
+        Unpauses the engine and re-issues the requests parked while the pool was burned.
+        """
+        self.headers_refresh = None
+        self.parked_release = None
+        self.crawler.request_batch_delay = time()
+        parked_requests, self.parked_requests = self.parked_requests, []
+        if paused_at := self.crawler.stats.get_value("headers_refresh/paused_at"):
+            self.crawler.stats.inc_value("headers_refresh/paused_seconds", time() - paused_at, start=0.0)
+            self.crawler.stats.set_value("headers_refresh/paused_at", None)
+        self.crawler.engine.unpause()
+        for parked_request in parked_requests:
+            parked_request.callback(None)
+        self.harvest_headers()
 
     def modify_request_headers(self, request):
         """
-        Modifies request headers with dynamic scraping headers.
+        Modifies request headers with a header set from the headers pool.
 
         Args:
             request (scrapy.http.Request): The HTTP request object.
@@ -173,13 +375,88 @@ class RealtorDownloaderMiddleware:
         Returns:
             scrapy.http.Request: The modified request.
         """
-        for key, value in self.scraping_headers.items():
+        header_set = self.headers_pool.acquire()
+        for key, value in header_set["headers"].items():
             if key != "referer":
                 request.headers[key] = value
 
-        request.meta['update_number'] = self.update_number
+        request.meta['headers_id'] = header_set["id"]
         return request
 
+    def request_endpoint(self, request, spider):
+        """
+        Finds the adaptive concurrency controller of the endpoint a request is sent to.
+
+        Returns:
+            Optional[EndpointConcurrency]: The controller, None for other URLs or if the adaptive concurrency is disabled.
+        """
+        if request.url == spider.Primary_API:
+            return self.endpoints.get("search")
+        if request.url == spider.Secondary_API:
+            return self.endpoints.get("hulk")
+        return None
+
+    def slot_concurrency(self, endpoint):
+        """
+        Returns the concurrency of an endpoint's downloader slot, its limit scaled down with the other endpoint's
+        limit whenever they add up to more than `domain_concurrency`.
+
+        Args:
+            endpoint (EndpointConcurrency): The controller of the endpoint.
+        """
+        total = sum(other.concurrency for other in self.endpoints.values())
+        if total <= self.domain_concurrency:
+            return endpoint.concurrency
+        return max(1, endpoint.concurrency * self.domain_concurrency // total)
+
+    def apply_concurrency(self, endpoint):
+        """
+        Sets the concurrency of the endpoints' downloader slots from their current limits "a limit change moves the
+        other endpoint's share too" and records the endpoint's limit in the crawl stats.
+
+        The concurrency is set in the downloader's DOWNLOAD_SLOTS too, so a slot created or re-created after
+        it was idle starts with it.
+
+        Args:
+            endpoint (EndpointConcurrency): The controller of the endpoint.
+        """
+        downloader = self.crawler.engine.downloader
+        for other in self.endpoints.values():
+            slot_key, concurrency = f"realtor-{other.name}", self.slot_concurrency(other)
+            downloader.per_slot_settings.setdefault(slot_key, {})["concurrency"] = concurrency
+            if (slot := downloader.slots.get(slot_key)) is not None:
+                slot.concurrency = concurrency
+        stats = self.crawler.stats
+        stats.set_value(f"adaptive_concurrency/{endpoint.name}/slot_concurrency", self.slot_concurrency(endpoint))
+        stats.set_value(f"adaptive_concurrency/{endpoint.name}/limit", endpoint.concurrency)
+        stats.max_value(f"adaptive_concurrency/{endpoint.name}/max_limit", endpoint.concurrency)
+        stats.min_value(f"adaptive_concurrency/{endpoint.name}/min_limit", endpoint.concurrency)
+        stats.set_value(f"adaptive_concurrency/{endpoint.name}/success_rate", round(endpoint.success_rate, 3))
+        if endpoint.latency is not None:
+            stats.set_value(f"adaptive_concurrency/{endpoint.name}/latency", round(endpoint.latency, 3))
+
+    def record_endpoint_response(self, request, status, spider):
+        """
+        Feeds a response status "or None for a download error" to the endpoint's controller.
+
+        Args:
+            request (scrapy.http.Request): The request of the response.
+            status (Optional[int]): The HTTP status of the response, None if the download failed.
+            spider (scrapy.Spider): The Scrapy spider instance.
+        """
+        endpoint = self.request_endpoint(request, spider)
+        if endpoint is None:
+            return
+        if status == 200:
+            endpoint.record_success(request.meta.get('download_latency'))
+        elif status is None or status in endpoint.block_codes:
+            self.crawler.stats.inc_value(f"adaptive_concurrency/{endpoint.name}/blocked/{status or 'error'}")
+            if endpoint.record_block(request.meta.get('endpoint_sent_at', 0)):
+                spider.logger.info(f"{endpoint.name} endpoint blocked ({status or 'error'}), concurrency cut to {endpoint.concurrency}")
+        else:
+            endpoint.record_failure()
+        self.apply_concurrency(endpoint)
+
     def process_request(self, request, spider):
         """
         Processes each request before it is sent to the server.
@@ -194,37 +471,199 @@ class RealtorDownloaderMiddleware:
         self.total_requests_made += 1
         if not self.crawler.request_batch_delay:
             self.crawler.request_batch_delay = time()
+        if not len(self.headers_pool):
+            return self.refresh_scraping_headers().addCallback(lambda _: self.process_request(request, spider))
         self.modify_request_headers(request)
+
+        endpoint = self.request_endpoint(request, spider)
+        if endpoint is not None:
+            request.meta['download_slot'] = f"realtor-{endpoint.name}"
+            request.meta['endpoint_sent_at'] = time()
+            self.apply_concurrency(endpoint)
         return None
 
     def process_response(self, request, response, spider):
         """
         Processes each response, handling retries and updating headers if necessary.
 
+        A failed request counts against the header set it was sent with, then it is re-issued with another set
+        from the pool, or parked until a fresh set is harvested if the whole pool is burned.
+
         Args:
             request (scrapy.http.Request): The original request.
             response (scrapy.http.Response): The HTTP response object.
             spider (scrapy.Spider): The Scrapy spider instance.
 
         Returns:
-            scrapy.http.Request or scrapy.http.Response: The processed response or a retry request.
+            scrapy.http.Request or scrapy.http.Response or twisted.internet.defer.Deferred: The processed response,
+                a retry request or a Deferred firing with the retry request once it is un-parked.
         """
+        if "cached" not in response.flags:
+            self.record_endpoint_response(request, response.status, spider)
+        if "cached" in response.flags:
+            return response
         if response.status != 200:
-            if request.meta.get('update_number', 1) == self.update_number:
-                self.crawler.engine.pause()
-                if response.status == 502 and request.meta.get('retry_count', 0) <= 0:
-                    sleep(5)
-                else:
-                    self.update_scraping_headers()
-                    sleep(self.headers_update_wait)
-                    sleep(61)
-                    self.crawler.request_batch_delay = time()
-                self.crawler.engine.unpause()
-
-            request = self.modify_request_headers(request)
             retry_count = request.meta.get('retry_count', 0) + 1
-            if retry_count <= self.request_retry_times:
-                request.meta['retry_count'] = retry_count
-            return request
+            if retry_count > self.request_retry_times:
+                return response
+            request = request.replace(dont_filter=True)
+            request.meta['retry_count'] = retry_count
+
+            if response.status == 502 and retry_count <= 1:
+                waiting = deferLater(reactor, 5, lambda: None)
+            else:
+                if self.headers_pool.record_failure(request.meta.get('headers_id')):
+                    self.crawler.stats.set_value("headers_pool/active", len(self.headers_pool))
+                    self.crawler.stats.inc_value("headers_pool/retired")
+                    spider.logger.info(f"retired the header set {request.meta.get('headers_id')}, {len(self.headers_pool)} left")
+                    self.harvest_headers()
+                if len(self.headers_pool):
+                    return request
+                waiting = self.refresh_scraping_headers()
+            waiting.addCallback(lambda _: request)
+            return waiting
+
+        self.headers_pool.record_success(request.meta.get('headers_id'))
+        return response
 
+    def process_exception(self, request, exception, spider):
+        """
+        Counts a download error "e.g. a timeout or a dropped connection" as a block signal of its endpoint.
+
+        Returns:
+            None: The exception carries on through the default exception handling.
+        """
+        self.record_endpoint_response(request, None, spider)
+        return None
+
+
+class RealtorCacheMiddleware:
+    """
+    Downloader middleware serving the search and listings API responses from a compressed on-disk cache.
+
+    The responses are keyed on the endpoint URL and the normalized payload, a cached response is served while it's
+    younger than the TTL of its listing type "RESPONSE_CACHE_TTL", so re-running a crashed crawl or a state
+    re-processes the responses without downloading them again. It runs before RealtorDownloaderMiddleware so the
+    cached responses neither use the scraping headers nor wait for them.
+
+    Attributes:
+        cache (ResponseCache): The cache file.
+        ttl (dict): The seconds a response stays fresh for each listing type.
+    """
+
+    def __init__(self, crawler):
+        """
+        Opens the cache file.
+
+        Args:
+            crawler (scrapy.crawler.Crawler): The Scrapy crawler instance.
+
+        Raises:
+            NotConfigured: If the RESPONSE_CACHE setting is empty.
+        """
+        self.crawler = crawler
+        settings = crawler.settings
+        if not (cache_path := settings.get('RESPONSE_CACHE')):
+            raise NotConfigured
+        self.cache = ResponseCache(
+            cache_path,
+            max_bytes=settings.getint('RESPONSE_CACHE_MAX_MB', 2048) * 1024 * 1024,
+            compression_level=settings.getint('RESPONSE_CACHE_COMPRESSION_LEVEL', 3),
+        )
+        self.ttl = settings.getdict('RESPONSE_CACHE_TTL', {"new_listings": 3600, "all_for_sale": 43200, "sold_listings": 604800})
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """
+        Factory method to create an instance of the middleware.
+
+        Args:
+            crawler (scrapy.crawler.Crawler): The Scrapy crawler instance.
+
+        Returns:
+            RealtorCacheMiddleware: An instance of the middleware.
+        """
+        middleware = cls(crawler)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        """
+        Closes the cache file and prints its hits and misses.
+        """
+        print(f"\nresponse cache: {self.cache.hits} responses reused, {self.cache.misses} downloaded, {self.cache.evicted} evicted.")
+        self.cache.close()
+
+    def is_cacheable(self, request, spider):
+        """
+        Checks whether a request is sent to the search or listings API.
+        """
+        return request.url in (spider.Primary_API, spider.Secondary_API) and not request.meta.get('dont_cache')
+
+    def ttl_of(self, request, spider):
+        """
+        Returns the seconds the response of a request stays fresh, a listing tagged with several
+        listing types is as fresh as its shortest lived type.
+        """
+        listing_types = request.meta.get("listing_type") or request.meta.get("listing_types") or spider.listing_type.replace("+", ",")
+        if "batch" in request.meta:
+            listing_types = ",".join(listing_meta.get("listing_types", "") for listing_meta in request.meta["batch"])
+        return min((float(self.ttl.get(listing_type, 0)) for listing_type in listing_types.split(",") if listing_type), default=0.0)
+
+    def process_request(self, request, spider):
+        """
+        Serves a fresh cached response of the request if there is one.
+
+        Returns:
+            scrapy.http.Response or None: The cached response flagged as "cached", None to download the request.
+        """
+        if not self.is_cacheable(request, spider):
+            return None
+        cache_key = ResponseCache.cache_key(request.url, request.body)
+        cached = self.cache.lookup(cache_key, self.ttl_of(request, spider))
+        if cached is None:
+            request.meta['cache_key'] = cache_key
+            self.crawler.stats.inc_value("response_cache/misses")
+            return None
+        self.crawler.stats.inc_value("response_cache/hits")
+        status, body = cached
+        return scrapy.http.Response(url=request.url, status=status, body=body, flags=["cached"], request=request)
+
+    def process_response(self, request, response, spider):
+        """
+        Stores the successful API responses that were downloaded.
+
+        Returns:
+            scrapy.http.Response: The response.
+        """
+        if response.status == 200 and "cached" not in response.flags and "cache_key" in request.meta:
+            self.cache.store(request.meta['cache_key'], request.url, response.status, response.body)
+            self.crawler.stats.inc_value("response_cache/stored")
         return response
+
+
+class PersistedQueryMiddleware:
+    """
+    Downloader middleware resending a request with its query when the API doesn't know its persisted query hash.
+
+    The API answers an unknown hash with a PersistedQueryNotFound error, the request is sent again with the
+    query so the API registers the hash for the next requests. If the API answers PersistedQueryNotSupported
+    the persisted queries are turned off for the rest of the crawl.
+    """
+    ERROR_MARKER = b"PersistedQueryNot"
+
+    def process_response(self, request, response, spider):
+        """
+        Resends the request with its query if the API didn't know its persisted query hash.
+
+        Returns:
+            scrapy.http.Response or scrapy.Request: The response, or the request with its query.
+        """
+        request_factory = getattr(spider, "request_factory", None)
+        if request_factory is None or b'"persistedQuery"' not in request.body or self.ERROR_MARKER not in response.body[:500]:
+            return response
+        if b"PersistedQueryNotSupported" in response.body[:500] and request_factory.persisted_queries:
+            spider.logger.warning("the API doesn't support the persisted queries, sending the queries in full.")
+            request_factory.disable_persisted_queries()
+        spider.crawler.stats.inc_value("persisted_queries/registered")
+        return request.replace(body=request_factory.full_body(request.body), dont_filter=True)
@@ -1,9 +1,14 @@
 """
 This module defines the item pipeline for processing, exporting, and saving data scraped by a Scrapy spider.
 It is designed for realtor.com scraping projects and includes functionality to:
-- Create temporary save-point files during the scraping process.
+- Create a temporary save-point file for each state during the scraping process.
+- Write the final outputs of each state as soon as the state is completely scraped.
 - Process and clean scraped data.
-- Export data to JSON lines and Excel files for analysis.
+- Export data to JSON lines and Excel files for analysis "the workbooks are streamed in a pool of processes".
+- Stream data into a state partitioned Parquet dataset "OUTPUT_FORMAT = 'parquet'".
+- Split the outputs of a crawl of several listing types by type.
+- Merge the partial outputs of the workers sharing a frontier "FRONTIER".
+- Record the price and status of every listing in the append-only listings history "LISTINGS_HISTORY".
 
 Classes:
     Realtor_Pipeline: Handles processing, exporting, and managing scraped data during and after spider execution.
@@ -11,27 +16,49 @@ Classes:
 
 from itemadapter import ItemAdapter
 from scrapy.exporters import JsonLinesItemExporter
-from scrapy.utils.project import get_project_settings
-from datetime import datetime, date
-import pandas as pd
-import numpy as np
+from datetime import datetime
+import io
+import math
 import os
-from time import time, sleep
 from scrapy import signals
-from typing import Literal
+from twisted.internet import reactor, threads
+from twisted.internet.defer import Deferred, DeferredList, DeferredLock
+
+from realtor.frontier import FrontierStatesQueue
+from realtor.history import ListingsHistory
+from realtor.states_queue import StatesQueue, state_completed
 
 
 class Realtor_Pipeline:
     """
     A Scrapy pipeline for handling scraped items, managing temporary save-points, and exporting data.
 
+    The items of each state are kept in the state's own save-point file, once the spider signals that a state
+    is completely scraped its final outputs are written and its save-point file is deleted, so a long crawl
+    has the outputs of its finished states from the start and an interrupted crawl doesn't lose them.
+    The save-point file is read and the workbooks are submitted in a thread "one state at a time" so saving
+    a state never holds up the crawl, the file is deleted once the state's workbooks are written.
+
+    Each listing is observed in the listings history too, the observations are added in batches of
+    `LISTINGS_HISTORY_BATCH_SIZE` and whenever a state is completed or the spider is closed.
+
     Attributes:
         only_running_the_last_request (bool): Flag to determine if only the last request is being handled.
-        file_name (Optional[str]): Name of the temporary save-point file for the current spider run.
         last_saved_state (str): Name of the last processed state in the scraping process.
+        output_format (Literal["xlsx", "parquet"]): The format of the final outputs.
+        save_points (dict): Maps each state "or "" for a worker sharing a frontier" to its open save-point file and exporter.
+        exporters (dict): The Parquet dataset exporter of each listing type scraped.
+        frontier_parts_dir (str): The directory the workers sharing a frontier leave their partial outputs in.
+        xlsx_exporter (Optional[XlsxStatesExporter]): Writes the workbooks, created by the first state saved.
+        finalized (list): The save-point files of the saved states "and the size saved" with their workbooks still being written.
+        saving (DeferredLock): Lets a single thread at a time save the outputs of a state.
+        saves (set): The Deferreds of the states being saved.
+        saved_states (Optional[list]): The states already saved in the crawl, kept in the spider's state.
+        history (Optional[ListingsHistory]): The listings history, None if it's disabled.
+        history_batch (list): The observations waiting to be added to the listings history.
+        history_batch_size (int): The number of observations added to the listings history at once.
     """
     only_running_the_last_request = True
-    file_name = None
     last_saved_state = ""
 
     def __init__(self, crawler):
@@ -43,6 +70,20 @@ class Realtor_Pipeline:
         """
         self.crawler = crawler
         self.save_points_dir = crawler.settings.get("SAVE_POINTS_DIR", "crawls/temporary_save_points")
+        self.output_format = crawler.settings.get("OUTPUT_FORMAT", "xlsx")
+        self.save_points = {}
+        self.exporters = {}
+        frontier_path = crawler.settings.get("FRONTIER", "")
+        self.frontier_parts_dir = crawler.settings.get("FRONTIER_PARTS_DIR") or os.path.join(os.path.dirname(frontier_path), "frontier_parts")
+        self.xlsx_exporter = None
+        self.finalized = []
+        self.saving = DeferredLock()
+        self.saves = set()
+        self.saved_states = None
+        history_path = crawler.settings.get("LISTINGS_HISTORY", "")
+        self.history = ListingsHistory(history_path) if history_path else None
+        self.history_batch = []
+        self.history_batch_size = crawler.settings.getint("LISTINGS_HISTORY_BATCH_SIZE", 5000)
 
     @classmethod
     def from_crawler(cls, crawler):
@@ -56,24 +97,78 @@ class Realtor_Pipeline:
             Realtor_Pipeline: An instance of the pipeline.
         """
         pipeline = cls(crawler=crawler)
+        crawler.signals.connect(pipeline.state_finished, signal=state_completed)
         crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
         return pipeline
 
-    def create_save_point_file(self, spider):
+    def dataset_dir(self, spider, listing_type):
+        """
+        Returns the directory of the Parquet dataset of a listing type.
+        """
+        return os.path.join(self.crawler.settings.get("OUTPUT_DIR", "realtor/outputs"), f"{spider.name} {listing_type} {spider.state['today']}")
+
+    @staticmethod
+    def is_frontier_worker(spider):
+        """
+        Checks whether the spider is a worker sharing a frontier with other workers.
+        """
+        return isinstance(getattr(spider, "states_queue", None), FrontierStatesQueue)
+
+    def save_point_key(self, spider, state):
+        """
+        Returns the save-point a listing of a state goes to, the normalized state name "the name of the state in
+        the states queue" or "" for a worker sharing a frontier whose states are merged when the crawl is over.
+        """
+        return "" if self.is_frontier_worker(spider) else StatesQueue.normalize(state or "unknown")
+
+    def save_point_path(self, spider, state_key):
+        """
+        Returns the directory and name of the save-point file of a state, or of a worker sharing a frontier.
         """
-        Creates a temporary save-point file for storing scraped items during the spider's execution.
+        suffix = spider.states_queue.worker if self.is_frontier_worker(spider) else f"state={state_key}"
+        return os.path.join(self.save_points_dir, f"{spider.name} temporary {spider.state['listing_type']} {spider.state['today']} {suffix}.jsonl")
+
+    def create_save_point_file(self, spider, state_key=""):
+        """
+        Creates the temporary save-point file of a state for storing its scraped items during the spider's execution.
+
+        In the parquet output format the items are streamed straight into the final Parquet dataset
+        of each listing type instead.
 
         Args:
             spider (scrapy.Spider): The Scrapy spider instance.
+            state_key (str): The save-point of the state, see `save_point_key`.
+        """
+        if self.output_format == "parquet":
+            from realtor.exporters import ParquetStatesExporter
+
+            for listing_type in spider.listing_types:
+                self.exporters[listing_type] = ParquetStatesExporter(
+                    self.dataset_dir(spider, listing_type),
+                    self.crawler.settings.getint("PARQUET_ROW_GROUP_SIZE", 10000),
+                    spider.states_queue.worker if self.is_frontier_worker(spider) else "",
+                )
+            return
+        file = open(self.save_point_path(spider, state_key), 'ab')
+        exporter = JsonLinesItemExporter(file)
+        exporter.start_exporting()
+        self.save_points[state_key] = (file, exporter)
+
+    def close_save_point_file(self, state_key, sync=False):
         """
-        self.file_name = f"{spider.name} temporary {spider.state['listing_type']} {spider.state['today']}.jsonl"
-        self.file = open(os.path.join(self.save_points_dir, self.file_name), 'ab')
-        self.exporter = JsonLinesItemExporter(self.file)
-        self.exporter.start_exporting()
+        Closes the save-point file of a state if it's open "synced to the disk first if `sync`".
+        """
+        if (save_point := self.save_points.pop(state_key, None)) is not None:
+            file, exporter = save_point
+            exporter.finish_exporting()
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+            file.close()
 
     def process_item(self, item, spider):
         """
-        Processes each scraped item, cleans data, and writes it to the temporary save-point file.
+        Processes each scraped item, cleans data, and writes it to the temporary save-point file of its state.
 
         Args:
             item (dict): The scraped item.
@@ -82,66 +177,354 @@ class Realtor_Pipeline:
         Returns:
             dict: The processed item.
         """
-        if "exporter" not in dir(self):
+        if self.output_format == "parquet" and not self.exporters:
             self.create_save_point_file(spider)
 
         adapter = ItemAdapter(item)
-        adapter["price"] = int(adapter["price"]) if adapter.get("price") else np.nan
+        adapter["price"] = int(adapter["price"]) if adapter.get("price") else math.nan
         adapter["status"] = adapter["status"].lower() if adapter["status"] else adapter["status"]
         if (sold_date_str := adapter.get("sold_date")):
             sold_date = datetime.strptime(sold_date_str, "%Y-%m-%d").date()
             adapter["days_on_realtor"] = (spider.state["today"] - sold_date).days
             adapter["sold_date"] = sold_date.strftime("%d/%m/%Y")
-        self.exporter.export_item(item)
+        if self.history is not None and adapter.get("property_id"):
+            self.observe(spider, adapter, sold_date_str)
+        if self.exporters:
+            for listing_type in (adapter.get("listing_types") or spider.listing_types[0]).split(","):
+                self.exporters[listing_type].export_item(item)
+            return item
+        state_key = self.save_point_key(spider, adapter.get("state"))
+        if state_key not in self.save_points:
+            self.create_save_point_file(spider, state_key)
+        self.save_points[state_key][1].export_item(item)
         return item
 
-    def construct_df_from_temporary_file(self, spider):
+    def observe(self, spider, adapter, sold_date):
         """
-        Constructs a Pandas DataFrame from the temporary save-point file.
+        Adds a cleaned item to the batch of observations of the listings history, the batch is added once it's full.
 
         Args:
             spider (scrapy.Spider): The Scrapy spider instance.
+            adapter (ItemAdapter): The cleaned item.
+            sold_date (str): The ISO sold date of the listing as scraped, if it's sold.
+        """
+        self.history_batch.append((
+            str(adapter["property_id"]),
+            str(adapter.get("listing_id") or ""),
+            adapter.get("state"),
+            str(adapter["zip_code"]) if adapter.get("zip_code") else None,
+            adapter.get("listing_types") or spider.listing_type,
+            None if math.isnan(adapter["price"]) else adapter["price"],
+            adapter.get("status"),
+            sold_date or None,
+        ))
+        if len(self.history_batch) >= self.history_batch_size:
+            self.flush_history(spider)
+
+    def flush_history(self, spider):
+        """
+        Adds the batch of observations to the listings history under the run date of the crawl.
+        """
+        if self.history is not None and self.history_batch:
+            self.history.add(spider.state["today"].isoformat(), self.history_batch)
+            self.history_batch = []
+
+    def construct_df_from_temporary_file(self, file_path, size=None):
+        """
+        Constructs a Pandas DataFrame from a temporary save-point file.
+
+        The duplicate listings are already skipped by the spider before they are requested or exported,
+        a listing exported twice "its request was sent again after a pause" is kept once.
+
+        Args:
+            file_path (str): The directory and name of the save-point file.
+            size (Optional[int]): The number of bytes of the file to read "the listings exported after are left out", all of them if None.
 
         Returns:
             pandas.DataFrame: DataFrame containing the scraped data.
         """
-        df = pd.read_json(os.path.join(self.save_points_dir, self.file_name), lines=True)
-        df.drop_duplicates(inplace=True)
-        return df
+        import pandas as pd
+
+        with open(file_path, "rb") as file:
+            df = pd.read_json(io.BytesIO(file.read(size)), lines=True)
+        return df.drop_duplicates(subset=["property_id", "listing_id"])
 
-    def save_outputs(self, spider):
+    def state_finished(self, state_name, spider):
         """
-        Saves the processed data into Excel files, one for each state scraped, in the output directory.
+        Writes the final outputs of a completely scraped state and drops its temporary data.
+
+        The Parquet part files of the state are closed, the xlsx files are written from the state's save-point
+        file which is deleted once they are written.
+
+        A worker sharing a frontier publishes the outputs of the state's unit instead "before the unit is done",
+        its Parquet part files are closed and its save-point file is moved to the frontier parts directory.
 
         Args:
+            state_name (str): The name of the state in the states queue.
             spider (scrapy.Spider): The Scrapy spider instance.
         """
-        df = self.construct_df_from_temporary_file(spider)
+        self.flush_history(spider)
+        if self.is_frontier_worker(spider):
+            self.publish_frontier_part(spider, f"unit={spider.states_queue.in_flight[state_name]['unit_id']}")
+            return
+        if self.output_format == "parquet":
+            for listing_type, exporter in self.exporters.items():
+                for state in {*exporter.buffers, *exporter.writers}:
+                    if StatesQueue.normalize(state) == state_name:
+                        print(f"-->{listing_type} results of {state}:{exporter.close_state(state)}")
+            return
+        self.save_state(spider, state_name)
+
+    def save_state(self, spider, state_key):
+        """
+        Saves the outputs of a state from its save-point file, if the state has one, in a thread and
+        deletes the file once the state's workbooks are written.
+
+        The listings of a state that was already saved "e.g. found by the search of another state" are
+        merged with its saved outputs instead of overwriting them.
+
+        Returns:
+            twisted.internet.defer.Deferred: Fires once the state's workbooks are written, a failed save is logged.
+        """
+        self.close_save_point_file(state_key)
+        file_path = self.save_point_path(spider, state_key)
+        if not os.path.exists(file_path):
+            return None
+        if not (size := os.path.getsize(file_path)):
+            os.remove(file_path)
+            return None
+        if self.saved_states is None:
+            # the spider drops them from its state once the crawl is finished, before the states left are saved
+            self.saved_states = spider.state.setdefault("saved_states", [])
+        merge = state_key in self.saved_states
+        if not merge:
+            self.saved_states.append(state_key)
+        save = self.saving.run(threads.deferToThread, self.save_state_outputs, spider, file_path, size, merge)
+        save.addCallback(self.state_outputs_saved, file_path, size)
+        save.addErrback(lambda failure: spider.logger.error(f"the outputs of {state_key} weren't saved: {failure.getTraceback()}"))
+        self.saves.add(save)
+        save.addBoth(lambda _: self.saves.discard(save))
+        return save
+
+    def save_state_outputs(self, spider, file_path, size, merge):
+        """
+        Reads the first `size` bytes of a state's save-point file and submits its workbooks, runs in a thread.
+
+        Returns:
+            list: The workbooks being written.
+        """
+        df = self.construct_df_from_temporary_file(file_path, size)
+        if merge:
+            df = self.merge_saved_outputs(spider, df)
+        return self.save_outputs(spider, df)
+
+    def state_outputs_saved(self, workbooks, file_path, size):
+        """
+        Records the workbooks of a saved state and deletes its save-point file once they are all written.
+
+        Returns:
+            twisted.internet.defer.Deferred: Fires once the workbooks are written.
+        """
+        self.finalized.append((file_path, size, workbooks))
+
+        def written(workbook):
+            done = Deferred()
+            workbook.add_done_callback(lambda _: reactor.callFromThread(done.callback, None))
+            return done
+        return DeferredList([written(workbook) for workbook in workbooks]).addCallback(lambda _: self.drop_written_save_points())
+
+    def merge_saved_outputs(self, spider, df):
+        """
+        Adds the listings already saved in the xlsx files of the states of a DataFrame to it.
+
+        Returns:
+            pandas.DataFrame: the saved and the new listings without the duplicates.
+        """
+        import pandas as pd
+
+        output_dir = self.crawler.settings.get("OUTPUT_DIR", "realtor/outputs")
+        file_paths = [
+            os.path.join(output_dir, f"{spider.name} {listing_type} {state}.xlsx")
+            for listing_type in spider.listing_types
+            for state in df["state"].dropna().unique()
+        ]
+        if self.xlsx_exporter is not None:
+            # the saved workbooks may still be written by the pool
+            self.xlsx_exporter.wait(file_paths)
+        saved = [pd.read_excel(file_path, dtype={"property_id": str, "listing_id": str}) for file_path in file_paths if os.path.exists(file_path)]
+        df = df.astype({"property_id": str, "listing_id": str})
+        return pd.concat([*saved, df], ignore_index=True).drop_duplicates(subset=["property_id", "listing_id"], keep="last")
+
+    def drop_written_save_points(self):
+        """
+        Deletes the save-point files of the saved states whose workbooks are all written,
+        the file of a state whose workbook failed is kept and so is the file of a state
+        whose listings were exported after it was read "they are saved when the spider is finished".
+        """
+        still_writing = []
+        for file_path, size, workbooks in self.finalized:
+            if not all(workbook.done() for workbook in workbooks):
+                still_writing.append((file_path, size, workbooks))
+            elif not any(workbook.exception() for workbook in workbooks) and os.path.getsize(file_path) <= size:
+                os.remove(file_path)
+        self.finalized = still_writing
+
+    def publish_frontier_part(self, spider, part_name):
+        """
+        Makes the listings a worker sharing a frontier exported so far durable where the last worker merges them,
+        the Parquet part files are closed "the next rows go to new part files" and the save-point file is synced
+        and moved to the frontier parts directory "a new one is started by the next listing".
+
+        Args:
+            spider (scrapy.Spider): The Scrapy spider instance.
+            part_name (str): Tells the part apart from the other parts of the worker.
+        """
+        if self.output_format == "parquet":
+            for exporter in self.exporters.values():
+                exporter.close()
+            return
+        self.close_save_point_file("", sync=True)
+        if os.path.exists(file_path := self.save_point_path(spider, "")):
+            os.makedirs(self.frontier_parts_dir, exist_ok=True)
+            part_prefix, republished = os.path.join(self.frontier_parts_dir, f"{spider.states_queue.crawl} {spider.states_queue.worker} {part_name}"), 0
+            part_path = f"{part_prefix}.jsonl"
+            while os.path.exists(part_path):
+                # the unit was claimed again by the same worker "restarted after it died"
+                republished += 1
+                part_path = f"{part_prefix}-{republished}.jsonl"
+            os.replace(file_path, part_path)
+
+    def merge_frontier_parts(self, spider):
+        """
+        Publishes the worker's last part and, if it's the last worker of the crawl to finish,
+        merges the parts of all the workers into the final outputs.
+
+        Args:
+            spider (scrapy.Spider): The Scrapy spider instance.
+        """
+        import pandas as pd
+
+        crawl = spider.states_queue.crawl
+        self.publish_frontier_part(spider, "last")
+        if not spider.states_queue.finish():
+            print(f"\nthe partial outputs of {crawl} are left for the last worker to merge.")
+            return
+        os.makedirs(self.frontier_parts_dir, exist_ok=True)
+        parts = [os.path.join(self.frontier_parts_dir, part) for part in os.listdir(self.frontier_parts_dir) if part.startswith(f"{crawl} ")]
+        dfs = [pd.read_json(part, lines=True) for part in parts if os.path.getsize(part)]
+        print(f"\nmerging {len(parts)} partial outputs of the workers.")
+        if dfs:
+            self.save_outputs(spider, pd.concat(dfs, ignore_index=True).drop_duplicates(subset=["property_id", "listing_id"]))
+        for part in parts:
+            os.remove(part)
+
+    def save_outputs(self, spider, df):
+        """
+        Saves the processed data into Excel files, one for each listing type and state scraped, in the output directory,
+        the workbooks are written in parallel by XlsxStatesExporter.
+
+        A listing tagged with several listing types "e.g. a new listing is for sale too" is saved in the file of each one of them.
+
+        Args:
+            spider (scrapy.Spider): The Scrapy spider instance.
+            df (pandas.DataFrame): The listings to save.
+
+        Returns:
+            list: The workbooks being written.
+        """
+        import pandas as pd
+        from realtor.exporters import XlsxStatesExporter
+
         output_dir = self.crawler.settings.get("OUTPUT_DIR", "realtor/outputs")
+        if self.xlsx_exporter is None:
+            self.xlsx_exporter = XlsxStatesExporter(self.crawler.settings.getint("XLSX_EXPORT_PROCESSES", 0))
         states_scraped_list = list(df["state"].unique())
         print(f"\npipeline.states_scraped_list: {states_scraped_list}")
-        for state in states_scraped_list:
-            state_df = df[df["state"] == state]
-            file_name = f"{spider.name} {spider.state['listing_type']} {state}.xlsx"
-            file_path = os.path.join(output_dir, file_name)
-            state_df.to_excel(file_path, index=False)
-            print(f"-->results of {state}:{state_df.shape[0]}")
+        listing_types = df["listing_types"].fillna(spider.listing_type) if "listing_types" in df else pd.Series(spider.listing_type, index=df.index)
+        workbooks = []
+        for listing_type in spider.listing_types:
+            type_df = df[listing_types.str.contains(listing_type, regex=False)]
+            for state in states_scraped_list:
+                state_df = type_df[type_df["state"] == state]
+                file_name = f"{spider.name} {listing_type} {state}.xlsx"
+                file_path = os.path.join(output_dir, file_name)
+                workbooks.append(self.xlsx_exporter.export(file_path, state_df))
+                print(f"-->{listing_type} results of {state}:{state_df.shape[0]}")
+        return workbooks
 
     def spider_closed(self, spider, reason):
         """
         Handles actions to perform when the spider is closed, such as exporting data and cleaning up.
 
+        The states were already saved as they were completed, only the listings left in the save-point files
+        "e.g. a listing whose state isn't one of the scraped states" are saved when the spider is finished.
+
         Args:
             spider (scrapy.Spider): The Scrapy spider instance.
             reason (str): The reason for spider closure (e.g., "finished", "canceled").
         """
-        try:
-            self.exporter.finish_exporting()
-            self.file.close()
-        except Exception:
-            pass
+        if self.history is not None:
+            self.flush_history(spider)
+            print(f"\n{self.history.added} listings observed in the listings history.")
+            self.history.close()
+        if self.output_format == "parquet":
+            for listing_type, exporter in self.exporters.items():
+                exporter.close()
+                for state, rows_written in exporter.rows_written.items():
+                    print(f"-->{listing_type} results of {state}:{rows_written}")
+            if reason == "finished" and self.is_frontier_worker(spider) and spider.states_queue.finish():
+                from realtor.exporters import ParquetStatesExporter
+
+                for listing_type in spider.listing_types:
+                    if os.path.isdir(dataset_dir := self.dataset_dir(spider, listing_type)):
+                        for state, rows in ParquetStatesExporter.compact(dataset_dir).items():
+                            print(f"-->merged {listing_type} results of {state}:{rows}")
+            return
+
+        for state_key in list(self.save_points):
+            self.close_save_point_file(state_key)
+
+        # the listings left are looked for once the states being saved are saved
+        closed = DeferredList(list(self.saves))
+        closed.addCallback(lambda _: self.save_left_outputs(spider, reason))
+        closed.addCallback(lambda _: self.close_xlsx_exporter(spider))
+
+        def drop_written_save_points(result):
+            # even if the xlsx exporter failed to close, the written states are dropped
+            self.drop_written_save_points()
+            return result
+        return closed.addBoth(drop_written_save_points)
+
+    def save_left_outputs(self, spider, reason):
+        """
+        Saves the listings left in the save-point files once the spider is finished "or merges the partial outputs
+        of the workers sharing a frontier".
+
+        Returns:
+            twisted.internet.defer.Deferred: Fires once the listings left are saved.
+        """
+        saves = []
+        if reason == "finished" and self.is_frontier_worker(spider):
+            self.merge_frontier_parts(spider)
+        elif reason == "finished":
+            prefix = os.path.basename(self.save_point_path(spider, "")).removesuffix(".jsonl")
+            saved_files = [os.path.basename(file_path) for file_path, _, _ in self.finalized]
+            for file_name in sorted(os.listdir(self.save_points_dir)):
+                if file_name.startswith(prefix) and file_name.endswith(".jsonl") and file_name not in saved_files:
+                    saves.append(self.save_state(spider, file_name.removeprefix(prefix).removesuffix(".jsonl")))
+        return DeferredList([save for save in saves if save is not None])
+
+    def close_xlsx_exporter(self, spider):
+        """
+        Waits for the pending workbooks in a thread and logs the ones that failed.
+
+        Returns:
+            twisted.internet.defer.Deferred: Fires once the xlsx exporter is closed, None if there is none.
+        """
+        if self.xlsx_exporter is None:
+            return None
 
-        if reason == "finished":
-            self.save_outputs(spider)
-            # Deleting the primary save-point file
-            os.remove(os.path.join(self.save_points_dir, self.file_name))
+        def log_errors(errors):
+            for file_path, error in errors.items():
+                spider.logger.error(f"the workbook {file_path} wasn't written: {error!r}")
+        return threads.deferToThread(self.xlsx_exporter.close).addCallback(log_errors)
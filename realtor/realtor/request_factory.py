@@ -0,0 +1,216 @@
+"""
+This module defines the factory of the search and listings API request bodies.
+
+The payloads in constants.py are whitespace heavy GraphQL queries wrapped in JSON templates with text
+placeholders, filling them with chained `str.replace` calls re-scans the whole payload for every page
+and every listing. The factory compiles each template once: the query is minified, the JSON around the
+`variables` is pre-encoded to bytes and only the variables of each request are encoded, so the state,
+the dates, the page and the listing ids are sent as proper GraphQL variables.
+
+With `PERSISTED_QUERIES` the queries are sent as Apollo persisted query hashes "the sha256 of the
+minified query" instead of the query text, a hash the API doesn't know is answered with a
+PersistedQueryNotFound error and the request is sent again with its query to register it.
+
+Classes:
+    RequestFactory: Builds the search, listings and batched listings request bodies.
+
+Functions:
+    minify_graphql: Strips the insignificant whitespace, commas and comments from a GraphQL query.
+"""
+
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+from realtor.detail_batches import DetailBatchPayload
+
+GRAPHQL_TOKENS = re.compile(r'"(?:\\.|[^"\\])*"|\.\.\.|[!$&()\[\]{}:=@|]|#[^\n]*|[^\s,!$&()\[\]{}:=@|"#]+')
+"""GRAPHQL_TOKENS (re.Pattern): matches a string, a punctuator, a comment or a name/number of a GraphQL query."""
+
+GRAPHQL_PUNCTUATORS = {"...", "!", "$", "&", "(", ")", "[", "]", "{", "}", ":", "=", "@", "|"}
+"""GRAPHQL_PUNCTUATORS (set): the GraphQL punctuators, the tokens around them need no separating whitespace."""
+
+
+def minify_graphql(query: str) -> str:
+    """
+    Strips the insignificant whitespace, commas and comments from a GraphQL query,
+    the tokens are only separated where two names or numbers follow each other.
+    """
+    tokens = []
+    previous_is_name = False
+    for token in GRAPHQL_TOKENS.findall(query):
+        if token.startswith("#"):
+            continue
+        is_name = not token.startswith('"') and token not in GRAPHQL_PUNCTUATORS
+        if is_name and previous_is_name:
+            tokens.append(" ")
+        tokens.append(token)
+        previous_is_name = is_name
+    return "".join(tokens)
+
+
+def compile_body(document: dict, query: str, persisted: bool) -> Tuple[bytes, bytes]:
+    """
+    Pre-encodes the JSON body of a request around its variables.
+
+    Args:
+        document (dict): the decoded payload template.
+        query (str): the minified query of the payload.
+        persisted (bool): whether to send the persisted query hash instead of the query.
+
+    Returns:
+        tuple: the encoded body before and after the variables.
+    """
+    marker = "##VARIABLES##"
+    document = {**document, "variables": marker}
+    if persisted:
+        del document["query"]
+        document["extensions"] = {"persistedQuery": {"version": 1, "sha256Hash": hashlib.sha256(query.encode()).hexdigest()}}
+    else:
+        document["query"] = query
+    prefix, suffix = json.dumps(document, separators=(",", ":")).split(json.dumps(marker), 1)
+    return prefix.encode(), suffix.encode()
+
+
+class RequestFactory:
+    """
+    Builds the request bodies from the payload templates compiled once.
+
+    The search body of each (listing type, state, search date) is compiled the first time it's requested
+    and reused for all of its pages and price bands, only the limit, the offset and the price filter change.
+
+    Attributes:
+        persisted_queries (bool): whether the queries are sent as persisted query hashes.
+        search_templates (dict): the decoded search payload of each listing type.
+        search_queries (dict): the minified search query of each listing type.
+        price_fields (dict): the price filter of each listing type.
+        listing_template (dict): the decoded single listing payload.
+        detail_batches (DetailBatchPayload): builds the batched listings queries.
+        queries (dict): the minified query of each persisted query hash.
+    """
+
+    def __init__(self, search_payloads: Dict[str, str], listing_payload: str, price_fields: Dict[str, str], persisted_queries: bool = False):
+        """
+        Compiles the payload templates.
+
+        Args:
+            search_payloads (dict): the search payload template of each listing type, with the "**" state,
+                                    "--" state code, "==" search date, "^^" limit and "++" offset placeholders.
+            listing_payload (str): the single listing payload template "SECONDARY_PAYLOAD".
+            price_fields (dict): the price filter of each listing type "PRICE_FILTER_FIELDS".
+            persisted_queries (bool): whether to send the queries as persisted query hashes.
+        """
+        self.persisted_queries = persisted_queries
+        self.search_templates = {
+            listing_type: json.loads(payload.replace("^^", "0").replace("++", "0"))
+            for listing_type, payload in search_payloads.items()
+        }
+        self.search_queries = {listing_type: minify_graphql(template["query"]) for listing_type, template in self.search_templates.items()}
+        self.price_fields = price_fields
+        self.listing_template = json.loads(listing_payload)
+        self.listing_query = minify_graphql(self.listing_template["query"])
+        self.detail_batches = DetailBatchPayload(listing_payload)
+        self.queries = {}
+        self.compiled: Dict[tuple, tuple] = {}
+        for query in (*self.search_queries.values(), self.listing_query):
+            self.register(query)
+
+    def register(self, query: str) -> str:
+        """
+        Registers a minified query under its persisted query hash.
+        """
+        query_hash = hashlib.sha256(query.encode()).hexdigest()
+        self.queries[query_hash] = query
+        return query_hash
+
+    def disable_persisted_queries(self) -> None:
+        """
+        Sends the queries in full from now on "the API doesn't support the persisted queries".
+        """
+        self.persisted_queries = False
+        self.compiled.clear()
+
+    def full_body(self, body: bytes) -> bytes:
+        """
+        Adds the query to a body sent with its persisted query hash, so the API registers the hash.
+        """
+        document = json.loads(body)
+        document["query"] = self.queries[document["extensions"]["persistedQuery"]["sha256Hash"]]
+        return json.dumps(document, separators=(",", ":")).encode()
+
+    @staticmethod
+    def fill(value, placeholders: Dict[str, str]):
+        """
+        Replaces the placeholders in the strings of a decoded template.
+        """
+        if isinstance(value, dict):
+            return {key: RequestFactory.fill(item, placeholders) for key, item in value.items()}
+        if isinstance(value, list):
+            return [RequestFactory.fill(item, placeholders) for item in value]
+        if isinstance(value, str):
+            for placeholder, replacement in placeholders.items():
+                value = value.replace(placeholder, replacement)
+        return value
+
+    def search_body(self, listing_type: str, state_name: str, state_code: str, search_date: str,
+                    offset: int, limit: int, price_filter: Optional[dict] = None) -> bytes:
+        """
+        Builds the body of a search results page request.
+
+        Args:
+            listing_type (str): the type of listings searched.
+            state_name (str): the slug of the searched state e.g. "new-york".
+            state_code (str): the two letters code of the searched state.
+            search_date (str): the earliest list "or sold" date of the listings.
+            offset (int): the offset of the page.
+            limit (int): the number of results of the page.
+            price_filter (dict): the {"min": .., "max": ..} price filter of a price band, None for all prices,
+                                 {"exclude": {..}} excludes the prices instead "see SearchPartitioner.price_filter".
+
+        Returns:
+            bytes: the JSON body.
+        """
+        key = ("search", listing_type, state_name, search_date)
+        if key not in self.compiled:
+            template = self.fill(self.search_templates[listing_type], {"**": state_name, "--": state_code, "==": search_date})
+            self.compiled[key] = (*compile_body(template, self.search_queries[listing_type], self.persisted_queries), template["variables"])
+        prefix, suffix, variables = self.compiled[key]
+        variables = {**variables, "limit": limit, "offset": offset}
+        if price_filter is not None and "exclude" in price_filter:
+            variables["query"] = {"exclude": {self.price_fields[listing_type]: price_filter["exclude"]}, **variables["query"]}
+        elif price_filter is not None:
+            variables["query"] = {self.price_fields[listing_type]: price_filter, **variables["query"]}
+        return prefix + json.dumps(variables, separators=(",", ":")).encode() + suffix
+
+    def listing_body(self, property_id, listing_id) -> bytes:
+        """
+        Builds the body of a single listing request.
+        """
+        if "listing" not in self.compiled:
+            self.compiled["listing"] = compile_body(self.listing_template, self.listing_query, self.persisted_queries)
+        prefix, suffix = self.compiled["listing"]
+        variables = {"propertyId": str(property_id), "listingId": None if listing_id is None else str(listing_id)}
+        return prefix + json.dumps(variables, separators=(",", ":")).encode() + suffix
+
+    def batch_body(self, listings: List[Tuple[str, Optional[str]]]) -> bytes:
+        """
+        Builds the body of a batched listings request.
+
+        Args:
+            listings (list): the (property_id, listing_id) of each listing in the batch.
+
+        Returns:
+            bytes: the JSON body.
+        """
+        key = ("batch", len(listings))
+        if key not in self.compiled:
+            query = minify_graphql(self.detail_batches.query(len(listings)))
+            self.register(query)
+            self.compiled[key] = compile_body(self.listing_template, query, self.persisted_queries)
+        prefix, suffix = self.compiled[key]
+        variables = {}
+        for n, (property_id, listing_id) in enumerate(listings):
+            variables[f"propertyId{n}"] = str(property_id)
+            variables[f"listingId{n}"] = None if listing_id is None else str(listing_id)
+        return prefix + json.dumps(variables, separators=(",", ":")).encode() + suffix
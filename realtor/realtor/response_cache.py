@@ -0,0 +1,156 @@
+"""
+This module defines the on-disk cache of the search and listings API responses.
+
+The APIs are POST only so the responses are keyed on the endpoint URL and the normalized JSON payload,
+the bodies are stored zstd compressed in a single SQLite file along with their size and last access time,
+the least recently used responses are evicted once the cache grows past its size limit. A crashed crawl or
+a state re-run to fix a pipeline bug is then re-processed from the cache instead of being downloaded again.
+
+Classes:
+    ResponseCache: Stores and looks up the compressed API responses.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from time import time
+from typing import Optional
+
+import zstandard
+
+
+class ResponseCache:
+    """
+    A size bounded LRU cache of the API responses backed by SQLite.
+
+    Attributes:
+        path (str): the directory and name of the cache file.
+        max_bytes (int): the max total size of the compressed bodies, 0 for no limit.
+        commit_every (int): the number of writes buffered before committing them.
+        total_bytes (int): the total size of the compressed bodies in the cache.
+        hits (int): the number of responses served from the cache.
+        misses (int): the number of responses not found or expired.
+        evicted (int): the number of responses evicted to keep the cache under its size limit.
+    """
+    hits = 0
+    misses = 0
+    evicted = 0
+
+    def __init__(self, path: str, max_bytes: int = 0, compression_level: int = 3, commit_every: int = 500):
+        """
+        Opens "or creates" the cache file.
+
+        Args:
+            path (str): the directory and name of the cache file.
+            max_bytes (int): the max total size of the compressed bodies, 0 for no limit.
+            compression_level (int): the zstd compression level.
+            commit_every (int): the number of writes buffered before committing them.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self.pending_writes = 0
+        self.compressor = zstandard.ZstdCompressor(level=compression_level)
+        self.decompressor = zstandard.ZstdDecompressor()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                cache_key BLOB PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def cache_key(url: str, body: bytes) -> bytes:
+        """
+        Builds the cache key of a request from its URL and its payload normalized "sorted keys, no whitespace".
+        """
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode()
+        except ValueError:
+            pass
+        return hashlib.blake2b(url.encode() + b"\0" + body, digest_size=16).digest()
+
+    def lookup(self, cache_key: bytes, ttl: float) -> Optional[tuple]:
+        """
+        Looks up a response stored less than `ttl` seconds ago.
+
+        Returns:
+            tuple: the status and the decompressed body, None if the response is not cached or expired.
+        """
+        now = time()
+        row = self.connection.execute(
+            "SELECT status, body, stored_at FROM responses WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+        if row is None or (ttl and now - row[2] > ttl):
+            self.misses += 1
+            return None
+        self.connection.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, cache_key))
+        self.__written()
+        self.hits += 1
+        return row[0], self.decompressor.decompress(row[1])
+
+    def store(self, cache_key: bytes, url: str, status: int, body: bytes) -> None:
+        """
+        Compresses and stores a response then evicts the least recently used ones if the cache is too big.
+        """
+        compressed = self.compressor.compress(body)
+        now = time()
+        previous = self.connection.execute("SELECT size FROM responses WHERE cache_key = ?", (cache_key,)).fetchone()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (cache_key, url, status, compressed, len(compressed), now, now),
+        )
+        self.total_bytes += len(compressed) - (previous[0] if previous else 0)
+        self.__written()
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * 0.9))
+
+    def evict(self, target_bytes: int) -> None:
+        """
+        Deletes the least recently used responses until the cache is under `target_bytes`.
+        """
+        rows = self.connection.execute("SELECT cache_key, size FROM responses ORDER BY last_access")
+        evicted_keys = []
+        for cache_key, size in rows:
+            if self.total_bytes <= target_bytes:
+                break
+            evicted_keys.append((cache_key,))
+            self.total_bytes -= size
+        self.connection.executemany("DELETE FROM responses WHERE cache_key = ?", evicted_keys)
+        self.evicted += len(evicted_keys)
+        self.commit()
+
+    def __written(self) -> None:
+        """
+        Counts a buffered write and commits once `commit_every` writes are buffered.
+        """
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Commits the buffered writes.
+        """
+        self.connection.commit()
+        self.pending_writes = 0
+
+    def close(self) -> None:
+        """
+        Commits the buffered writes and closes the cache file.
+        """
+        self.commit()
+        self.connection.close()
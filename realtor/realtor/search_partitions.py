@@ -0,0 +1,110 @@
+"""
+This module defines how a big state search is split into smaller sub-searches by price band.
+
+The search API pages through its results with an offset, the deep offsets of the big states
+"e.g. California or Texas under all_for_sale" are slow and the results shift under them so
+listings get dropped. A search reporting more than `PARTITION_MAX_RESULTS` results is split
+into price bands, each band reports its own total on its first page and is split again while
+it is still too big, the pages of the bands that fit are crawled in parallel.
+
+A listing without a price "e.g. the sold listings of the non-disclosure states like Texas" is never
+returned by a search filtered on a price range, so the split of a whole search adds an unpriced band
+"the search excluding every price" that catches them, the totals of the bands add up to the search's.
+
+Classes:
+    SearchPartitioner: Splits the price range of a search and builds the price filter of each band.
+"""
+
+from typing import List, Optional, Tuple
+
+PriceBand = Tuple[int, Optional[int]]
+"""PriceBand (tuple): the min and max price of a sub-search "inclusive", the max is None for no upper bound."""
+
+UNPRICED: PriceBand = (-1, -1)
+"""UNPRICED (tuple): the band of the listings without a price, it can't be split any further."""
+
+
+class SearchPartitioner:
+    """
+    Splits the searches reporting too many results into price bands.
+
+    The whole price range is first split on a ladder of price breaks "PARTITION_PRICE_BREAKS" plus the
+    unpriced band, a band that is still too big is halved, an open ended band "(min, None)" is split at
+    twice its min.
+
+    Attributes:
+        max_results (int): the max number of results of a sub-search before it's split, 0 disables the splitting.
+        price_breaks (list): the prices the whole price range is first split at.
+    """
+
+    def __init__(self, max_results: int, price_breaks: List[int]):
+        """
+        Initializes the partitioner.
+
+        Args:
+            max_results (int): the max number of results of a sub-search before it's split, 0 disables the splitting.
+            price_breaks (list): the prices the whole price range is first split at.
+        """
+        self.max_results = max_results
+        self.price_breaks = sorted({int(price) for price in price_breaks if int(price) > 0})
+
+    def needs_split(self, results_available: int, band: Optional[PriceBand]) -> bool:
+        """
+        Checks whether a search reports too many results and its price band can still be split.
+
+        Args:
+            results_available (int): the total reported by the first page of the search.
+            band (tuple): the price band of the search, None for the whole price range.
+        """
+        if not self.max_results or results_available <= self.max_results or band == UNPRICED:
+            return False
+        return band is None or band[1] is None or band[1] > band[0]
+
+    def split(self, band: Optional[PriceBand]) -> List[PriceBand]:
+        """
+        Splits a price band into smaller ones.
+
+        Args:
+            band (tuple): the price band to split, None for the whole price range.
+
+        Returns:
+            list: the price bands covering the same listings "the whole price range is covered along with the unpriced band".
+        """
+        if band is None:
+            lower_bounds = [0] + self.price_breaks
+            return [(low, high - 1) for low, high in zip(lower_bounds, self.price_breaks)] + [(lower_bounds[-1], None), UNPRICED]
+        low, high = band
+        if high is None:
+            middle = max(low * 2, low + 1)
+            return [(low, middle - 1), (middle, None)]
+        middle = (low + high) // 2
+        return [(low, middle), (middle + 1, high)]
+
+    @staticmethod
+    def label(band: Optional[PriceBand]) -> str:
+        """
+        Describes a price band e.g. "$100000-$199999".
+        """
+        if band is None:
+            return "all prices"
+        if band == UNPRICED:
+            return "no price"
+        return f"${band[0]}-${band[1]}" if band[1] is not None else f"${band[0]}+"
+
+    @staticmethod
+    def price_filter(band: Optional[PriceBand]) -> Optional[dict]:
+        """
+        Builds the search query price filter of a band e.g. {"min": 100000, "max": 199999}, the unpriced
+        band excludes every price "{"exclude": {"min": 0}}".
+
+        Args:
+            band (tuple): the price band, None for the whole price range.
+
+        Returns:
+            dict: the price filter, None for the whole price range.
+        """
+        if band is None:
+            return None
+        if band == UNPRICED:
+            return {"exclude": {"min": 0}}
+        return {"min": band[0], "max": band[1]} if band[1] is not None else {"min": band[0]}
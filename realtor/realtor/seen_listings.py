@@ -0,0 +1,62 @@
+"""
+This module defines the set of the listings already seen during a scraping session.
+
+The offset pagination of the search results shifts while the pages are crawled so the same listing
+can appear on two pages, the set is consulted before a listing is requested or exported so each one
+is only handled once.
+
+Classes:
+    SeenListings: A set of 64 bits hashes of the listings property_id and listing_id.
+"""
+
+import hashlib
+from typing import Set
+
+
+class SeenListings:
+    """
+    A compact set of the listings seen during a scraping session.
+
+    Each listing is stored as a stable 64 bits integer hash of its property_id and listing_id,
+    so the set can be kept in the spider's `state` attribute and persisted in the JOBDIR between
+    pause and resume.
+
+    Attributes:
+        hashes (set): the hashes of the seen listings.
+        duplicates (int): the number of duplicate listings skipped.
+    """
+    duplicates = 0
+
+    def __init__(self, hashes: Set[int]):
+        """
+        Initializes the set.
+
+        Args:
+            hashes (set): the hashes of the seen listings "restored on resume".
+        """
+        self.hashes = hashes
+
+    @staticmethod
+    def listing_hash(property_id, listing_id) -> int:
+        """
+        Hashes the ids of a listing, unlike the built-in `hash` it's stable between runs.
+        """
+        digest = hashlib.blake2b(f"{property_id}:{listing_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little")
+
+    def add(self, property_id, listing_id) -> bool:
+        """
+        Adds a listing to the set.
+
+        Returns:
+            bool: True if the listing was not seen before.
+        """
+        listing_hash = self.listing_hash(property_id, listing_id)
+        if listing_hash in self.hashes:
+            self.duplicates += 1
+            return False
+        self.hashes.add(listing_hash)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.hashes)
@@ -29,25 +29,96 @@ RETRY_TIMES = 3
 # RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
 RETRY_HTTP_CODES = []
 HEADERS_UPDATE_WAIT = 10
+# the pool of scraping header sets spread over the requests
+HEADERS_POOL_FILE = "realtor/spiders/scraping_headers_pool.json"
+# the number of header sets the pool is replenished to in the background once one of its sets is retired
+HEADERS_POOL_SIZE = 3
+# the number of consecutive failures after which a header set is retired
+HEADERS_RETIRE_AFTER = 3
+# "least_recently_failed" or "round_robin"
+HEADERS_POOL_STRATEGY = "least_recently_failed"
+# the persistent profile of the warm browser session harvesting the headers, leave it empty for a throwaway profile
+HEADERS_BROWSER_PROFILE = "realtor/crawl_jobs/browser_profile"
+# the max seconds a harvest waits for the search API request of the page
+HEADERS_HARVEST_WAIT = 120
+# the attempts of a harvest before it gives up, the spider is closed if the whole pool is burned by then
+HEADERS_HARVEST_ATTEMPTS = 5
 
 SAVE_POINTS_DIR = "realtor/crawl_jobs/temporary_save_points"
 PRIMARY_OUTPUTS_DIR = "realtor/primary_outputs"
+# the index of the previously scraped listings e.g. "realtor/crawl_jobs/listings_index.sqlite3",
+# empty "the default" requests every listing
+LISTINGS_INDEX = ""
+# the append-only history of the price and status of every scraped listing across the runs
+# e.g. "realtor/crawl_jobs/listings_history.sqlite3", empty "the default" disables it
+LISTINGS_HISTORY = ""
+# the number of observations added to the listings history in a single transaction
+LISTINGS_HISTORY_BATCH_SIZE = 5000
 OUTPUT_DIR = "realtor/outputs"
+# "xlsx" saves an Excel file per state after the crawl is finished, 
+# "parquet" streams the items into a state partitioned Parquet dataset while crawling
+OUTPUT_FORMAT = "xlsx"
+PARQUET_ROW_GROUP_SIZE = 10000
+# the number of processes writing the xlsx files of the states in parallel, 0 for one per CPU core
+XLSX_EXPORT_PROCESSES = 0
 
 
 JOBDIR= "realtor/crawl_jobs/realtor_spider_job"
+# the pending requests are checkpointed as compact cursors in the spider state and rebuilt on resume,
+# so the scheduler keeps them in memory instead of pickling them to the JOBDIR
+SCHEDULER = "realtor.checkpoints.CheckpointScheduler"
  
 
 BOT_NAME = "realtor"
 
 INPUT_FILE = "realtor inputs.txt"
+# the max number of states scraped at the same time
+CONCURRENT_STATES = 3
+# the search pages are requested lazily: at most this many of them at the same time and only while
+# fewer than REQUESTS_BACKLOG requests are pending, the listings requests always go before the search pages
+SEARCH_PAGES_IN_FLIGHT = 8
+REQUESTS_BACKLOG = 1000
+
+# a work frontier "an SQLite file" shared by several spider processes on one or more hosts, leave it empty
+# to crawl the input file states in a single spider, each worker needs its own JOBDIR
+FRONTIER = ""
+# the seconds a claimed unit stays claimed without being renewed, the units of a dead worker are claimed again after it
+FRONTIER_LEASE_SECONDS = 300
+# the number of search pages in each unit of a state × a listing type × a page range
+FRONTIER_UNIT_PAGES = 25
+# the workers leave their partial outputs here for the last worker to merge, next to FRONTIER by default
+FRONTIER_PARTS_DIR = ""
+# the id of the crawl the worker joins "<listing types> <date> by default" and the id of the worker "<host>-<pid> by default"
+FRONTIER_CRAWL = ""
+FRONTIER_WORKER = ""
+
+# the number of listings requested in each listings API request, above 1 the listings of a search results page
+# are batched into one GraphQL request of aliased home(...) selections
+DETAIL_BATCH_SIZE = 1
+
+# a state search reporting more than this many results is split into price bands crawled in parallel,
+# a band that is still too big is halved, 0 pages through every state search as a whole
+PARTITION_MAX_RESULTS = 2000
+# the prices the whole price range of a big search is first split at
+PARTITION_PRICE_BREAKS = [100000, 200000, 300000, 400000, 500000, 750000, 1000000, 2000000]
+
+# build the listings items straight from the search results without requesting the listings API
+SEARCH_ONLY = False
+# the fields to request from the listings API in the search only mode
+# any of "agent", "office", "agent_email" and "office_email"
+DETAIL_FIELDS = []
 
 SCRAPING_HEADERS = {}
 
 SPIDER_MODULES = ["realtor.spiders"]
 NEWSPIDER_MODULE = "realtor.spiders"
 
+# the search results page size, it's also the fallback when a larger probed page is rejected or truncated
 RESULTS_PER_PAGE = 42
+# probe the largest search results page size the search API serves in full on a fresh start
+PAGE_SIZE_PROBE = True
+# the page sizes to probe, the largest one served in full is used
+PAGE_SIZE_PROBE_LIMITS = [200, 100]
 
 SCRAPING_HEADERS = {}
 
@@ -59,6 +130,22 @@ ROBOTSTXT_OBEY = False
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 CONCURRENT_REQUESTS = 20
 
+# AIMD concurrency limits for the search and listings APIs, each endpoint ramps up while its responses are healthy
+# and backs off multiplicatively on block signals, the current limits are in the crawl stats "adaptive_concurrency/..."
+# the two endpoints share CONCURRENT_REQUESTS_PER_DOMAIN "8 by default" like the single realtor.com slot they replace,
+# disabled by default "within that budget the single slot crawled faster in bench_crawl, with and without blocks"
+ADAPTIVE_CONCURRENCY = False
+# the starting limit of each endpoint, empty splits CONCURRENT_REQUESTS_PER_DOMAIN between them
+ADAPTIVE_CONCURRENCY_START = ""
+ADAPTIVE_CONCURRENCY_MIN = 1
+# the highest limit of an endpoint, it's capped by CONCURRENT_REQUESTS_PER_DOMAIN
+ADAPTIVE_CONCURRENCY_MAX = 8
+# the factor a limit is multiplied by on a block signal
+ADAPTIVE_CONCURRENCY_BACKOFF = 0.5
+# a limit stops growing while its endpoint's latency is above this many times its lowest latency
+ADAPTIVE_CONCURRENCY_LATENCY_FACTOR = 3.0
+ADAPTIVE_CONCURRENCY_BLOCK_CODES = [403, 429, 502]
+
 
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
@@ -86,14 +173,44 @@ CONCURRENT_REQUESTS = 20
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
+   "realtor.middlewares.RealtorCacheMiddleware": 500,
    "realtor.middlewares.RealtorDownloaderMiddleware": 543,
+   "realtor.middlewares.PersistedQueryMiddleware": 550,
+}
+
+# send the GraphQL queries as Apollo persisted query hashes instead of the query text,
+# it's turned off on its own if the API answers PersistedQueryNotSupported
+PERSISTED_QUERIES = False
+
+# the zstd compressed cache of the search and listings API responses e.g. "realtor/crawl_jobs/response_cache.sqlite3",
+# empty "the default" disables it, it's meant for re-running a crashed crawl or for development and benchmark runs,
+# a cached response is reused until its RESPONSE_CACHE_TTL expires with the prices and statuses it had when it was cached
+RESPONSE_CACHE = ""
+# the least recently used responses are evicted past this size
+RESPONSE_CACHE_MAX_MB = 2048
+RESPONSE_CACHE_COMPRESSION_LEVEL = 3
+# the seconds a cached response stays fresh for each listing type "a second crawl within the TTL sees the first one's listings"
+RESPONSE_CACHE_TTL = {
+    "new_listings": 3600,
+    "all_for_sale": 43200,
+    "sold_listings": 604800,
 }
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+   "realtor.metrics.CrawlMetrics": 500,
+}
+
+# the crawl metrics in the Prometheus text format, served on http://127.0.0.1:METRICS_PORT/metrics
+# while crawling "0 disables the endpoint" and dumped to METRICS_FILE when the spider is closed,
+# they are off by default so a crawl doesn't bind the port unless it's asked to
+METRICS_ENABLED = False
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9410
+# the seconds between the samples of the requests/sec and items/sec rates
+METRICS_INTERVAL = 10
+METRICS_FILE = "realtor/crawl_jobs/metrics.prom"
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
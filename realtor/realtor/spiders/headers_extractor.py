@@ -1,48 +1,57 @@
 """
 Module to dynamically extract HTTP request headers by simulating user interaction on realtor.com.
-This module uses Selenium WebDriver with stealth techniques to bypass bot detection and intercepts
-network requests to construct valid headers for API requests.
+This module uses Selenium WebDriver with stealth techniques to bypass bot detection and reads the
+network requests of the page from the Chrome DevTools network events to construct valid headers for API requests.
+
+The browser is a long-lived harvesting session: it's started once with a persistent profile "its cookies and
+local storage stay warm between harvests and runs", the images, fonts, media and analytics requests the header
+capture doesn't need are blocked through DevTools, and each harvest only navigates to a search page and stops
+loading it as soon as the search API request shows up in the network events.
+
+A harvest gives up after a number of attempts, and it can be stopped from another thread "e.g. when the spider
+is closed" without waiting for its backoff, the browser is quit by the harvest once it's stopped.
+
+selenium, selenium_stealth and fake_useragent are only imported once a browser is started, so importing
+this module "e.g. by `scrapy list` walking the spiders package" stays cheap.
 
 Typical usage example:
 
     GetHeaders: Handles the extraction of headers from network requests.
     update_headers = GetHeaders()
     headers = update_headers.fresh_headers("alabama", 60)
+    update_headers.close()
 """
 
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.options import Options
-
-from seleniumwire import webdriver
-from selenium_stealth import stealth
-from time import sleep
+from time import time, perf_counter
+import json
+import os
 import random
-from fake_useragent import UserAgent
-from typing import Dict, Optional
+import threading
+from typing import Dict, List, Optional
 
 
 class GetHeaders:
     """
-    A class to extract headers dynamically by intercepting network requests using Selenium WebDriver.
+    A class to extract headers dynamically from the DevTools network events of a warm Selenium WebDriver session.
     Designed specifically for requests to realtor.com.
 
     Attributes:
-        extracted (bool): Flag indicating whether headers have been successfully extracted.
-        first_option (list): List of headers captured using the first option strategy.
-        second_option (list): List of headers captured using the second option strategy.
+        first_option (list): List of headers captured from the search API request.
+        second_option (list): List of headers captured from any other request carrying the tracing headers.
         headers_template (dict): Template for constructing HTTP headers with common fields.
         API (str): URL of the API endpoint being monitored.
         payload_sample (str): Partial string used to identify specific API requests by their payload.
-        g_accounts_iframe (str): URL pattern used to identify Google account-related requests.
+        BLOCKED_URLS (list): The DevTools URL patterns of the assets the header capture doesn't need.
+        profile_dir (str): The directory of the persistent browser profile, None for a throwaway profile.
+        blocked_urls (list): The URL patterns blocked in the browser.
+        driver (Optional[selenium.webdriver.Chrome]): The warm browser, None until the first harvest.
+        harvests (int): The number of header sets harvested by the session.
+        last_harvest_seconds (float): The time-to-fresh-headers of the last harvest "including the retries".
+        stopped (threading.Event): Set once the session is stopped, no harvest is run after.
+        harvesting (bool): Whether a harvest is running in a thread.
+        lock (threading.Lock): Lets either the harvest or `stop` quit the browser once the session is stopped.
     """
 
-    extracted = False
-    first_option = []
-    second_option = []
     headers_template = {
         "host": "www.realtor.com",
         "accept": "application/json, text/javascript",
@@ -59,24 +68,62 @@ class GetHeaders:
     API = "https://www.realtor.com/api/v1/rdc_search_srp?client_id=rdc"
 
     payload_sample = "{\"query\":\"\\n  query ConsumerSearchQuery(\\n    $query: HomeSearchCriteria!\\n    $limit: Int\\n    $offset: Int\\n"
-    g_accounts_iframe = "https://accounts.google.com/o/oauth2/iframe#origin=https"
+    BLOCKED_URLS = [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4", "*.webm",
+        "*ap.rdcpix.com*", "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+        "*accounts.google.com*", "*facebook.net*", "*bam.nr-data.net*", "*hotjar*", "*optimizely*",
+    ]
+    harvests = 0
+    last_harvest_seconds = 0.0
+    harvesting = False
+
+    def __init__(self, profile_dir: Optional[str] = None, blocked_urls: Optional[List[str]] = None):
+        """
+        Initializes the harvesting session, the browser itself is started by the first harvest.
+
+        Args:
+            profile_dir (str): The directory of the persistent browser profile, None for a throwaway profile.
+            blocked_urls (list): The URL patterns blocked in the browser, BLOCKED_URLS by default.
+        """
+        self.profile_dir = profile_dir
+        self.blocked_urls = self.BLOCKED_URLS if blocked_urls is None else blocked_urls
+        self.driver = None
+        self.first_option = []
+        self.second_option = []
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
 
     def __initiate_browser(self, user_agent: str) -> None:
         """
-        Initializes a Chrome WebDriver with specific options and stealth mode.
+        Initializes a Chrome WebDriver with the DevTools network events logged, the assets blocked and stealth mode.
 
         Args:
             user_agent (str): The user agent string to set in the browser.
         """
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium_stealth import stealth
+
         options = Options()
         options.add_argument("--disable-extensions")
-        options.add_argument("--disable-proxy-certificate-handler")
         options.add_argument("--start-maximized")
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            options.add_argument(f"--user-data-dir={os.path.abspath(self.profile_dir)}")
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
-        prefs = {"profile.default_content_setting_values.geolocation": 2}
+        prefs = {
+            "profile.default_content_setting_values.geolocation": 2,
+            "profile.managed_default_content_settings.images": 2,
+        }
         options.add_experimental_option("prefs", prefs)
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        # the harvest returns as soon as the search API request is sent, not when the page is loaded
+        options.page_load_strategy = "none"
         self.driver = webdriver.Chrome(options=options)
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_urls})
 
         self.user_agent = user_agent
         stealth(self.driver,
@@ -89,72 +136,69 @@ class GetHeaders:
                 fix_hairline=True,
                 )
 
-    def __construct_headers(self, request_headers: Dict[str, str], first_option: bool, quit_browser: bool) -> None:
+    def __construct_headers(self, request_headers: Dict[str, str], page_url: str, first_option: bool) -> None:
         """
-        Constructs headers from intercepted request headers and stores them.
+        Constructs headers from the headers of a request and stores them.
 
         Args:
-            request_headers (dict): The headers intercepted from a request.
+            request_headers (dict): The lowercased headers of a request.
+            page_url (str): The URL of the page that sent the request, used if it has no referer.
             first_option (bool): Determines whether to save headers to the first option list.
-            quit_browser (bool): Indicates whether the browser should quit after this step.
         """
         headers = self.headers_template.copy()
         headers.update({
-            "user-agent": request_headers["user-agent"],
+            "user-agent": request_headers.get("user-agent", self.user_agent),
             "traceparent": request_headers["traceparent"],
             "tracestate": request_headers["tracestate"],
             "newrelic": request_headers["newrelic"],
-            "referer": request_headers["referer"],
+            "referer": request_headers.get("referer", page_url),
         })
         if first_option:
             self.first_option.append(headers)
         else:
             self.second_option.append(headers)
-        if quit_browser:
-            self.extracted = True
 
-    def __requests_interceptor__(self, request) -> None:
+    def __inspect_network_events(self, page_url: str) -> None:
         """
-        Intercepts network requests made by the browser and processes headers if conditions match.
+        Reads the requests sent since the last call from the DevTools network events and keeps the headers of the matching ones.
         """
-        if request.path.endswith(('.png', '.jpg', '.gif')) or "google" in request.url:
-            request.abort()
-        else:
-            request_headers = dict(request.headers)
-            try:
-                request_body = request.body.decode("utf-8")
-            except Exception:
-                request_body = None
-            if self.API in request.url and self.payload_sample in request_body:
-                self.API = request.url
-                self.__construct_headers(request_headers, True, True)
-            elif request_headers.get("newrelic") and request_headers.get("traceparent") and request_headers.get("tracestate"):
-                self.API = request.url
-                self.__construct_headers(request_headers, False, False)
+        for entry in self.driver.get_log("performance"):
+            event = json.loads(entry["message"])["message"]
+            if event.get("method") != "Network.requestWillBeSent":
+                continue
+            request = event["params"]["request"]
+            request_headers = {key.lower(): value for key, value in request.get("headers", {}).items()}
+            if not (request_headers.get("newrelic") and request_headers.get("traceparent") and request_headers.get("tracestate")):
+                continue
+            if self.API in request["url"] and self.payload_sample in request.get("postData", ""):
+                self.API = request["url"]
+                self.__construct_headers(request_headers, page_url, True)
+            else:
+                self.__construct_headers(request_headers, page_url, False)
 
-    def __requests_inspector(self) -> Dict[str, str]:
+    def __run(self, state: str, wait_period: int = 180) -> Dict[str, str]:
         """
-        Inspects intercepted requests to find matching headers.
+        Runs the header extraction process for a given state in the warm browser.
+
+        Args:
+            state (str): The state for which to extract headers.
+            wait_period (int): The maximum wait time for the search API request to be sent.
 
         Returns:
-            dict: The headers of a matching request.
+            dict: The extracted headers.
 
         Raises:
             ValueError: If no headers are found.
         """
-        for request in self.driver.requests:
-            if not request.response:
-                continue
-            request_headers = dict(request.headers)
-            try:
-                request_body = request.body.decode("utf-8")
-            except Exception:
-                request_body = None
-            if self.API in request.url and not self.extracted and self.payload_sample in request_body:
-                self.API = request.url
-                self.__construct_headers(request_headers, True, False)
-            elif request_headers.get("newrelic") and request_headers.get("traceparent") and request_headers.get("tracestate"):
-                self.__construct_headers(request_headers, False, False)
+        self.first_option, self.second_option = [], []
+        url = f"https://www.realtor.com/realestateandhomes-search/{state}/show-recently-sold"
+        self.driver.get_log("performance")
+        self.driver.get(url)
+        deadline = time() + wait_period
+        while time() < deadline and not self.first_option and not self.stopped.is_set():
+            self.__inspect_network_events(url)
+            self.stopped.wait(0.25)
+        self.driver.execute_script("window.stop();")
 
         if self.first_option:
             return self.first_option[-1]
@@ -163,50 +207,74 @@ class GetHeaders:
         else:
             raise ValueError("Headers are not found!")
 
-    def __run(self, state: str, wait_period: int = 180) -> Dict[str, str]:
+    def fresh_headers(self, state: str = "", wait_period: int = 180, attempts: int = 5) -> Dict[str, str]:
         """
-        Runs the header extraction process for a given state.
+        Harvests fresh headers in the warm browser "started on the first harvest or after a failure".
+
+        A failed attempt restarts the browser after an exponential backoff of 5 seconds up to 2 minutes,
+        the harvest gives up after `attempts` attempts or as soon as the session is stopped.
 
         Args:
-            state (str): The state for which to extract headers.
-            wait_period (int): The maximum wait time for web elements to load.
+            state (str): The state to scrape headers for.
+            wait_period (int): The maximum wait time for the search API request to be sent.
+            attempts (int): The maximum number of attempts.
 
         Returns:
             dict: The extracted headers.
-        """
-        self.driver.request_interceptor = self.__requests_interceptor__
-        url = f"https://www.realtor.com/realestateandhomes-search/{state}/show-recently-sold"
 
+        Raises:
+            RuntimeError: If the session is stopped before an attempt.
+            Exception: The error of the last attempt if they all failed "or if the session was stopped during it".
+        """
+        with self.lock:
+            if self.stopped.is_set():
+                raise RuntimeError("the headers harvesting session is stopped")
+            self.harvesting = True
+        started = perf_counter()
+        backoff = 5
         try:
-            self.driver.get(url)
-        except Exception:
-            pass
+            for attempt in range(1, max(1, attempts) + 1):
+                if self.stopped.is_set():
+                    raise RuntimeError("the headers harvest was stopped")
+                try:
+                    if self.driver is None:
+                        from fake_useragent import UserAgent
 
-        headers = self.__requests_inspector() if not self.extracted else self.first_option[-1]
-        self.driver.quit()
+                        self.__initiate_browser(UserAgent(os="macos", browsers="chrome").random)
+                    headers = self.__run(state or random.choice(["Texas", "New-York", "Florida", "New-Jersey", "California"]), wait_period)
+                    break
+                except Exception:
+                    self.close()
+                    if attempt >= attempts or self.stopped.is_set():
+                        raise
+                    self.stopped.wait(random.uniform(backoff, 2 * backoff))
+                    backoff = min(backoff * 2, 120)
+        finally:
+            with self.lock:
+                self.harvesting = False
+                if self.stopped.is_set():
+                    self.close()
+        self.harvests += 1
+        self.last_harvest_seconds = perf_counter() - started
         return headers
 
-    def fresh_headers(self, state: str = "", wait_period: int = 180) -> Dict[str, str]:
+    def stop(self) -> None:
         """
-        Generates fresh headers by simulating user interaction on realtor.com.
-
-        Args:
-            state (str): The state to scrape headers for.
-            wait_period (int): The maximum wait time for web elements to load.
+        Stops the session from another thread, a harvest in progress gives up and quits the browser
+        "the browser is quit right away otherwise".
+        """
+        with self.lock:
+            self.stopped.set()
+            if not self.harvesting:
+                self.close()
 
-        Returns:
-            dict: The extracted headers.
+    def close(self) -> None:
+        """
+        Quits the browser, the next harvest starts a new one with the same profile.
         """
-        ua = UserAgent(os="macos", browsers="chrome")
-        while True:
+        if self.driver is not None:
             try:
-                self.__initiate_browser(ua.random)
-                headers = self.__run(state or random.choice(["Texas", "New-York", "Florida", "New-Jersey", "California"]), wait_period)
-                break
+                self.driver.quit()
             except Exception:
-                try:
-                    self.driver.quit()
-                except Exception:
-                    pass
-                sleep(random.uniform(60, 180))
-        return headers
+                pass
+            self.driver = None
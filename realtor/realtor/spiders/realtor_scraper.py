@@ -1,16 +1,27 @@
 import scrapy
 from scrapy import signals
-from scrapy.exceptions import DontCloseSpider
+from scrapy.exceptions import CloseSpider, DontCloseSpider
+from twisted.python.failure import Failure
 
-from realtor.items import Listing_Item, RealtorItemLoader
+from realtor.items import Listing_Item, ExtractionPlan
 from realtor.constants import PRIMARY_REQUEST_DATA,SECONDARY_PAYLOAD, STATES, STATES_CODES
+from realtor.constants import SEARCH_ONLY_PRIMARY_REQUEST_DATA, DETAIL_ONLY_FIELDS, PRICE_FILTER_FIELDS, LISTING_TYPES
+from realtor.states_queue import StatesQueue, state_completed
+from realtor.frontier import WorkFrontier, FrontierStatesQueue
+from realtor.listings_index import ListingsIndex
+from realtor.seen_listings import SeenListings
+from realtor.search_partitions import SearchPartitioner
+from realtor.detail_batches import DetailBatchPayload
+from realtor.request_factory import RequestFactory
 
 
+from dataclasses import asdict
 from datetime import date, timedelta 
 from typing import Literal
 from time import time
-import jmespath
+import json
 import os
+import socket
 
 class RealtorScraperSpider(scrapy.Spider):
     """
@@ -22,18 +33,67 @@ class RealtorScraperSpider(scrapy.Spider):
     
     it takes the states to look for listings in through a txt file 
     "realtor inputs.txt", scrapes the data and save then temporarily
-    in a jsonl file in "crawl_jobs\\temporary_save_points" and after
-    the scraping is completed it wipes the txt input file, deletes
-    the jsonl file and save the final output as xlsx files in the 
-    "outputs" directory.
+    in a jsonl file per state in "crawl_jobs\\temporary_save_points" and
+    as soon as a state is completely scraped it removes the state from
+    the txt input file, deletes its jsonl file and save its final output
+    as xlsx files in the "outputs" directory.
     
-    it can be paused and resumed seamlessly.
+    it scrapes up to "CONCURRENT_STATES" states at the same time, each
+    state is removed from the txt input file as soon as all of its
+    requests are done.
+    
+    in the search only mode "SEARCH_ONLY" the listings items are built
+    straight from the search results, the listings API is only requested
+    for the "DETAIL_FIELDS" that are not available in the search results.
+    
+    the listings scraped in the previous runs are kept in an on-disk index
+    "LISTINGS_INDEX", a listing whose price, status, list date and sold date
+    did not change is emitted from the index without requesting it again.
+    
+    a listing that shows up on more than one search results page is only
+    requested and exported once.
+    
+    a state search reporting more than "PARTITION_MAX_RESULTS" results is
+    split into price bands crawled in parallel instead of paging deep into
+    a single search.
+    
+    the search results page size is probed on a fresh start, the largest
+    "PAGE_SIZE_PROBE_LIMITS" page the search API serves in full is used,
+    it falls back to "RESULTS_PER_PAGE" if the API rejects or truncates
+    a page later on.
+    
+    with "DETAIL_BATCH_SIZE" above 1 the listings of a search results page
+    are requested from the listings API in batches of aliased GraphQL
+    selections, only the listings missing from a batch response are retried.
+    
+    the search pages of a state are requested lazily while the requests
+    backlog is under "REQUESTS_BACKLOG" and the listings requests go before
+    the search pages, so the scheduler queue stays bounded and the items
+    reach the pipeline from the start of the crawl.
+    
+    several listing types can be scraped in one crawl "listing_type=all"
+    or e.g. "new_listings,sold_listings", the searches of each state run
+    together and share the headers, the connections and the listings
+    already seen, each listing is requested once and tagged with all the
+    types it belongs to. new_listings is a subset of all_for_sale so with
+    both of them only all_for_sale is searched and the listings listed
+    since yesterday are tagged as new_listings too.
+    
+    several spider processes "workers" can crawl together on one or more
+    hosts by sharing a work frontier "FRONTIER", they claim the units of
+    a state × a listing type × a page range, report them done and write
+    partial outputs merged by the last worker to finish, the units of a
+    dead worker are claimed again once their leases expire.
+    
+    it can be paused and resumed seamlessly, the pending requests of each
+    state are checkpointed as compact cursors "search pages and listing ids"
+    and rebuilt from the request templates on resume.
     
     Args:
         scrape_all (Literal["True","False"]): converted to bool with eval, whether to crawl 
             through all the USA states or stick to the states manually provided in the txt input file.
-        listing_type (Literal["new_listings", "all_for_sale", "sold_listings"]): the type of listings 
-            to scrape.
+        listing_type (str): the type of listings to scrape "new_listings", "all_for_sale" or "sold_listings",
+            several comma separated types or "all" for the three of them.
 
     Attributes:
     
@@ -42,19 +102,46 @@ class RealtorScraperSpider(scrapy.Spider):
         WEBSITE (str): the main website to be scraped "Realtor".
         Primary_API (str): the URL of the API that have the results data of a search.
         Secondary_API (str): the URL of the API that have each listing data individually.
-        RESULTS_PER_PAGE (int): the number of results appear for a search in the results page.
+        listing_types (list): the types of listings scraped.
+        listing_type (str): the label of the scraped types used in the outputs names e.g. "new_listings+sold_listings".
+        search_types (list): the types of listings searched, new_listings is left to all_for_sale when both are scraped.
         page_requests_sent (int): tracks the number of requests sent to the search results API. 
         page_requests_received (int): tracks the number of requests received from the search results API.
         listings_requests_sent (int): tracks the number of requests sent to the listings API.
         listings_requests_received (int): tracks the number of requests received from the listings API 
-        pages_available (int): the number of pages available for a search.
-        results_available (int): the number of results available for a search.
         crawler (scrapy.crawler.Crawler): set by the "from_crawler" classmethod 
             after initiating the spider.
         settings (scrapy.settings.Settings): contains all the settings initiated in 
             the spider and the ones saved in the settings.py module.
         batch_size (int): the max number of concurrent requests.
         input_file (str): the the name and directory of the txt input file.
+        concurrent_states (int): the max number of states scraped at the same time.
+        states_queue (StatesQueue): hands out the states to be scraped and tracks 
+            the progress of each state in flight, a FrontierStatesQueue with a "FRONTIER".
+        states_names_and_codes (dict): maps each state name to its two letters code.
+        search_only (bool): whether to build the listings items from the search results.
+        search_partitioner (SearchPartitioner): splits the big state searches into price bands.
+        results_per_page (int): the number of results requested for each search results page.
+        page_size_fallback (int): the page size used when a larger page is rejected or truncated.
+        page_size_probe_limits (list): the page sizes probed on a fresh start, largest first.
+        detail_batch_size (int): the number of listings requested in each listings API request.
+        request_factory (RequestFactory): builds the search and listings API request bodies.
+        DETAIL_PRIORITY (int): the scheduler priority of the listings requests over the search pages.
+        CRAWL_STATE (tuple): the keys of the spider's state that only last for one crawl "dropped once it's finished".
+        pages_in_flight (int): the number of search pages requested and not processed yet.
+        stalled_states (dict): the number of times the requests of each state were rebuilt after it stalled.
+        search_pages_in_flight (int): the max number of search pages requested at the same time.
+        requests_backlog (int): the number of pending requests above which no more search pages are requested.
+        detail_fields (list): the fields requested from the listings API in the search only mode.
+        SEARCH_FIELDS (list): the item fields and their paths in a search result.
+        LISTING_FIELDS (list): the item fields and their paths in a listings API response.
+        SEARCH_PLAN (ExtractionPlan): the compiled SEARCH_FIELDS.
+        LISTING_PLAN (ExtractionPlan): the compiled LISTING_FIELDS.
+        detail_plan (ExtractionPlan): the compiled LISTING_FIELDS of the "DETAIL_FIELDS" only.
+        listings_index (ListingsIndex): the index of the previously scraped listings, 
+            None if "LISTINGS_INDEX" is empty.
+        seen_listings (SeenListings): the listings already requested or exported in the 
+            scraping session.
         today (datetime.date): the date of initiating a scraping session. 
         yesterday (datetime.date): the day before the scraping session 
             "used to get the recently listed properties".
@@ -67,16 +154,61 @@ class RealtorScraperSpider(scrapy.Spider):
     allowed_domains = ["www.realtor.com"]
     WEBSITE ="https://www.realtor.com"
     Primary_API = WEBSITE + "/api/v1/rdc_search_srp?client_id=rdc-search-for-sale-search&schema=vesta"
-    RESULTS_PER_PAGE = 42
     page_requests_sent = 0
     page_requests_received = 0
     Secondary_API = WEBSITE+"/api/v1/hulk?client_id=detail-pages&schema=vesta"
     listings_requests_sent = 0
     listings_requests_received = 0
-    pages_available:int
-    results_available:int
+    DETAIL_PRIORITY = 1
+    CRAWL_STATE = ("seen_listings", "states_in_flight", "results_per_page", "saved_states", "frontier_crawl")
+    SEARCH_FIELDS = [
+        ("state", "location.address.state"),
+        ("price", "list_price"),
+        ("URL", "href"),
+        ("property_id", "property_id"),
+        ("listing_id", "listing_id"),
+        ("type", "description.type"),
+        ("year_built", "description.year_built"),
+        ("street", "location.address.line"),
+        ("city", "location.address.city"),
+        ("state_code", "location.address.state_code"),
+        ("zip_code", "location.address.postal_code"),
+        ("bedrooms", "description.beds"),
+        ("bathrooms", "description.baths"),
+        ("sqft", "description.sqft"),
+        ("parameter", "description.lot_sqft"),
+        ("sold_date", "last_sold_date"),
+        ("sold_date", "description.sold_date"),
+        ("status", "status"),
+        ]
+    LISTING_FIELDS = [
+        ("state", "location.address.state"),
+        ("price", "list_price"),
+        ("URL", "href"),
+        ("property_id", "property_id"),
+        ("listing_id", "listing_id"),
+        ("type", "description.type"),
+        ("year_built", "description.year_built"),
+        ("street", "location.address.line"),
+        ("city", "location.address.city"),
+        ("state_code", "location.address.state_code"),
+        ("zip_code", "location.address.postal_code"),
+        ("bedrooms", "description.beds"),
+        ("bathrooms", "description.baths"),
+        ("sqft", "description.sqft"),
+        ("parameter", "description.lot_sqft"),
+        ("agent", "advertisers[0].name"),
+        ("office", "advertisers[0].office.name"),
+        ("agent_email", "advertisers[0].email"),
+        ("office_email", "advertisers[0].office.email"),
+        ("sold_date", "last_sold_date"),
+        ("status", "status"),
+        ("status", "source.raw.status"),
+        ]
+    SEARCH_PLAN = ExtractionPlan(SEARCH_FIELDS)
+    LISTING_PLAN = ExtractionPlan(LISTING_FIELDS, prefix="data.home")
     
-    def __init__(self, crawler, scrape_all: Literal["True","False"], listing_type: Literal ["new_listings", "all_for_sale", "sold_listings"]):
+    def __init__(self, crawler, scrape_all: Literal["True","False"], listing_type: str):
         """
         Initialize the spider with custom parameters.
         """
@@ -87,8 +219,16 @@ class RealtorScraperSpider(scrapy.Spider):
         self.crawler.request_batch_delay = time()
         self.batch_size = self.settings.get('CONCURRENT_REQUESTS', 100)
         self.input_file = self.settings.get('INPUT_FILE', "realtor inputs.txt")
-        self.listing_type = listing_type
+        self.concurrent_states = self.settings.getint('CONCURRENT_STATES', 3)
+        self.listing_types = list(LISTING_TYPES) if listing_type == "all" else [type_name.strip() for type_name in listing_type.split(",") if type_name.strip()]
+        if not self.listing_types or set(self.listing_types) - set(LISTING_TYPES):
+            raise ValueError(f'"{listing_type}" is not a listing type, use one or more of {LISTING_TYPES} or "all"')
+        self.listing_type = "+".join(self.listing_types)
+        self.search_types = [type_name for type_name in self.listing_types if not (type_name == "new_listings" and "all_for_sale" in self.listing_types)]
         self.scrape_all = eval(scrape_all)
+        self.search_only = self.settings.getbool('SEARCH_ONLY', False)
+        self.detail_fields = [field for field in self.settings.getlist('DETAIL_FIELDS') if field in DETAIL_ONLY_FIELDS]
+        self.detail_plan = ExtractionPlan([(field, path) for field, path in self.LISTING_FIELDS if field in self.detail_fields], prefix="data.home")
         
         self.today = date.today()
         self.yesterday = self.today - timedelta(days = 1)
@@ -98,29 +238,70 @@ class RealtorScraperSpider(scrapy.Spider):
             "new_listings":self.yesterday,
             "all_for_sale":self.two_weeks
             }
+        self.states_names_and_codes = dict(zip(STATES, STATES_CODES))
+        self.listings_index = None
+        self.page_size_fallback = self.settings.getint('RESULTS_PER_PAGE', 42)
+        self.results_per_page = self.page_size_fallback
+        self.page_size_probe_limits = sorted(
+            {int(limit) for limit in self.settings.getlist('PAGE_SIZE_PROBE_LIMITS') if int(limit) > self.page_size_fallback},
+            reverse=True,
+        ) if self.settings.getbool('PAGE_SIZE_PROBE', True) else []
+        self.detail_batch_size = max(1, self.settings.getint('DETAIL_BATCH_SIZE', 1))
+        self.request_factory = RequestFactory(
+            {listing_type: request_data["payload"] for listing_type, request_data in (SEARCH_ONLY_PRIMARY_REQUEST_DATA if self.search_only else PRIMARY_REQUEST_DATA).items()},
+            SECONDARY_PAYLOAD,
+            PRICE_FILTER_FIELDS,
+            self.settings.getbool('PERSISTED_QUERIES', False),
+        )
+        self.pages_in_flight = 0
+        self.stalled_states = {}
+        self.search_pages_in_flight = max(1, self.settings.getint('SEARCH_PAGES_IN_FLIGHT', 8))
+        self.requests_backlog = self.settings.getint('REQUESTS_BACKLOG', 1000)
+        self.search_partitioner = SearchPartitioner(
+            self.settings.getint('PARTITION_MAX_RESULTS', 2000),
+            self.settings.getlist('PARTITION_PRICE_BREAKS', [100000, 200000, 300000, 400000, 500000, 750000, 1000000, 2000000]),
+        )
 
 
     @classmethod
-    def from_crawler(cls, crawler, scrape_all: Literal["True","False"], listing_type: Literal ["new_listings", "all_for_sale", "sold_listings"]):
+    def from_crawler(cls, crawler, scrape_all: Literal["True","False"], listing_type: str):
         """
         Create a new instance of the spider from the crawler.
-        Connects the spider's get_next_state method to the spider_idle signal.
+        Connects the spider's get_next_state method to the spider_idle signal
+        and its spider_closed method to the spider_closed signal.
         """
         spider = cls(crawler, scrape_all, listing_type) 
         crawler.signals.connect(spider.get_next_state, signal=signals.spider_idle)  
+        crawler.signals.connect(spider.spider_closed, signal=signals.spider_closed)
         return spider
            
     def get_next_state(self):
         """
-        Prepare the spider to scrape the next state.
-        If there are states left to scrape, continue crawling. Otherwise, allow the spider to close.
+        Prepare the spider to scrape the next states.
+
+        The states normally advance as soon as their last request is processed, when the engine
+        goes idle with no search pages left to request the complete states still in flight are
+        marked as done. An incomplete state has stalled "none of its requests is pending anymore",
+        its pending requests are rebuilt from its cursors, the spider is closed with the state still
+        checkpointed once it stalled more than "RETRY_TIMES" times.
+        If there are states left to scrape, continue crawling. Otherwise, allow the spider to close
+        "a worker sharing a frontier waits while the other workers still have units in flight".
         """
-        self.__delete_the_scraped_state()
-        with open(self.input_file, "r") as f:
-            contents = f.read()
-        if contents:
-            self.crawler.engine.crawl(self.gen_requests())
+        requests = list(self.feed_pages())
+        if not requests:
+            for state_name in list(self.states_queue.in_flight):
+                if self.states_queue.is_complete(state_name):
+                    self.__mark_state_done(state_name)
+            requests = list(self.gen_requests())
+        if not requests and self.states_queue.in_flight:
+            requests = list(self.__requeue_stalled_states())
+        if requests:
+            for request in requests:
+                self.crawler.engine.crawl(request)
             raise DontCloseSpider 
+        elif self.states_queue.has_work():
+            # the units left are claimed by the other workers, wait for them to finish or to die
+            raise DontCloseSpider
         else:
             return
     
@@ -129,10 +310,29 @@ class RealtorScraperSpider(scrapy.Spider):
         """
         Set up initial variables before starting the requests.
         """
-        if self.scrape_all or self.input_file not in os.listdir(): 
-            self.__write_states_to_the_input_file(STATES)
+        fresh_start = "states_in_flight" not in self.state
+        self.state.setdefault("states_in_flight", {})
+        self.seen_listings = SeenListings(self.state.setdefault("seen_listings", set()))
+        if (frontier_path := self.settings.get('FRONTIER')):
+            self.states_queue = FrontierStatesQueue(
+                WorkFrontier(frontier_path, self.settings.getfloat('FRONTIER_LEASE_SECONDS', 300)),
+                self.state.setdefault("frontier_crawl", self.settings.get('FRONTIER_CRAWL') or f"{self.listing_type} {self.today}"),
+                self.state.setdefault("frontier_worker", self.settings.get('FRONTIER_WORKER') or f"{socket.gethostname()}-{os.getpid()}"),
+                self.input_file,
+                self.concurrent_states,
+                self.state["states_in_flight"],
+                self.search_types,
+                self.settings.getint('FRONTIER_UNIT_PAGES', 25),
+            )
+        else:
+            self.states_queue = StatesQueue(self.input_file, self.concurrent_states, self.state["states_in_flight"])
+        if fresh_start and (self.scrape_all or self.input_file not in os.listdir()):
+            self.states_queue.write_states(STATES)
             print(f"\nscraping all  the states")
-        self.__get_state_name__code__listing_type()
+        if not self.states_queue.has_work():
+            raise ValueError('the input file "realtor inputs.txt" is empty!')
+        if (listings_index_path := self.settings.get('LISTINGS_INDEX')):
+            self.listings_index = ListingsIndex(listings_index_path)
     
         
     def start_requests(self):
@@ -144,116 +344,463 @@ class RealtorScraperSpider(scrapy.Spider):
         self.state["two_weeks"] = self.two_weeks   
         self.state["search_time_span"] = self.search_time_span
         self.state["listing_type"] = self.listing_type
-        yield self.gen_requests()
+        self.get_initial_variables()
+        # the page cursors and feeds of a resumed crawl are offsets of the page size it was crawling with
+        if "results_per_page" in self.state:
+            self.results_per_page = self.state["results_per_page"]
+        elif self.page_size_probe_limits and not self.states_queue.in_flight:
+            yield from self.__probe_page_size(0)
+            return
+        self.state["results_per_page"] = self.results_per_page
+        yield from self.resume_requests()
+        yield from self.gen_requests()
     
     def gen_requests(self):
-        self.get_initial_variables()
-        print(f'{'='*50}')
-        print(f"\nscraping {self.state["listing_type"]} in {self.state["state_name"]} state.")
-        self.page_requests_sent +=1
-        headers, payload = self.__configure_primary_requests(1)
-        return scrapy.Request(url=self.Primary_API, headers=headers, body=payload, method="POST", callback=self.run_primary_requests)
+        """
+        Generate the first page request of each state picked from the states queue
+        "or the first pages of a page range claimed from the frontier".
+        """
+        for state_name in self.states_queue.next_states():
+            if state_name not in self.states_names_and_codes:
+                raise ValueError(f'"{state_name}" in the input file "{self.input_file}" is not a valid state name!')
+            print(f'{'='*50}')
+            print(f"\nscraping {self.state["listing_type"]} in {state_name} state.")
+            for search_type, price_band in self.states_queue.first_pages(state_name, self.search_types):
+                yield self.__primary_request(state_name, search_type, 0, self.run_primary_requests, price_band)
+        yield from self.feed_pages()
 
     
-    def load_primary_requests_list(self,pages_available):
+    def resume_requests(self, state_names=None):
         """
-        Load the list of primary requests to be made.
+        Rebuild the pending requests of the states in flight "or of the given states" from their checkpoint cursors on resume.
         """
-        return [
-            {"headers": headers, "payload": payload} 
-            for page_number in range(2, pages_available + 1) 
-            for headers, payload in [self.__configure_primary_requests(page_number)]
-        ]
+        for state_name in list(state_names or self.states_queue.in_flight):
+            cursors = self.states_queue.resume(state_name)
+            print(f"\nresuming {self.state["listing_type"]} in {state_name} state with {len(cursors)} pending requests.")
+            listings = []
+            for cursor in cursors:
+                if cursor[0] == "page":
+                    _, callback, search_type, offset, limit, price_band = cursor
+                    yield self.__primary_request(state_name, search_type, offset, getattr(self, callback), price_band, limit)
+                else:
+                    listings.extend(cursor[1])
+            if self.detail_batch_size > 1:
+                for start in range(0, len(listings), self.detail_batch_size):
+                    yield self.__batch_request(state_name, listings[start:start + self.detail_batch_size])
+            else:
+                for meta in listings:
+                    yield self.__listing_request(meta)
+
+    
+    def page_size_probed(self, response):
+        """
+        Use the probed page size if the search API served the page in full, otherwise probe the next smaller one.
+        """
+        limit = response.meta["limit"]
+        home_search = json.loads(response.body)["data"]["home_search"]
+        if len(home_search["properties"] or []) >= min(limit, home_search["total"]):
+            self.results_per_page = self.state["results_per_page"] = limit
+            print(f"\nthe search results page size is {limit}.")
+            yield from self.gen_requests()
+        else:
+            yield from self.__probe_page_size(response.meta["probe_index"] + 1)
+
+
+    def page_size_probe_failed(self, failure):
+        """
+        Probe the next smaller page size if the search API rejected the probed one.
+        """
+        self.logger.info(f"the page size {failure.request.meta['limit']} was rejected: {failure!r}")
+        yield from self.__probe_page_size(failure.request.meta["probe_index"] + 1)
+
+    
+    def feed_pages(self):
+        """
+        Request the next search pages of the states in flight "round robin" while fewer than
+        "SEARCH_PAGES_IN_FLIGHT" search pages and "REQUESTS_BACKLOG" requests are pending,
+        each search page in flight counts as the listings requests it's going to add.
+        """
+        requests_per_page = -(-self.results_per_page // self.detail_batch_size)
+        fed = True
+        while fed:
+            fed = False
+            for state_name in list(self.states_queue.in_flight):
+                backlog = self.states_queue.pending_requests() + self.pages_in_flight * requests_per_page
+                if self.pages_in_flight >= self.search_pages_in_flight or backlog >= self.requests_backlog:
+                    return
+                if (page := self.states_queue.next_page(state_name, self.results_per_page)) is not None:
+                    search_type, price_band, offset, limit = page
+                    fed = True
+                    callback = self.run_secondary_requests if limit else self.run_primary_requests
+                    yield self.__primary_request(state_name, search_type, offset, callback, price_band, limit)
 
             
     def run_primary_requests(self, response): 
         """
         Process the response from the primary API requests.
+        
+        the first page of a search reporting too many results is split into
+        price bands "its listings are left to the bands, the listings without
+        a price to the unpriced band", each band's first page is fed like the
+        other search pages and comes back here to be split again or paged through.
         """
-        self.__get_pages_available(response)
-        yield from self.run_secondary_requests(response)
+        state_name, search_type = response.meta["state_name"], response.meta["listing_type"]
+        price_band = response.meta.get("price_band")
+        data = json.loads(response.body)
+        results_available, pages_available = self.__get_pages_available(response, data)
+        
+        if self.search_partitioner.needs_split(results_available, price_band):
+            price_bands = self.search_partitioner.split(price_band)
+            print(f"\nsplitting {results_available} {search_type} properties in {state_name} ({self.search_partitioner.label(price_band)}) into {len(price_bands)} price bands.")
+            self.states_queue.split_search(state_name, search_type, price_bands)
+            yield from self.__request_done(response.meta)
+            return
         
-        print(f"\n\nprimary_stage found {self.state["results_available"]} {self.state["listing_type"]} properties in {self.state["pages_available"]} pages. ") 
-        self.crawler.total_requests_count = (self.state["pages_available"] + self.state["results_available"]) - self.page_requests_sent
+        yield from self.__secondary_requests(response, data)
+        self.__retry_truncated_page(response, data)
+        if price_band is None:
+            print(f"\n\nprimary_stage found {results_available} {search_type} properties in {state_name} in {pages_available} pages. ")
+        else:
+            print(f"\nprimary_stage found {results_available} {search_type} properties in {state_name} ({self.search_partitioner.label(price_band)}) in {pages_available} pages. ")
+        self.crawler.total_requests_count = sum(
+            (state_progress["pages_available"] or 1) + (state_progress["results_available"] or 0) - state_progress["requests_received"]
+            for state_progress in self.states_queue.in_flight.values()
+            )
         print(f"total requests to make: {self.crawler.total_requests_count}")
         
-        for request in self.load_primary_requests_list(self.state["pages_available"]):
-            self.page_requests_sent +=1
-            yield scrapy.Request(url=self.Primary_API, headers=request["headers"], body=request["payload"], method="POST", callback=self.run_secondary_requests)  
+        self.states_queue.add_pages(state_name, search_type, price_band, response.meta.get("limit", self.page_size_fallback), results_available)
+        yield from self.__request_done(response.meta)
  
         
     def run_secondary_requests(self, response):
         """
         Process the response from the secondary API requests.
         """
-        j_listings_prime_data = jmespath.search("data.home_search.properties",response.json())    
-        self.page_requests_received +=1
-        for listing in j_listings_prime_data:
-            self.listings_requests_sent +=1
-            headers, payload = self.__configure_secondary_requests(listing)
-            yield scrapy.Request(url=self.Secondary_API, headers=headers, body=payload, method="POST", callback=self.parse)
+        data = json.loads(response.body)
+        yield from self.__secondary_requests(response, data)
+        self.__retry_truncated_page(response, data)
+        yield from self.__request_done(response.meta)
            
 
     def parse(self,response):
         """
         Parse the detailed listing data from the secondary API response.
         """
-        listing_data_item = RealtorItemLoader(Listing_Item(), selector= response)
-        listing_data_item.add_jmes("state","data.home.location.address.state")
-        listing_data_item.add_jmes("price","data.home.list_price")
-        listing_data_item.add_jmes("URL","data.home.href")
-        listing_data_item.add_jmes("property_id","data.home.property_id")
-        listing_data_item.add_jmes("listing_id","data.home.listing_id")
-        listing_data_item.add_jmes("type","data.home.description.type")
-        listing_data_item.add_jmes("year_built","data.home.description.year_built")
-        listing_data_item.add_jmes("street","data.home.location.address.line")
-        listing_data_item.add_jmes("city","data.home.location.address.city")
-        listing_data_item.add_jmes("state_code","data.home.location.address.state_code")
-        listing_data_item.add_jmes("zip_code","data.home.location.address.postal_code")
-        listing_data_item.add_jmes("bedrooms","data.home.description.beds")
-        listing_data_item.add_jmes("bathrooms","data.home.description.baths")
-        listing_data_item.add_jmes("sqft","data.home.description.sqft")
-        listing_data_item.add_jmes("parameter","data.home.description.lot_sqft")
-        listing_data_item.add_jmes("agent","data.home.advertisers[0].name")
-        listing_data_item.add_jmes("office","data.home.advertisers[0].office.name")
-        listing_data_item.add_jmes("agent_email","data.home.advertisers[0].email")
-        listing_data_item.add_jmes("office_email","data.home.advertisers[0].office.email")
-        listing_data_item.add_jmes("sold_date","data.home.last_sold_date")
-        listing_data_item.add_jmes("status","data.home.status")
-        listing_data_item.add_jmes("status","data.home.source.raw.status")
+        data = json.loads(response.body)
+        self.listings_requests_received +=1
+        yield self.__load_listing_item(data, response.meta)
+        yield from self.__request_done(response.meta)
 
+
+    def parse_batch(self, response):
+        """
+        Split a batched listings API response into the listings items and retry the listings missing from it.
+        """
+        state_name = response.meta["state_name"]
+        batch = response.meta["batch"]
         self.listings_requests_received +=1
-        yield listing_data_item.load_item()
+        failed_listings = []
+        for listing_meta, data in zip(batch, DetailBatchPayload.split(json.loads(response.body), len(batch))):
+            if data is None:
+                failed_listings.append(listing_meta)
+                continue
+            yield self.__load_listing_item(data, listing_meta)
+        if failed_listings:
+            batch_retries = response.meta["batch_retries"] + 1
+            if batch_retries <= self.settings.getint('RETRY_TIMES', 3):
+                yield self.__batch_request(state_name, failed_listings, batch_retries)
+            else:
+                self.logger.error(f"gave up on {len(failed_listings)} listings of {state_name}: {[listing_meta['listing']['property_id'] for listing_meta in failed_listings]}")
+        yield from self.__request_done(response.meta)
+
+
+    def load_search_item(self, listing):
+        """
+        Build a listing item from a search result.
+        """
+        return self.SEARCH_PLAN.extract(listing)
+
+
+    def listing_types_of(self, listing, search_type):
+        """
+        Tag a search result with the listing types it belongs to "comma separated",
+        an all_for_sale result listed since yesterday is a new listing too.
+        """
+        if search_type == "all_for_sale" and "new_listings" in self.listing_types \
+                and str(listing.get("list_date") or "")[:10] >= str(self.state["search_time_span"]["new_listings"]):
+            return ",".join(type_name for type_name in self.listing_types if type_name in ("all_for_sale", "new_listings"))
+        return search_type
+
+
+    def spider_closed(self, reason):
+        """
+        Close the listings index when the spider is closed.
+        
+        once the crawl is finished with no work left its progress is dropped
+        from the spider's state "CRAWL_STATE", so the next crawl in the same
+        JOBDIR starts afresh instead of skipping the listings already seen.
+        it runs before the JOBDIR state is saved.
+        """
+        if "seen_listings" in dir(self):
+            print(f"\nskipped {self.seen_listings.duplicates} duplicate listings out of {len(self.seen_listings)} unique listings.")
+        if reason == "finished" and "states_queue" in dir(self) and not self.states_queue.has_work():
+            for key in self.CRAWL_STATE:
+                self.state.pop(key, None)
+        if self.listings_index:
+            print(f"\nlistings index: {self.listings_index.hits} unchanged listings reused, {self.listings_index.misses} requested.")
+            self.listings_index.close()
+
+
+    def request_failed(self, failure):
+        """
+        Count a failed request as processed so its state can still be completed.
+        
+        a search results page larger than the fallback page size is fed
+        again in fallback size pages before it's counted as processed.
+        """
+        self.logger.error(repr(failure))
+        request = failure.request
+        if request.url == self.Primary_API and request.meta.get("limit", 0) > self.page_size_fallback:
+            self.__fall_back_page_size(f"a page of {request.meta['limit']} results failed")
+            state_name, search_type, offset, price_band = request.meta["state_name"], request.meta["listing_type"], request.meta["offset"], request.meta.get("price_band")
+            if state_name in self.states_queue.in_flight:
+                end = None if request.callback == self.run_primary_requests else offset + request.meta["limit"]
+                self.states_queue.retry_pages(state_name, search_type, price_band, offset, end)
+        yield from self.__request_done(request.meta)
+
+
+    def __secondary_requests(self, response, data):
+        """
+        Generate the listings requests of a decoded search results page.
+        """
+        state_name = response.meta["state_name"]
+        j_listings_prime_data = data["data"]["home_search"]["properties"] or []
+        self.page_requests_received +=1
+        batch = []
+        for listing in j_listings_prime_data:
+            if not self.seen_listings.add(listing["property_id"], listing.get("listing_id")):
+                continue
+            meta = {"state_name": state_name, "listing_types": self.listing_types_of(listing, response.meta["listing_type"])}
+            if self.search_only:
+                listing_item = self.load_search_item(listing)
+                listing_item.listing_types = meta["listing_types"]
+                if not self.detail_fields:
+                    yield listing_item
+                    continue
+                meta["listing_item"] = listing_item
+            if self.listings_index:
+                signature = ListingsIndex.listing_signature(listing)
+                index_key, content_hash = ListingsIndex.listing_key(listing), ListingsIndex.content_hash(signature)
+                if (indexed_item := self.listings_index.lookup(index_key, content_hash)) is not None:
+                    yield Listing_Item(**{**indexed_item, "listing_types": meta["listing_types"]})
+                    continue
+                meta["index_entry"] = (index_key, signature, content_hash)
+            meta["listing"] = {key: listing.get(key) for key in ("property_id", "listing_id", "permalink")}
+            if self.detail_batch_size > 1:
+                batch.append(meta)
+                if len(batch) == self.detail_batch_size:
+                    yield self.__batch_request(state_name, batch)
+                    batch = []
+                continue
+            yield self.__listing_request(meta)
+        if batch:
+            yield self.__batch_request(state_name, batch)
+
+
+    def __listing_request(self, meta):
+        """
+        Build a listings API request of a single listing.
+        """
+        self.listings_requests_sent +=1
+        meta = {**meta, "cursor_id": self.states_queue.request_sent(meta["state_name"], ("listings", [meta]))}
+        headers, payload = self.__configure_secondary_requests(meta["listing"])
+        return scrapy.Request(url=self.Secondary_API, headers=headers, body=payload, method="POST", callback=self.parse, errback=self.request_failed, meta=meta, priority=self.DETAIL_PRIORITY)
+
+
+    def __batch_request(self, state_name, batch, batch_retries=0):
+        """
+        Build a listings API request of a batch of listings.
+        """
+        self.listings_requests_sent +=1
+        cursor_id = self.states_queue.request_sent(state_name, ("listings", batch))
+        headers = {"referer": f"{self.WEBSITE}/realestateandhomes-detail/{batch[0]["listing"]["permalink"]}"}
+        payload = self.request_factory.batch_body([(listing_meta["listing"]["property_id"], listing_meta["listing"]["listing_id"]) for listing_meta in batch])
+        return scrapy.Request(url=self.Secondary_API, headers=headers, body=payload, method="POST", callback=self.parse_batch, errback=self.request_failed, meta={"state_name": state_name, "batch": batch, "batch_retries": batch_retries, "cursor_id": cursor_id}, dont_filter=batch_retries > 0, priority=self.DETAIL_PRIORITY)
+
+
+    def __load_listing_item(self, data, meta):
+        """
+        Build a listing item from a decoded listings API response and store it in the listings index.
+        """
+        if "listing_item" in meta:
+            listing_item = self.detail_plan.extract(data, meta["listing_item"])
+        else:
+            listing_item = self.LISTING_PLAN.extract(data)
+        listing_item.listing_types = meta.get("listing_types", self.listing_type)
+        if "index_entry" in meta:
+            self.listings_index.store(*meta["index_entry"], asdict(listing_item))
+        return listing_item
+
+
+    def __primary_request(self, state_name, search_type, offset, callback, price_band=None, limit=None):
+        """
+        Build a search results page request of a state's search "or of one of its price bands".
+        """
+        limit = limit or self.results_per_page
+        self.page_requests_sent +=1
+        self.pages_in_flight +=1
+        cursor_id = self.states_queue.request_sent(state_name, ("page", callback.__name__, search_type, offset, limit, price_band))
+        headers, payload = self.__configure_primary_requests(state_name, search_type, offset, limit, price_band)
+        return scrapy.Request(url=self.Primary_API, headers=headers, body=payload, method="POST", callback=callback, errback=self.request_failed, meta={"state_name": state_name, "listing_type": search_type, "price_band": price_band, "offset": offset, "limit": limit, "cursor_id": cursor_id})
+
+
+    def __probe_page_size(self, probe_index):
+        """
+        Request the first search results page of the first state in the input file with the probed page size,
+        start the states with the fallback page size once all the probed sizes are rejected.
+        """
+        pending_states = [state_name for state_name in self.states_queue.pending_states() if state_name in self.states_names_and_codes]
+        if probe_index >= len(self.page_size_probe_limits) or not pending_states:
+            self.results_per_page = self.state["results_per_page"] = self.page_size_fallback
+            yield from self.gen_requests()
+            return
+        limit = self.page_size_probe_limits[probe_index]
+        headers, payload = self.__configure_primary_requests(pending_states[0], self.search_types[0], 0, limit)
+        yield scrapy.Request(url=self.Primary_API, headers=headers, body=payload, method="POST", callback=self.page_size_probed, errback=self.page_size_probe_failed, meta={"probe_index": probe_index, "limit": limit, "listing_type": self.search_types[0]}, dont_filter=True)
+
+
+    def __fall_back_page_size(self, reason):
+        """
+        Switch the pages requested from now on to the fallback page size.
+        """
+        if self.results_per_page > self.page_size_fallback:
+            print(f"\n{reason}, falling back to {self.page_size_fallback} results per page.")
+            self.results_per_page = self.state["results_per_page"] = self.page_size_fallback
+
+
+    def __retry_truncated_page(self, response, data):
+        """
+        Feed the results missing from a truncated search results page again in fallback size pages.
+        """
+        if "limit" not in response.meta:
+            return
+        offset, limit = response.meta["offset"], response.meta["limit"]
+        home_search = data["data"]["home_search"]
+        results_expected = min(limit, home_search["total"] - offset)
+        results_received = len(home_search["properties"] or [])
+        if results_received >= results_expected or limit <= self.page_size_fallback:
+            return
+        self.__fall_back_page_size(f"a page of {limit} results was truncated to {results_received}")
+        self.states_queue.retry_pages(response.meta["state_name"], response.meta["listing_type"], response.meta.get("price_band"),
+                                      offset + results_received, offset + results_expected)
+
+
+    def __request_done(self, meta):
+        """
+        Record a processed request of a state, request the next search pages the backlog has room for
+        and start the next states once it is completed.
+        """
+        state_name = meta["state_name"]
+        if "offset" in meta:
+            self.pages_in_flight -=1
+        if state_name not in self.states_queue.in_flight:
+            return
+        self.states_queue.request_received(state_name, meta.get("cursor_id"))
+        yield from self.feed_pages()
+        if self.states_queue.is_complete(state_name):
+            self.__mark_state_done(state_name)
+            yield from self.gen_requests()
+
+
+    def __requeue_stalled_states(self):
+        """
+        Rebuild the pending requests of the states in flight once the engine is idle without completing them,
+        the first pages of a state none of whose searches reported its totals are requested again.
+
+        Raises:
+            CloseSpider: if a state stalled more than "RETRY_TIMES" times, it's left checkpointed in the JOBDIR.
+        """
+        if self.pages_in_flight:
+            self.logger.warning(f"{self.pages_in_flight} search pages were counted in flight with the engine idle")
+            self.pages_in_flight = 0
+        stalled_states = list(self.states_queue.in_flight)
+        first_pages = []
+        for state_name in stalled_states:
+            progress = self.states_queue.in_flight[state_name]
+            self.logger.warning(f"{state_name} stalled with {progress['requests_received']}/{progress['requests_sent']} requests processed, "
+                                f"{len(progress['pending'])} pending and {len(progress.get('page_feeds') or [])} page feeds left")
+            self.stalled_states[state_name] = self.stalled_states.get(state_name, 0) + 1
+            if self.stalled_states[state_name] > self.settings.getint('RETRY_TIMES', 3):
+                raise CloseSpider(f"stalled_{state_name}")
+            if progress["pages_available"] is None and not progress["pending"]:
+                first_pages.append(state_name)
+        # the requests of a stalled state may have been dropped as duplicates
+        for request in self.resume_requests(stalled_states):
+            yield request.replace(dont_filter=True)
+        for state_name in first_pages:
+            for search_type, price_band in self.states_queue.first_pages(state_name, self.search_types):
+                yield self.__primary_request(state_name, search_type, 0, self.run_primary_requests, price_band).replace(dont_filter=True)
+        yield from self.feed_pages()
+
+    def __mark_state_done(self, state_name):
+        """
+        Remove the scraped state from the states queue and the input file
+        and signal the pipeline to write its final outputs.
+
+        a worker sharing a frontier only completed a unit of the state, the
+        pipeline is signaled first to publish the unit's outputs "merged when
+        the crawl is over" and the unit is only marked done in the frontier
+        once they are published, it's tried again when the engine goes idle
+        otherwise.
+        """
+        if isinstance(self.states_queue, FrontierStatesQueue):
+            results = self.crawler.signals.send_catch_log(signal=state_completed, state_name=state_name, spider=self)
+            if any(isinstance(result, Failure) for _, result in results):
+                self.logger.error(f"the outputs of the unit of {state_name} weren't published, it's left in flight")
+                return
+            self.states_queue.mark_done(state_name)
+        else:
+            self.states_queue.mark_done(state_name)
+            self.crawler.signals.send_catch_log(signal=state_completed, state_name=state_name, spider=self)
+        print(f"\nfinished scraping {self.state["listing_type"]} in {state_name} state.")
 
  
-    def __get_pages_available(self, response):
+    def __get_pages_available(self, response, data):
         """
         Calculate the number of pages available based on the results returned.
+        
+        the state's progress record keeps the totals of the whole state searches,
+        the price bands only return their own totals.
         """
-        results_available = response.json()["data"]["home_search"]["total"]
+        results_available = data["data"]["home_search"]["total"]
         
-        if results_available%self.RESULTS_PER_PAGE == 0:
-            pages_available = int(results_available/self.RESULTS_PER_PAGE)
+        if results_available%self.results_per_page == 0:
+            pages_available = int(results_available/self.results_per_page)
         else:
-            pages_available = int((results_available/self.RESULTS_PER_PAGE)+1)
-        self.state["results_available"] = results_available
-        self.state["pages_available"] = pages_available
+            pages_available = int((results_available/self.results_per_page)+1)
+        if response.meta.get("price_band") is None:
+            self.states_queue.add_totals(response.meta["state_name"], response.meta["listing_type"], results_available, pages_available)
+        return results_available, pages_available
         
            
-    def __configure_primary_requests(self, page_number):
+    def __configure_primary_requests(self, state_name, search_type, offset, limit, price_band=None):
         """
         Configure the headers and payload for primary API requests.
         """
         headers = {}
-        primary_request_data = PRIMARY_REQUEST_DATA.copy() 
-        headers["referer"] = primary_request_data[self.state["listing_type"]]["referer"]\
-            .replace("....", self.state["state_name"])\
-            .replace("*",str(page_number))
-        payload = primary_request_data[self.state["listing_type"]]["payload"]\
-            .replace("**",self.state["state_name"])\
-            .replace("--", self.state_code)\
-            .replace("==", str(self.state["search_time_span"][self.state["listing_type"]] ))\
-            .replace("++",str((page_number-1)*self.RESULTS_PER_PAGE))
+        primary_request_data = SEARCH_ONLY_PRIMARY_REQUEST_DATA if self.search_only else PRIMARY_REQUEST_DATA 
+        headers["referer"] = primary_request_data[search_type]["referer"]\
+            .replace("....", state_name)\
+            .replace("*",str(offset//limit + 1))
+        payload = self.request_factory.search_body(
+            search_type,
+            state_name,
+            self.states_names_and_codes[state_name],
+            str(self.state["search_time_span"][search_type]),
+            offset,
+            limit,
+            SearchPartitioner.price_filter(price_band),
+        )
         
         return headers, payload
     
@@ -264,43 +811,6 @@ class RealtorScraperSpider(scrapy.Spider):
         """
         headers = {}
         headers["referer"] = f"{self.WEBSITE}/realestateandhomes-detail/{request_data["permalink"]}"
-        payload = SECONDARY_PAYLOAD\
-            .replace("**", str(request_data["property_id"]))\
-            .replace("++", str(request_data["listing_id"]))
+        payload = self.request_factory.listing_body(request_data["property_id"], request_data["listing_id"])
         return headers, payload
-    
-    def __write_states_to_the_input_file(self, states):
-        """
-        Write the list of states to the input file.
-        """
-        with open(self.input_file,"w") as f:
-            for state_name in states:
-                f.write(f"{state_name}\n")
-            
-    def __get_state_name__code__listing_type(self):
-        """
-        Retrieve the state name, code, and listing type from the input file.
-        """
-        with open(self.input_file, "r") as f:
-            contents = f.read()
-        if contents:
-            states_names_and_codes = dict(zip(STATES, STATES_CODES))
-            self.state["state_name"] = contents.split("\n")[0].strip().replace(" ","-").lower()
-            self.state_code = states_names_and_codes[self.state["state_name"].lower()]
-        else:
-            raise ValueError('the input file "realtor inputs.txt" is empty!')    
-        
-    
-    def __delete_the_scraped_state(self):
-        """
-        Delete the already scraped state from the input file.
-        """
-        with open(self.input_file,"r") as f:
-            all_states = [state_name.strip().lower().replace(" ","-") for state_name in f.read().strip().split("\n")]
-        if all_states[0].strip() == self.state["state_name"].strip():
-            all_states.remove(self.state["state_name"])
-            self.__write_states_to_the_input_file(all_states)
-        else:
-            print(f'\nall_states: {all_states}\nself.state["state_name"]: {self.state["state_name"]}\n')
-            raise ValueError(f'the first state in the "{self.input_file}" does not match the scraped state {self.state["state_name"]}!') 
-        
\ No newline at end of file
+    
\ No newline at end of file
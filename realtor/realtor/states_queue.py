@@ -0,0 +1,253 @@
+"""
+This module defines the work queue that lets the spider crawl several states at the same time.
+
+The states still waiting to be scraped live in the txt input file "realtor inputs.txt", the queue
+hands out up to `CONCURRENT_STATES` of them at once and keeps a progress record for each state in
+flight, a state is removed from the input file (atomically) only after all of its requests are done,
+so pausing and resuming the spider never loses or repeats a state.
+
+The pending requests of each state are checkpointed as compact cursors "a search page offset and limit,
+or the ids of the listings to request" instead of the pickled requests, they are rebuilt from the
+request templates on resume so the size of the checkpoint doesn't grow with the weight of the requests.
+The search pages that are not requested yet are kept as page feeds "a listing type, a price band, the next
+offset and the end offset, no end offset for the first page of a search" the spider draws from as its requests
+backlog drains, the first pages of the price bands and the pages requested again are fed the same way.
+
+The spider sends the `state_completed` signal once a state is completely scraped so its final outputs
+are written right away instead of after the whole crawl.
+
+Classes:
+    StatesQueue: Hands out the states to be scraped and tracks the completion of each one of them.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+state_completed = object()
+"""state_completed: the signal sent with the `state_name` of each state once all of its requests are processed."""
+
+
+class StatesQueue:
+    """
+    A work queue of the states to be scraped backed by the txt input file.
+
+    The progress of each state in flight "including the cursors of its pending requests" is kept in a plain
+    dict so it can be stored in the spider's `state` attribute and persisted in the JOBDIR between pause and resume.
+
+    Attributes:
+        input_file (str): the name and directory of the txt input file.
+        concurrent_states (int): the max number of states to be scraped at the same time.
+        in_flight (dict): maps each state in flight to its progress record.
+        completed (dict): maps each state completed during this run to its final progress record.
+    """
+
+    def __init__(self, input_file: str, concurrent_states: int, in_flight: Dict[str, dict]):
+        """
+        Initializes the queue.
+
+        Args:
+            input_file (str): the name and directory of the txt input file.
+            concurrent_states (int): the max number of states to be scraped at the same time.
+            in_flight (dict): the progress records of the states in flight "restored on resume".
+        """
+        self.input_file = input_file
+        self.concurrent_states = max(1, concurrent_states)
+        self.in_flight = in_flight
+        self.completed: Dict[str, dict] = {}
+
+    @staticmethod
+    def normalize(state_name: str) -> str:
+        """
+        Converts a state name to the slug used in the requests "New York" -> "new-york".
+        """
+        return state_name.strip().replace(" ", "-").lower()
+
+    def write_states(self, states: List[str]) -> None:
+        """
+        Atomically writes the list of states to the input file.
+
+        Args:
+            states (list): the states to be written one per line.
+        """
+        temporary_file = f"{self.input_file}.tmp"
+        with open(temporary_file, "w") as f:
+            for state_name in states:
+                f.write(f"{state_name}\n")
+        os.replace(temporary_file, self.input_file)
+
+    def pending_states(self) -> List[str]:
+        """
+        Reads the states that are not scraped yet from the input file.
+
+        Returns:
+            list: the normalized names of the states left to scrape.
+        """
+        with open(self.input_file, "r") as f:
+            contents = f.read()
+        return [self.normalize(state_name) for state_name in contents.split("\n") if state_name.strip()]
+
+    def next_states(self) -> List[str]:
+        """
+        Picks the states to start scraping while keeping the number of states in flight
+        under `concurrent_states`.
+
+        Returns:
+            list: the names of the states to start, each of them is registered as in flight.
+        """
+        free_slots = self.concurrent_states - len(self.in_flight)
+        states = []
+        for state_name in self.pending_states():
+            if free_slots <= 0:
+                break
+            if state_name in self.in_flight:
+                continue
+            self.in_flight[state_name] = {
+                "requests_sent": 0,
+                "requests_received": 0,
+                "pages_available": None,
+                "results_available": None,
+                "search_totals": {},
+                "pending": {},
+                "page_feeds": [],
+            }
+            states.append(state_name)
+            free_slots -= 1
+        return states
+
+    def request_sent(self, state_name: str, cursor: tuple) -> int:
+        """
+        Records that a request of the state was scheduled along with the cursor it's rebuilt from on resume.
+
+        Args:
+            state_name (str): the name of the state.
+            cursor (tuple): what the request is made of e.g. ("page", callback, listing_type, offset, limit, price_band).
+
+        Returns:
+            int: the id of the request's cursor, it's passed back to `request_received` once the request is processed.
+        """
+        progress = self.in_flight[state_name]
+        progress["requests_sent"] += 1
+        progress["pending"][progress["requests_sent"]] = cursor
+        return progress["requests_sent"]
+
+    def request_received(self, state_name: str, cursor_id: Optional[int] = None) -> None:
+        """
+        Records that a request of the state was processed and drops its cursor.
+        """
+        progress = self.in_flight[state_name]
+        progress["requests_received"] += 1
+        progress["pending"].pop(cursor_id, None)
+
+    def first_pages(self, state_name: str, search_types: List[str]) -> List[tuple]:
+        """
+        Returns the (listing type, price band) of each search whose first page starts the state.
+        """
+        return [(listing_type, None) for listing_type in search_types]
+
+    def split_search(self, state_name: str, listing_type: str, price_bands: List[tuple]) -> None:
+        """
+        Adds the first pages of the price bands of a split search to be requested later by `next_page`.
+        """
+        self.in_flight[state_name]["page_feeds"].extend([listing_type, price_band, 0, None] for price_band in price_bands)
+
+    def add_totals(self, state_name: str, listing_type: str, results_available: int, pages_available: int) -> None:
+        """
+        Records the totals reported by the first page of one of the state's searches,
+        the state's totals are the sums over the listing types searched.
+        """
+        progress = self.in_flight[state_name]
+        progress.setdefault("search_totals", {})[listing_type] = [results_available, pages_available]
+        progress["results_available"] = sum(totals[0] for totals in progress["search_totals"].values())
+        progress["pages_available"] = sum(totals[1] for totals in progress["search_totals"].values())
+
+    def add_pages(self, state_name: str, listing_type: str, price_band: Optional[tuple], start: int, end: int) -> None:
+        """
+        Adds the search pages of a state's search "or of one of its price bands" from the `start` offset up to
+        the `end` offset to be requested later by `next_page`.
+        """
+        if start < end:
+            self.in_flight[state_name]["page_feeds"].append([listing_type, price_band, start, end])
+
+    def retry_pages(self, state_name: str, listing_type: str, price_band: Optional[tuple], start: int, end: Optional[int] = None) -> None:
+        """
+        Puts the search pages of a state's search from the `start` offset up to the `end` offset "or its first page
+        if there is no `end` offset" ahead of the state's other pages to be requested again by `next_page`.
+        """
+        self.in_flight[state_name]["page_feeds"].insert(0, [listing_type, price_band, start, end])
+
+    def next_page(self, state_name: str, limit: int) -> Optional[tuple]:
+        """
+        Takes the next search page of the state to be requested.
+
+        Args:
+            state_name (str): the name of the state.
+            limit (int): the number of results of the page.
+
+        Returns:
+            tuple: the listing type, the price band, the offset and the limit of the page "no limit for the first page of a search,
+                its totals are not known yet", None if all the pages of the state were taken.
+        """
+        page_feeds = self.in_flight[state_name].get("page_feeds")
+        if not page_feeds:
+            return None
+        listing_type, price_band, offset, end = page_feeds[0]
+        if end is None:
+            page_feeds.pop(0)
+            return listing_type, price_band, offset, None
+        page_feeds[0][2] = offset + limit
+        if offset + limit >= end:
+            page_feeds.pop(0)
+        return listing_type, price_band, offset, limit
+
+    def pending_requests(self) -> int:
+        """
+        Counts the requests sent and not processed yet of all the states in flight.
+        """
+        return sum(len(progress["pending"]) for progress in self.in_flight.values())
+
+    def resume(self, state_name: str) -> List[tuple]:
+        """
+        Takes the cursors of the requests the state was waiting for when the spider was paused.
+
+        The state's sent requests are rewound to the received ones so the requests rebuilt
+        from the cursors are counted again.
+
+        Returns:
+            list: the cursors of the pending requests in the order they were sent.
+        """
+        progress = self.in_flight[state_name]
+        cursors = [cursor for _, cursor in sorted(progress["pending"].items())]
+        progress["pending"] = {}
+        progress["requests_sent"] = progress["requests_received"]
+        return cursors
+
+    def is_complete(self, state_name: str) -> bool:
+        """
+        Checks whether all the requests of the state were processed.
+
+        Returns:
+            bool: True if the first page was processed and no request or search page of the state is left.
+        """
+        progress = self.in_flight[state_name]
+        return (
+            progress["pages_available"] is not None
+            and progress["requests_received"] >= progress["requests_sent"]
+            and not progress.get("page_feeds")
+        )
+
+    def mark_done(self, state_name: str) -> None:
+        """
+        Removes the completed state from the states in flight and from the input file.
+
+        Args:
+            state_name (str): the name of the scraped state.
+        """
+        if state_name in self.in_flight:
+            self.completed[state_name] = self.in_flight.pop(state_name)
+        self.write_states([pending for pending in self.pending_states() if pending != state_name])
+
+    def has_work(self) -> bool:
+        """
+        Checks whether there are states in flight or left in the input file.
+        """
+        return bool(self.in_flight) or bool(self.pending_states())
@@ -0,0 +1,2 @@
+# This package contains the tests of the realtor scrapy project,
+# run them from the scrapy project directory e.g. "python -m pytest tests"
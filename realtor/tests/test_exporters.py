@@ -0,0 +1,54 @@
+import threading
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from realtor.exporters import XlsxStatesExporter
+
+
+def listings(rows):
+    return pd.DataFrame({"property_id": [str(number) for number in range(rows)], "price": [None] + [100000] * (rows - 1)})
+
+
+def test_export_never_waits_for_the_backlog(tmp_path, monkeypatch):
+    released = threading.Event()
+    write_workbook = XlsxStatesExporter.write_workbook
+
+    def blocked_write_workbook(file_path, columns, slice_path):
+        released.wait(10)
+        return write_workbook(file_path, columns, slice_path)
+    monkeypatch.setattr(XlsxStatesExporter, "write_workbook", staticmethod(blocked_write_workbook))
+
+    exporter = XlsxStatesExporter(1, str(tmp_path / "slices"))
+    workbooks = [exporter.export(str(tmp_path / f"state {number}.xlsx"), listings(3)) for number in range(5)]
+    # a couple of workbooks per process are in the pool, the others wait without blocking the caller
+    assert (exporter.submitted, len(exporter.waiting)) == (2, 3)
+    assert not any(workbook.done() for workbook in workbooks)
+    # only the paths of the slice files wait, not their rows
+    assert [slice_path for *_, slice_path in exporter.waiting] == [str(tmp_path / "slices" / f"{number}.jsonl") for number in (3, 4, 5)]
+
+    released.set()
+    assert exporter.close() == {}
+    assert [workbook.result() for workbook in workbooks] == [3] * 5
+    assert not list((tmp_path / "slices").iterdir())
+    rows = list(load_workbook(tmp_path / "state 4.xlsx").active.values)
+    assert rows[:2] == [("property_id", "price"), ("0", None)]
+
+
+def test_close_collects_the_error_of_every_workbook(tmp_path, monkeypatch):
+    write_workbook = XlsxStatesExporter.write_workbook
+
+    def failing_write_workbook(file_path, columns, slice_path):
+        if "ohio" not in file_path:
+            raise OSError(f"{file_path} is read only")
+        return write_workbook(file_path, columns, slice_path)
+    monkeypatch.setattr(XlsxStatesExporter, "write_workbook", staticmethod(failing_write_workbook))
+
+    exporter = XlsxStatesExporter(1)
+    for state in ("texas", "ohio", "iowa"):
+        exporter.export(str(tmp_path / f"{state}.xlsx"), listings(2))
+    errors = exporter.close()
+    assert sorted(errors) == [str(tmp_path / "iowa.xlsx"), str(tmp_path / "texas.xlsx")]
+    assert all(isinstance(error, OSError) for error in errors.values())
+    assert (tmp_path / "ohio.xlsx").exists()
+    assert exporter.pool is None
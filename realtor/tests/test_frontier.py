@@ -0,0 +1,87 @@
+from realtor import frontier as frontier_module
+from realtor.frontier import FrontierStatesQueue, WorkFrontier
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_frontier(tmp_path, monkeypatch, lease_seconds=60):
+    clock = Clock()
+    monkeypatch.setattr(frontier_module, "time", clock)
+    return WorkFrontier(str(tmp_path / "frontier.sqlite3"), lease_seconds), clock
+
+
+def test_units_are_claimed_once_in_order(tmp_path, monkeypatch):
+    frontier, _ = open_frontier(tmp_path, monkeypatch)
+    assert frontier.seed("crawl", ["texas", "ohio"], ["all_for_sale"]) == 2
+    # seeding again "another worker starting" adds nothing
+    assert frontier.seed("crawl", ["texas", "ohio"], ["all_for_sale"]) == 0
+    first = frontier.claim("crawl", "worker-1", [])
+    second = frontier.claim("crawl", "worker-2", [])
+    assert (first["state"], first["start"], first["end"]) == ("texas", 0, None)
+    assert second["state"] == "ohio"
+    assert frontier.claim("crawl", "worker-3", []) is None
+    assert frontier.claim("other crawl", "worker-3", []) is None
+
+
+def test_claim_skips_the_states_in_flight(tmp_path, monkeypatch):
+    frontier, _ = open_frontier(tmp_path, monkeypatch)
+    frontier.publish("crawl", "texas", "all_for_sale", None, [(42, 1092), (1092, 2000)])
+    frontier.publish("crawl", "ohio", "all_for_sale", (0, 99999), [(0, None)])
+    unit = frontier.claim("crawl", "worker-1", ["texas"])
+    assert (unit["state"], unit["price_band"]) == ("ohio", (0, 99999))
+
+
+def test_expired_lease_is_claimed_again(tmp_path, monkeypatch):
+    frontier, clock = open_frontier(tmp_path, monkeypatch, lease_seconds=60)
+    frontier.seed("crawl", ["texas"], ["all_for_sale"])
+    unit = frontier.claim("crawl", "worker-1", [])
+    clock.now += 30
+    frontier.heartbeat("crawl", "worker-1", [unit["unit_id"]])
+    clock.now += 59
+    assert frontier.claim("crawl", "worker-2", []) is None
+    assert frontier.pending_states("crawl") == []
+
+    # worker-1 died, its unit is handed to worker-2 once the renewed lease expires
+    clock.now += 2
+    assert frontier.pending_states("crawl") == ["texas"]
+    reclaimed = frontier.claim("crawl", "worker-2", [])
+    assert reclaimed["unit_id"] == unit["unit_id"]
+    frontier.complete(reclaimed["unit_id"])
+    assert not frontier.has_work("crawl")
+    assert frontier.progress("crawl") == {"done": 1}
+
+
+def test_last_worker_to_finish_merges(tmp_path, monkeypatch):
+    frontier, clock = open_frontier(tmp_path, monkeypatch, lease_seconds=60)
+    frontier.seed("crawl", ["texas"], ["all_for_sale"])
+    frontier.heartbeat("crawl", "worker-1", [])
+    unit = frontier.claim("crawl", "worker-2", [])
+    frontier.heartbeat("crawl", "worker-2", [unit["unit_id"]])
+    assert not frontier.finish_worker("crawl", "worker-1")
+    frontier.complete(unit["unit_id"])
+    assert frontier.finish_worker("crawl", "worker-2")
+    # the partial outputs are merged once
+    assert not frontier.finish_worker("crawl", "worker-1")
+
+
+def test_frontier_queue_publishes_the_rest_of_a_search(tmp_path, monkeypatch):
+    frontier, _ = open_frontier(tmp_path, monkeypatch)
+    input_file = tmp_path / "realtor inputs.txt"
+    input_file.write_text("texas\n")
+    queue = FrontierStatesQueue(frontier, "crawl", "worker-1", str(input_file), 2, {}, ["all_for_sale"], unit_pages=2)
+    assert queue.next_states() == ["texas"]
+    assert queue.first_pages("texas", ["all_for_sale"]) == [("all_for_sale", None)]
+    queue.add_pages("texas", "all_for_sale", None, 42, 300)
+    queue.mark_done("texas")
+    assert frontier.progress("crawl") == {"done": 1, "pending": 4}
+
+    # the page range units are claimed one state at a time
+    assert queue.next_states() == ["texas"]
+    assert queue.in_flight["texas"]["page_feeds"] == [["all_for_sale", None, 42, 126]]
+    assert queue.has_work()
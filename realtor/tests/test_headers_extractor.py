@@ -0,0 +1,53 @@
+import threading
+from time import perf_counter
+
+import pytest
+
+from realtor.spiders.headers_extractor import GetHeaders
+
+
+@pytest.fixture
+def harvester(monkeypatch):
+    """
+    A harvesting session whose browser never starts "e.g. Chrome is missing".
+    """
+    harvester = GetHeaders()
+    harvester.browsers_started = 0
+
+    def initiate_browser(user_agent):
+        harvester.browsers_started += 1
+        raise OSError("chrome is missing")
+    monkeypatch.setattr(harvester, "_GetHeaders__initiate_browser", initiate_browser)
+    return harvester
+
+
+def test_harvest_gives_up_after_its_attempts(harvester, monkeypatch):
+    monkeypatch.setattr(harvester.stopped, "wait", lambda timeout: False)
+    with pytest.raises(OSError, match="chrome is missing"):
+        harvester.fresh_headers("Texas", 1, attempts=3)
+    assert harvester.browsers_started == 3
+    assert not harvester.harvesting
+
+
+def test_stop_interrupts_the_backoff_of_a_harvest(harvester):
+    errors = []
+
+    def harvest():
+        try:
+            harvester.fresh_headers("Texas", 1, attempts=100)
+        except Exception as error:
+            errors.append(error)
+    thread = threading.Thread(target=harvest)
+    thread.start()
+    while not harvester.browsers_started:
+        pass
+    stopped_at = perf_counter()
+    harvester.stop()
+    thread.join(5)
+    assert not thread.is_alive() and perf_counter() - stopped_at < 1
+    assert isinstance(errors[0], RuntimeError) and harvester.browsers_started == 1
+
+    # a stopped session doesn't start a browser again
+    with pytest.raises(RuntimeError):
+        harvester.fresh_headers("Texas", 1)
+    assert harvester.browsers_started == 1
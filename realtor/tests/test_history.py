@@ -0,0 +1,63 @@
+import pytest
+
+from realtor.history import ListingsHistory
+
+
+def observation(property_id, listing_id, price, status, state="Texas", sold_date=None):
+    return (property_id, listing_id, state, "78701", "all_for_sale", price, status, sold_date)
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ListingsHistory(str(tmp_path / "history.sqlite3"))
+    yield history
+    history.close()
+
+
+def test_previous_values_are_derived_when_queried(history):
+    history.add("2024-01-01", [observation("1", "10", 300000, "for_sale"), observation("2", "20", 200000, "for_sale")])
+    # a run ingested late "out of order" is still the previous run of the one after it
+    history.add("2024-01-03", [observation("1", "10", 250000, "for_sale"), observation("2", "20", 200000, "for_sale")])
+    history.add("2024-01-02", [observation("1", "10", 280000, "for_sale"), observation("2", "20", 210000, "for_sale")])
+
+    drops = history.price_drops()
+    assert [(drop["property_id"], drop["previous_run_date"], drop["previous_price"], drop["price"]) for drop in drops] == [
+        ("1", "2024-01-02", 280000, 250000),
+        ("2", "2024-01-02", 210000, 200000),
+    ]
+    assert [drop["property_id"] for drop in history.price_drops(min_drop=20000)] == ["1"]
+    assert [drop["property_id"] for drop in history.price_drops(since="2024-01-01")] == ["1"]
+    assert [drop["previous_price"] for drop in history.price_drops(run_date="2024-01-02")] == [300000]
+
+
+def test_status_changes_follow_the_property_across_listings(history):
+    history.add("2024-01-01", [
+        observation("1", "10", 300000, "for_sale"),
+        observation("2", "20", 200000, "for_sale"),
+        observation("3", "30", 100000, "for_sale"),
+        observation("3", "31", 90000, "sold", sold_date="2020-05-01"),
+    ])
+    history.add("2024-01-02", [
+        # sold under a new listing_id
+        observation("1", "11", 295000, "sold", sold_date="2024-01-02"),
+        observation("2", "20", 200000, "pending"),
+        # the old sale of the property is still listed, only its current listing is compared to it
+        observation("3", "30", 100000, "for_sale"),
+        observation("3", "31", 90000, "sold", sold_date="2020-05-01"),
+    ])
+
+    changes = history.status_changes()
+    assert [(change["property_id"], change["previous_listing_id"], change["listing_id"], change["previous_status"], change["status"])
+            for change in changes] == [("1", "10", "11", "for_sale", "sold"), ("2", "20", "20", "for_sale", "pending")]
+    sold = history.status_changes(from_status="for_sale", to_status="sold")
+    assert [(change["property_id"], change["previous_price"], change["price"]) for change in sold] == [("1", 300000, 295000)]
+    assert history.status_changes(state="Ohio") == []
+    assert [arrival["listing_id"] for arrival in history.new_arrivals()] == ["11"]
+
+
+def test_a_listing_is_observed_once_per_run(history):
+    assert history.add("2024-01-01", [observation("1", "10", 300000, "for_sale")]) == 1
+    assert history.add("2024-01-01", [observation("1", "10", 290000, "for_sale"), observation("2", "20", 200000, "for_sale")]) == 1
+    assert history.runs() == ["2024-01-01"]
+    assert [row["price"] for row in history.listing_history("1")] == [300000]
+    assert history.added == 2
@@ -0,0 +1,32 @@
+from realtor.listings_index import ListingsIndex
+
+
+def search_result(price=100000, status="for_sale"):
+    return {"property_id": "1", "listing_id": "2", "list_price": price, "status": status, "list_date": "2024-01-01"}
+
+
+def test_unchanged_listing_is_reused(tmp_path):
+    index = ListingsIndex(str(tmp_path / "index.sqlite3"))
+    listing = search_result()
+    signature = ListingsIndex.listing_signature(listing)
+    key, content_hash = ListingsIndex.listing_key(listing), ListingsIndex.content_hash(signature)
+    assert index.lookup(key, content_hash) is None
+    index.store(key, signature, content_hash, {"property_id": "1", "price": 100000})
+    assert index.lookup(key, content_hash) == {"property_id": "1", "price": 100000}
+    assert (index.hits, index.misses) == (1, 1)
+
+
+def test_changed_listing_is_requested_again(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = ListingsIndex(path)
+    listing = search_result()
+    signature = ListingsIndex.listing_signature(listing)
+    index.store(ListingsIndex.listing_key(listing), signature, ListingsIndex.content_hash(signature), {"price": 100000})
+    index.close()
+
+    # the index outlives the run, a price drop or a status change misses it
+    index = ListingsIndex(path)
+    for changed in (search_result(price=90000), search_result(status="pending")):
+        assert index.lookup(ListingsIndex.listing_key(changed), ListingsIndex.content_hash(ListingsIndex.listing_signature(changed))) is None
+    assert index.lookup(ListingsIndex.listing_key(listing), ListingsIndex.content_hash(signature)) == {"price": 100000}
+
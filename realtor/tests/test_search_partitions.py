@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from benchmarks.fake_realtor import FakeRealtorHandler
+from realtor.constants import PRIMARY_REQUEST_DATA, SECONDARY_PAYLOAD, PRICE_FILTER_FIELDS
+from realtor.request_factory import RequestFactory
+from realtor.search_partitions import SearchPartitioner, UNPRICED
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    Searches the fake search API "3000 listings per state, one in 25 without a price" with the spider's request bodies.
+    """
+    monkeypatch.setattr(FakeRealtorHandler, "results", 3000)
+    handler = FakeRealtorHandler.__new__(FakeRealtorHandler)
+    factory = RequestFactory(
+        {listing_type: request_data["payload"] for listing_type, request_data in PRIMARY_REQUEST_DATA.items()},
+        SECONDARY_PAYLOAD,
+        PRICE_FILTER_FIELDS,
+    )
+
+    def search(listing_type, band, offset=0, limit=42):
+        body = factory.search_body(listing_type, "texas", "TX", "2024-01-01", offset, limit, SearchPartitioner.price_filter(band))
+        return handler.search_response(json.loads(body)["variables"])["data"]["home_search"]
+    return search
+
+
+def leaf_bands(partitioner, search, listing_type, band=None):
+    total = search(listing_type, band)["total"]
+    if partitioner.needs_split(total, band):
+        return [leaf for sub_band in partitioner.split(band) for leaf in leaf_bands(partitioner, search, listing_type, sub_band)]
+    return [(band, total)]
+
+
+@pytest.mark.parametrize("listing_type", ["all_for_sale", "sold_listings"])
+def test_band_totals_add_up_to_the_unsplit_total(api, listing_type):
+    partitioner = SearchPartitioner(500, [100000, 200000, 300000, 400000, 500000, 750000, 1000000, 2000000])
+    unsplit_total = api(listing_type, None)["total"]
+    bands = leaf_bands(partitioner, api, listing_type)
+    assert len(bands) > 9
+    assert sum(total for _, total in bands) == unsplit_total == 3000
+    assert dict(bands)[UNPRICED] == 120
+
+    # paging through the bands finds every listing of the unsplit search once
+    unsplit = {listing["property_id"] for listing in api(listing_type, None, 0, 3000)["properties"]}
+    found = [
+        listing["property_id"]
+        for band, total in bands
+        for offset in range(0, total, 200)
+        for listing in api(listing_type, band, offset, 200)["properties"]
+    ]
+    assert len(found) == len(set(found)) and set(found) == unsplit
+
+
+def test_unpriced_band_is_never_split():
+    partitioner = SearchPartitioner(500, [100000])
+    assert partitioner.split(None) == [(0, 99999), (100000, None), UNPRICED]
+    assert not partitioner.needs_split(10000, UNPRICED)
+    assert partitioner.needs_split(10000, (100000, None))
+    assert SearchPartitioner.price_filter(UNPRICED) == {"exclude": {"min": 0}}
+    assert SearchPartitioner.label(UNPRICED) == "no price"
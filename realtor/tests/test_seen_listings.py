@@ -0,0 +1,56 @@
+from scrapy.extensions.spiderstate import SpiderState
+from scrapy.utils.test import get_crawler
+
+from realtor.seen_listings import SeenListings
+from realtor.spiders.realtor_scraper import RealtorScraperSpider
+
+
+def open_spider(job_dir):
+    """
+    Opens the spider with its state loaded from the JOBDIR "like the SpiderState extension of a crawl".
+    """
+    crawler = get_crawler(RealtorScraperSpider, {"JOBDIR": str(job_dir)})
+    spider = RealtorScraperSpider.from_crawler(crawler, scrape_all="False", listing_type="all_for_sale")
+    spider_state = SpiderState.from_crawler(crawler)
+    spider_state.spider_opened(spider)
+    spider.get_initial_variables()
+    return spider, spider_state
+
+
+def test_seen_listings_skip_duplicates_across_resume():
+    hashes = set()
+    seen = SeenListings(hashes)
+    assert seen.add("1", "2")
+    assert not seen.add("1", "2")
+    assert seen.add("1", "3")
+    resumed = SeenListings(set(hashes))
+    assert not resumed.add("1", "3")
+    assert (len(resumed), seen.duplicates, resumed.duplicates) == (2, 1, 1)
+
+
+def test_finished_crawl_leaves_a_fresh_state_in_the_jobdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "realtor inputs.txt").write_text("texas\nohio\n")
+    spider, spider_state = open_spider(tmp_path / "job")
+    assert spider.states_queue.next_states() == ["texas", "ohio"]
+    spider.seen_listings.add("1", "2")
+    spider.state["results_per_page"] = 200
+
+    # paused with ohio in flight, the seen listings are kept for the resume
+    spider.states_queue.mark_done("texas")
+    spider.spider_closed("shutdown")
+    spider_state.spider_closed(spider)
+    spider, spider_state = open_spider(tmp_path / "job")
+    assert not spider.seen_listings.add("1", "2")
+    assert list(spider.states_queue.in_flight) == ["ohio"]
+
+    spider.states_queue.mark_done("ohio")
+    spider.spider_closed("finished")
+    spider_state.spider_closed(spider)
+
+    # the next crawl in the same JOBDIR requests the listings again
+    (tmp_path / "realtor inputs.txt").write_text("texas\n")
+    spider, _ = open_spider(tmp_path / "job")
+    assert spider.seen_listings.add("1", "2")
+    assert spider.states_queue.in_flight == {}
+    assert not {"results_per_page", "saved_states"} & set(spider.state)
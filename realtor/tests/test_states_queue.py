@@ -0,0 +1,75 @@
+import pytest
+
+from realtor.states_queue import StatesQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = StatesQueue(str(tmp_path / "realtor inputs.txt"), 2, {})
+    queue.write_states(["Texas", "New York", "ohio"])
+    return queue
+
+
+def test_next_states_keeps_the_concurrency(queue):
+    assert queue.next_states() == ["texas", "new-york"]
+    assert queue.next_states() == []
+    assert queue.pending_states() == ["texas", "new-york", "ohio"]
+
+
+def test_state_is_removed_from_the_input_file_once_complete(queue):
+    queue.next_states()
+    cursor_id = queue.request_sent("texas", ("page", "run_primary_requests", "all_for_sale", 0, 42, None))
+    queue.add_totals("texas", "all_for_sale", 100, 3)
+    queue.add_pages("texas", "all_for_sale", None, 42, 100)
+    queue.request_received("texas", cursor_id)
+    assert not queue.is_complete("texas")
+    assert queue.next_page("texas", 42) == ("all_for_sale", None, 42, 42)
+    assert queue.next_page("texas", 42) == ("all_for_sale", None, 84, 42)
+    assert queue.next_page("texas", 42) is None
+    assert queue.is_complete("texas")
+    queue.mark_done("texas")
+    assert queue.pending_states() == ["new-york", "ohio"]
+    assert queue.next_states() == ["ohio"]
+
+
+def test_band_first_pages_and_retried_pages_are_fed(queue):
+    queue.next_states()
+    queue.add_pages("texas", "all_for_sale", (0, 99999), 200, 242)
+    queue.split_search("texas", "all_for_sale", [(100000, 199999), (200000, None)])
+    queue.retry_pages("texas", "all_for_sale", (0, 99999), 150, 200)
+    # the retried pages go first, the band first pages report their totals before being paged through
+    assert queue.next_page("texas", 42) == ("all_for_sale", (0, 99999), 150, 42)
+    assert queue.next_page("texas", 42) == ("all_for_sale", (0, 99999), 192, 42)
+    assert queue.next_page("texas", 42) == ("all_for_sale", (0, 99999), 200, 42)
+    assert queue.next_page("texas", 42) == ("all_for_sale", (100000, 199999), 0, None)
+    queue.retry_pages("texas", "all_for_sale", (100000, 199999), 0)
+    assert queue.next_page("texas", 42) == ("all_for_sale", (100000, 199999), 0, None)
+    assert queue.next_page("texas", 42) == ("all_for_sale", (200000, None), 0, None)
+    assert queue.next_page("texas", 42) is None
+
+
+def test_resume_rebuilds_the_pending_cursors(queue):
+    queue.next_states()
+    page = ("page", "run_secondary_requests", "all_for_sale", 42, 42, None)
+    listings = ("listings", [{"listing": {"property_id": "1"}}])
+    first_id = queue.request_sent("texas", page)
+    queue.request_sent("texas", listings)
+    queue.request_sent("texas", ("page", "run_secondary_requests", "all_for_sale", 84, 42, None))
+    queue.request_received("texas", first_id)
+
+    # the checkpoint is the plain in_flight dict kept in the spider's state
+    resumed = StatesQueue(queue.input_file, 2, queue.in_flight)
+    cursors = resumed.resume("texas")
+    assert cursors == [listings, ("page", "run_secondary_requests", "all_for_sale", 84, 42, None)]
+    progress = resumed.in_flight["texas"]
+    assert progress["requests_sent"] == progress["requests_received"] == 1
+    assert progress["pending"] == {}
+
+    # the rebuilt requests are counted again, the state completes once they are processed
+    resumed.add_totals("texas", "all_for_sale", 126, 3)
+    cursor_ids = [resumed.request_sent("texas", cursor) for cursor in cursors]
+    assert resumed.pending_requests() == 2
+    for cursor_id in cursor_ids:
+        assert not resumed.is_complete("texas")
+        resumed.request_received("texas", cursor_id)
+    assert resumed.is_complete("texas")